@@ -0,0 +1,67 @@
+"""
+Compares the ORM path of ``ModelWrapper.generate`` with the ``load="copy"`` path on SQLite.
+
+Usage::
+
+    python -m benchmarks.bench_load --rows 100000 --batch-size 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import peewee
+
+from fillmydb import ModelWrapper, Choice, IntegerRange, RandomBytes
+
+
+def make_user_model(database):
+    class User(peewee.Model):
+        name = peewee.CharField()
+        username = peewee.CharField()
+        password_hash = peewee.BlobField()
+        email = peewee.CharField()
+        visits = peewee.IntegerField()
+        description = peewee.CharField()
+
+        class Meta:
+            database = None
+
+    User._meta.set_database(database)
+    return User
+
+
+def run(load, rows, batch_size):
+    path = os.path.join(tempfile.mkdtemp(), "bench_load.db")
+    database = peewee.SqliteDatabase(path)
+    User = make_user_model(database)
+
+    wrapper = ModelWrapper(User)
+    for field in ("name", "username", "email", "description"):
+        setattr(wrapper[User], field, Choice(["alpha", "beta", "gamma", "delta"]))
+    wrapper[User].password_hash = RandomBytes(16)
+    wrapper[User].visits = IntegerRange(0, 1000)
+
+    start = time.perf_counter()
+    wrapper.generate(rows, batch_size=batch_size, commit_every=batch_size * 10, load=load)
+    elapsed = time.perf_counter() - start
+
+    assert User.select().count() == rows
+    database.close()
+    os.remove(path)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    for load in ModelWrapper.LOAD_MODES:
+        elapsed = run(load, args.rows, args.batch_size)
+        print("{:>5}: {} rows in {:.2f}s ({:.0f} rows/s)".format(load, args.rows, elapsed, args.rows / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmark suite for the generation throughput of fillmydb.
+
+Measures the rows/sec and the peak RSS of ``ModelWrapper.generate`` on the ``User``/``Post``/``Like`` schema from
+``tests/data``, for every backend (peewee, Django, SQLAlchemy) on SQLite, and the cost of resolving a value for every
+field specification. Every generation case runs in a fresh process, so the peak RSS is not polluted by the other
+cases. The results are emitted as JSON, so they can be compared across commits.
+
+Usage::
+
+    python -m benchmarks.run --rows 1000 10000 --batch-sizes 0 1000 --fanouts 1 10 --output results.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BACKENDS = ("peewee", "django", "sqlalchemy")
+
+# the foreign key from Like to Post in the models of every backend, from tests/data
+LIKE_POST_FIELDS = {"peewee": "to_post", "django": "to_post", "sqlalchemy": "for_post"}
+
+
+def peak_rss_kb():
+    """
+    Returns the peak resident set size of the current process, in kilobytes, or None if it can't be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def get_field_specs():
+    """
+    Returns the field specifications of the benchmarked schema, by name.
+    """
+    from fillmydb import Choice, IntegerRange, RandomBytes, FieldSpec
+
+    specs = {
+        "Choice": Choice(["alpha", "beta", "gamma", "delta"]),
+        "IntegerRange": IntegerRange(0, 1000),
+        "RandomBytes(16)": RandomBytes(16),
+    }
+    try:
+        import faker
+    except ImportError:
+        return specs
+
+    factory = faker.Factory.create()
+    specs.update({
+        "faker.name": FieldSpec(factory.name),
+        "faker.email": FieldSpec(factory.email),
+        "faker.sentence": FieldSpec(factory.sentence),
+        "faker.binary(16)": FieldSpec(factory.binary, length=16),
+    })
+    return specs
+
+
+def setup_backend(backend, path):
+    """
+    Binds the models of *backend* to the SQLite database from *path*, creates their tables and returns
+    ``(models, wrapper_kwargs)``.
+    """
+    if backend == "peewee":
+        from tests.data.peewee_models import User, Post, Like, database_obj
+        database_obj.init(path)
+        return (User, Post, Like), {}
+
+    if backend == "sqlalchemy":
+        from sqlalchemy import create_engine
+        from tests.data.sqlalchemy_models import User, Post, Like, Base
+        engine = create_engine("sqlite:///{}".format(path))
+        Base.metadata.create_all(engine)
+        return (User, Post, Like), {"bind": engine}
+
+    import django
+    from django.conf import settings
+    settings.configure(INSTALLED_APPS=["tests.data"], USE_TZ=False,
+                       DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": path}})
+    django.setup()
+    from django.db import connection
+    from tests.data.django_models import User, Post, Like
+    with connection.schema_editor() as editor:
+        for model in (User, Post, Like):
+            editor.create_model(model)
+    return (User, Post, Like), {}
+
+
+def run_generation_case(case):
+    """
+    Runs a single generation case in the current process and returns its measurements.
+    """
+    from fillmydb import ModelWrapper, ForeignKeySpec
+
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    (User, Post, Like), wrapper_kwargs = setup_backend(case["backend"], path)
+    specs = get_field_specs()
+
+    wrapper = ModelWrapper(User, Post, Like, **wrapper_kwargs)
+    for field in ("name", "username", "email", "description"):
+        setattr(wrapper[User], field, specs[case["string_spec"]])
+    wrapper[User].password_hash = specs["RandomBytes(16)"]
+    wrapper[User].visits = specs["IntegerRange"]
+    wrapper[Post].title = specs[case["string_spec"]]
+    wrapper[Post].text = specs[case["string_spec"]]
+    # every post gets exactly "fanout" likes
+    like_to_post = LIKE_POST_FIELDS[case["backend"]]
+    if not hasattr(wrapper[Like], like_to_post):
+        raise AttributeError("The {} Like model has no field '{}'".format(case["backend"], like_to_post))
+    setattr(wrapper[Like], like_to_post, ForeignKeySpec(distribution="fixed", k=case["fanout"]))
+
+    likes = case["rows"]
+    posts = max(1, likes // case["fanout"])
+    users = max(1, posts // 10)
+
+    start = time.perf_counter()
+    wrapper.generate(users, posts, likes, batch_size=case["batch_size"] or None, load=case["load"])
+    elapsed = time.perf_counter() - start
+
+    os.remove(path)
+    total = users + posts + likes
+    return dict(case, users=users, posts=posts, likes=likes, seconds=elapsed, rows_per_sec=total / elapsed,
+                peak_rss_kb=peak_rss_kb())
+
+
+def _run_in_process(case, results):
+    try:
+        results.put(run_generation_case(case))
+    except Exception as e:
+        results.put(dict(case, error="{}: {}".format(type(e).__name__, e)))
+
+
+def run_isolated(case):
+    """
+    Runs the generation *case* in a fresh process.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_in_process, args=(case, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def run_spec_benchmarks(number):
+    """
+    Measures the cost of generating a value with every field specification, one by one and in batches.
+    """
+    results = []
+    for name, spec in sorted(get_field_specs().items()):
+        result = {"spec": name, "resolve_us": timeit.timeit(spec.resolve, number=number) / number * 1e6}
+        if hasattr(spec, "resolve_batch"):
+            # warm up, the first call imports and initializes the NumPy machinery
+            spec.resolve_batch(1)
+            result["resolve_batch_us"] = timeit.timeit(lambda: spec.resolve_batch(number), number=1) / number * 1e6
+        results.append(result)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the generation throughput of fillmydb.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 10000],
+                        help="how many Like rows to generate (the posts and users are derived from it)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[0, 1000],
+                        help="0 persists every instance separately")
+    parser.add_argument("--fanouts", nargs="+", type=int, default=[1, 10], help="how many likes each post gets")
+    parser.add_argument("--loads", nargs="+", choices=["orm", "copy"], default=["orm"])
+    parser.add_argument("--string-spec", default="Choice", help="the specification of the string fields")
+    parser.add_argument("--spec-samples", type=int, default=10000,
+                        help="how many values are generated for measuring each field specification")
+    parser.add_argument("--output", help="the file the JSON results are written to (defaults to stdout)")
+    args = parser.parse_args()
+
+    generation = []
+    for backend in args.backends:
+        for rows in args.rows:
+            for batch_size in args.batch_sizes:
+                for fanout in args.fanouts:
+                    for load in args.loads:
+                        case = {"backend": backend, "rows": rows, "batch_size": batch_size, "fanout": fanout,
+                                "load": load, "string_spec": args.string_spec}
+                        result = run_isolated(case)
+                        generation.append(result)
+                        print("{}".format(result.get("error") or "{backend:>10} rows={rows} batch_size={batch_size} "
+                                                                 "fanout={fanout} load={load}: {rows_per_sec:.0f} "
+                                                                 "rows/s, peak RSS {peak_rss_kb} KB".format(**result)),
+                              file=sys.stderr)
+
+    report = {
+        "revision": git_revision(),
+        "date": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "generation": generation,
+        "specs": run_spec_benchmarks(args.spec_samples),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
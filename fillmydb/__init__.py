@@ -1,4 +1,8 @@
-from fillmydb.core import FieldSpec, ModelWrapper, initialize_django
+from fillmydb.core import FieldSpec, ForeignKeySpec, ModelWrapper, initialize_django
+from fillmydb.core import CyclicDependencyError, ExecutionPlan
+from fillmydb.core import GenerationObserver, GenerationStats, ModelStats, LoggingProgress, TqdmProgress
+from fillmydb.core import BatchFieldSpec, IntegerRange, FloatRange, DecimalRange, Choice, Boolean, DateRange, \
+    DateTimeRange, TimeRange, RandomBytes, RandomUUID, RandomString, Pooled
 
 try:
     import faker
@@ -7,8 +11,29 @@ except ImportError:
 
 __all__ = [
     "FieldSpec",
+    "ForeignKeySpec",
+    "BatchFieldSpec",
+    "IntegerRange",
+    "FloatRange",
+    "DecimalRange",
+    "Choice",
+    "Boolean",
+    "DateRange",
+    "DateTimeRange",
+    "TimeRange",
+    "RandomBytes",
+    "RandomUUID",
+    "RandomString",
+    "Pooled",
     "ModelWrapper",
-    "initialize_django"
+    "initialize_django",
+    "CyclicDependencyError",
+    "ExecutionPlan",
+    "GenerationObserver",
+    "GenerationStats",
+    "ModelStats",
+    "LoggingProgress",
+    "TqdmProgress"
 ]
 
 __version__ = "0.1.0"
@@ -6,6 +6,24 @@ except ImportError:
     peewee = None
     PeeweeHandler = None
 
+try:
+    import sqlalchemy
+
+    from fillmydb.handlers.sqlalchemy_handler import SqlalchemyHandler
+except ImportError:
+    sqlalchemy = None
+    SqlalchemyHandler = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from faker.generator import random as faker_random
+except ImportError:
+    faker_random = None
+
 try:
     import django
     from django.db.models import Model as DjangoModel
@@ -16,11 +34,36 @@ except ImportError:
 
 import os
 import sys
+import time
+import logging
+import random
+import asyncio
+import threading
+import functools
+import itertools
+import contextlib
+import collections
+import concurrent.futures
 import importlib.machinery
 import importlib.util
 
+from fillmydb.core.pipeline import PipelineStats, PipelineAborted, BatchQueue
+from fillmydb.core.rows import compile_row_builder
+from fillmydb.core.checkpoint import Checkpoint, derive_seed
+from fillmydb.core.inference import infer_field_spec
+from fillmydb.core.export import WRITERS, SQL_DIALECTS, SqlScriptWriter
+from fillmydb.core.progress import PROGRESS_REPORTERS, LoggingProgress, TqdmProgress
+from fillmydb.core.stats import GenerationObserver, GenerationStats, ModelStats, PROFILE_MODES, profiling
+from fillmydb.core.scheduler import DependencyScheduler, ExecutionPlan, CyclicDependencyError
+from fillmydb.core.unique import SeenSet, UniqueFilter
+from fillmydb.core.specs import ForeignKeySpec, BatchFieldSpec, IntegerRange, FloatRange, DecimalRange, Choice, \
+    Boolean, DateRange, DateTimeRange, TimeRange, RandomBytes, RandomUUID, RandomString, Pooled
+from fillmydb.handlers.key_pool import KeyPool, compact_keys
+
 IS_PY35 = sys.version_info >= (3, 5)
 
+logger = logging.getLogger(__name__)
+
 
 def initialize_django(settings_py_path):
     """
@@ -49,36 +92,158 @@ def initialize_django(settings_py_path):
     django.setup()
 
 
+def _seed_random_generators(seed):
+    """
+    Seeds all the random number generators used for generating values: the ``random`` module, NumPy's global
+    generator and the generator shared by the Faker providers.
+    """
+    random.seed(seed)
+    if numpy is not None:
+        numpy.random.seed(seed % 2 ** 32)
+    if faker_random is not None:
+        faker_random.seed(seed)
+
+
+def _seek_cursors(cursors, position):
+    """
+    Moves the specifications of *cursors* (see ``ModelWrapper._spec_cursors``) to the values of the *position*-th
+    generated row.
+    """
+    for seek, base in cursors:
+        seek(base + position)
+
+
+def _resolve_value_columns(field_specs, count, seed):
+    """
+    Generates *count* values for each of the *field_specs* (a dict mapping field names to specifications). Runs in the
+    worker processes of ``ModelWrapper.generate``.
+
+    :return: a dict mapping field names to lists of generated values.
+    """
+    _seed_random_generators(seed)
+    columns = {}
+    for field_name, field_spec in field_specs.items():
+        if not field_spec:
+            columns[field_name] = [None] * count
+        elif hasattr(field_spec, "resolve_batch"):
+            columns[field_name] = field_spec.resolve_batch(count)
+        else:
+            columns[field_name] = [field_spec.resolve() for _ in range(count)]
+    return columns
+
+
 class ModelWrapper:
-    class _ProcessingQueue:
+    # how many rows are generated at once when no batch size is given
+    GENERATION_BATCH_SIZE = 1000
+    # how many deferred foreign keys are updated at once, after the generation
+    DEFERRED_BATCH_SIZE = 10000
+
+    # the ways of persisting the generated rows (see generate)
+    LOAD_MODES = ("orm", "copy")
+
+    class _GenerationOptions(object):
         """
-        The processing queue class that manages the processing order of the models.
+        The options of a ``generate`` call, passed down to the methods that generate and persist the instances.
         """
 
-        def __init__(self, *handlers):
-            self.handlers = list(handlers)
+        def __init__(self, batch_size=None, commit_every=None, executor=None, workers=None, pipeline=False,
+                     queue_size=8, load="orm", plan=None, parallel=False, seed=None, checkpoint=None, shard=None):
+            self.batch_size = batch_size
+            self.commit_every = commit_every
+            self.executor = executor
+            self.workers = workers
+            self.pipeline = pipeline
+            self.queue_size = queue_size
+            self.load = load
+            self.plan = plan
+            self.parallel = parallel
+            self.seed = seed
+            self.checkpoint = checkpoint
+            self.shard = shard
+            # the RowBuilder of every model, compiled when its generation starts
+            self.row_builders = {}
+            # the (seek, base) tuples of the specifications of every model that keep a position (see _spec_cursors)
+            self.cursors = {}
+            # the GenerationStats of the call, and the ModelStats of every model
+            self.stats = GenerationStats()
+            self.model_stats = {}
 
-        def initial_order(self):
+        def loading(self, handler):
             """
-            Orders the queue so that the first processed are the models with fewest dependencies. Expected to be
-            processed first the models with no dependencies.
-            :return:
+            Returns the context manager that wraps the persistence of all the rows of a model.
             """
-            self.handlers.sort(key=lambda model: len(model.ref_models), reverse=True)
+            if self.load == "copy":
+                return handler.bulk_load_context()
+            return contextlib.ExitStack()
 
-        def get_next_item(self):
-            item = self.handlers.pop()
-            return item
+        def chunk_size(self):
+            """
+            Returns the number of rows of a chunk: ``commit_every``, or the rows of a generated batch if a seed is
+            given without ``commit_every``, so the random number generators are seeded at the same rows whether the
+            generation is sharded or not (and one row otherwise, since a single chunk is generated without sharding).
+            """
+            if self.commit_every:
+                return self.commit_every
+            if self.seed is not None:
+                return self.batch_size or ModelWrapper.GENERATION_BATCH_SIZE
+            return 1
+
+        def chunks(self, count):
+            """
+            Yields the chunks of rows generated by this call, out of the *count* rows of a model, as (index, size,
+            first key) tuples. A chunk is generated in a transaction of ``commit_every`` rows and seeded on its own if a
+            seed is given (see ``chunk_size``). When sharding, only the chunks of the shard are yielded, with the same
+            indexes as without sharding, and the first key is the primary key of the first row of the chunk (``None``
+            otherwise). The chunks are yielded lazily, so their number doesn't cost memory.
+            """
+            unit = self.chunk_size()
+            # without commit_every and seed, the consecutive chunks are generated together
+            merged = not self.commit_every and self.seed is None
+            if self.shard is None:
+                if merged:
+                    yield 0, count, None
+                    return
+                for index, start in enumerate(range(0, count, unit)):
+                    yield index, min(unit, count - start), None
+                return
+
+            shard, shards = self.shard
+            # the shards get contiguous ranges of chunks
+            total = -(-count // unit)
+            first, last = total * shard // shards, total * (shard + 1) // shards
+            if merged:
+                if last > first:
+                    yield first, last - first, first + 1
+                return
+            for index in range(first, last):
+                yield index, min(unit, count - index * unit), index * unit + 1
+
+        def deferred_fields(self, model):
+            """
+            Returns the foreign keys of *model* that are generated as NULL and filled afterwards. When sharding, all
+            the keys are known upfront, so nothing is deferred.
+            """
+            if self.shard is not None:
+                return ()
+            return self.plan.deferred_fields(model)
 
-        def put_item_back(self, item):
+        def start_chunk(self, model, index):
             """
-            Inserts the item to the end of the queue.
-            :param item: an ModelHandler instance
+            Prepares the generation of the *index* chunk of *model*: seeds the random number generators, if a seed is
+            given, and moves the specifications that keep a position to the first row of the chunk, so the chunk
+            doesn't depend on the chunks generated before it by the current process.
             """
-            self.handlers.insert(0, item)
+            if self.seed is not None:
+                _seed_random_generators(derive_seed(self.seed, model.__name__, index))
+            _seek_cursors(self.cursors.get(model, ()), index * self.chunk_size())
 
-        def __len__(self):
-            return len(self.handlers)
+        def transaction(self, handler):
+            """
+            Returns the context manager that wraps a chunk of rows: a transaction if ``commit_every`` is set.
+            """
+            if not self.commit_every:
+                return contextlib.ExitStack()
+            return handler.atomic()
 
     class _ModelSpecs(object):
         """
@@ -99,13 +264,23 @@ class ModelWrapper:
             return "<ModelSpecs({}) {}>".format(self._model.__name__, ", ".join(
                 ["{}={}".format(field, getattr(self, field)) for field in self._fields]))
 
-    def __init__(self, *models):
+    def __init__(self, *models, bind=None, auto_specs=False):
         """
         Creates a wrapper around the *models* models that must be of the same type.
 
+        With *auto_specs*, every value field (except the primary keys) gets a default specification, inferred from its
+        type, its constraints (maximum length, choices, uniqueness) and its name (``email``, ``username``,
+        ``first_name``, ``age``, ...). The inferred specifications are the built-in ``BatchFieldSpec`` subclasses, which
+        generate a whole column of values at once. They can be replaced afterwards, as usual. The fields of unsupported
+        types are left without specification.
+
         :param models: The models to be wrapped and used afterwards for generating instances.
+        :param bind: the engine used for SQLAlchemy models. Not needed for peewee and Django models, or when the
+                     metadata of the SQLAlchemy models is bound to an engine.
+        :param auto_specs: if ``True``, the specifications of the fields are inferred from the models.
         :raises ValueError: when the models are not of the same type (belong to different ORMs)
         """
+        self._bind = bind
 
         # used for determining how many instances of each model should generate
         self._initial_order = models
@@ -120,13 +295,108 @@ class ModelWrapper:
             model: self._ModelSpecs(self._handlers[model]) for model in models
             }
 
-        # flags that shows if a specific model was processed or not
-        self._processed = {
-            model: False for model in models
-            }
+        # guards the loading of the key pools when the models are generated in parallel
+        self._key_pools_lock = threading.Lock()
+
+        # the backpressure statistics of the last pipelined generation
+        self.pipeline_stats = {}
+
+        # the UniqueFilters of the unique fields of every model, created by every generation
+        self._unique_filters = {}
+
+        # the GenerationObservers notified by every generation, and the GenerationStats of the last one
+        self._observers = []
+        self._stats = None
 
         self._validate_models()
 
+        if auto_specs:
+            self._infer_specs()
+
+    def add_observer(self, observer):
+        """
+        Registers a ``GenerationObserver``, notified of the progress of every generation (the start and the end of
+        every model, every generated and persisted batch of rows).
+        """
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        """
+        Unregisters an observer added by ``add_observer``.
+        """
+        self._observers.remove(observer)
+
+    def stats(self):
+        """
+        Returns the ``GenerationStats`` of the last generation (``generate``, ``agenerate``, ``generate_to`` or
+        ``dump_sql``), or ``None`` before the first one. It holds a ``ModelStats`` for every model, with the number of
+        rows per second, the latencies of generating and persisting the batches, the time spent on every field and
+        the number of replaced duplicates.
+        """
+        return self._stats
+
+    def _progress_reporter(self, progress):
+        """
+        Returns the observer reporting the progress for the *progress* argument of a generation, or ``None``. Only
+        for internal use.
+        """
+        if not progress:
+            return None
+        if progress is True:
+            progress = "logging"
+        if isinstance(progress, str):
+            if progress not in PROGRESS_REPORTERS:
+                raise ValueError("Unknown progress reporter '{}'. Expected one of {}".format(
+                    progress, tuple(PROGRESS_REPORTERS)))
+            return PROGRESS_REPORTERS[progress]()
+        return progress
+
+    def _start_stats(self, reporter=None):
+        """
+        Creates the ``GenerationStats`` of a new generation, notifying the registered observers and the progress
+        *reporter*. Only for internal use.
+        """
+        observers = self._observers + [reporter] if reporter is not None else self._observers
+        self._stats = GenerationStats(observers)
+        self._stats.start()
+        return self._stats
+
+    def _end_model_stats(self, stats, model_stats, builder):
+        """
+        Records the end of the generation of a model, generated by *builder*. Only for internal use.
+        """
+        retries = sum(unique_filter.duplicates
+                      for unique_filter in self._unique_filters.get(model_stats.model, {}).values())
+        stats.end_model(model_stats, builder.field_times, retries)
+
+    def _timed_batches(self, stats, model_stats, batches):
+        """
+        Yields the batches of rows of *batches*, recording the time spent generating every one. Only for internal
+        use.
+        """
+        batches = iter(batches)
+        while True:
+            start = time.perf_counter()
+            rows = next(batches, None)
+            if rows is None:
+                return
+            stats.batch_generated(model_stats, len(rows), time.perf_counter() - start)
+            yield rows
+
+    def _infer_specs(self):
+        """
+        Sets the inferred specification of every value field of every model. Only for internal use.
+        """
+        for model, handler in self._handlers.items():
+            plan = handler.field_plan
+            for field_name in plan.value_fields:
+                if field_name == plan.primary_key:
+                    continue
+                field_spec = infer_field_spec(field_name, handler.get_field_info(field_name),
+                                              unique=handler.is_unique_field(field_name))
+                if field_spec is not None:
+                    setattr(self._specs[model], field_name, field_spec)
+
     def _validate_models(self):
         handler_types = set()
         for model in self._handlers:
@@ -153,17 +423,24 @@ class ModelWrapper:
         if django and issubclass(model, DjangoModel):
             return DjangoHandler(model)
 
-    def _model_has_unresolved_reference(self, model):
+        if sqlalchemy and isinstance(getattr(model, "__table__", None), sqlalchemy.Table):
+            return SqlalchemyHandler(model, bind=self._bind)
+
+    def plan(self, cycles="error"):
         """
-        Determines if the model has unresolved referenced models. This is needed because in order to generate
-        instances of a model, first we must generate instances of the models that are referenced through foreign keys.
+        Returns the order in which the models are generated, as an ``ExecutionPlan``: the models are grouped in
+        levels, every model being generated after the models it references through foreign keys. Useful for
+        inspecting large schemas before generating.
+
+        :param cycles: what to do when the foreign keys form a cycle (see ``generate``).
+        :raises CyclicDependencyError: when there is a cycle and *cycles* is ``"error"``, or when the cycle can't be
+                                       broken because none of its foreign keys is nullable.
         """
-        for ref_model in self._handlers[model].ref_models:
-            if not self._processed[ref_model]:
-                return True
-        return False
+        return DependencyScheduler([self._handlers[model] for model in self._initial_order], cycles).plan()
 
-    def generate(self, *counts):
+    def generate(self, *counts, batch_size=None, commit_every=None, workers=None, pipeline=False, queue_size=8,
+                 load="orm", cycles="error", parallel=False, seed=None, checkpoint=None, shard=None, unique="retry",
+                 profile=None, progress=True):
         """
         Generates and persists items. *counts* is a list of integers that indicate how many instances of each model
         should generate. The order is preserved from the models specified in constructor.
@@ -176,47 +453,781 @@ class ModelWrapper:
 
         will generate 10 instances of ``Model1``, 20 instances of ``Model2`` and 15 instances of ``Model3``.
 
+        When *batch_size* is given, the generated rows are buffered and flushed to the database in chunks of
+        *batch_size* rows through a single multi-row insert (see ``BaseHandler.create_rows_bulk``) instead of
+        one ``INSERT`` per instance.
+
+        When *commit_every* is given, the instances of each model are generated inside explicit transactions
+        (``database.atomic()`` for peewee, ``transaction.atomic()`` for Django) that are committed every
+        *commit_every* rows, instead of relying on autocommit for every row.
+
+        If a ``FieldSpec`` (or the database) raises an exception while generating, the transaction that is open at
+        that moment is rolled back, so the rows generated since the last commit are discarded. The chunks committed
+        before are kept and the exception is propagated to the caller. Without *commit_every*, every row (or every
+        batch, when *batch_size* is set) that was persisted before the error is kept.
+
+        When *workers* is given, the values of the fields are generated in batches by a pool of *workers* processes,
+        while the current process only assigns the foreign keys and persists the rows. Every batch is generated with
+        its own seed, derived from the ``random`` module of the current process, so seeding it makes the output
+        reproducible regardless of the number of workers. The field specifications must be picklable (no lambdas or
+        local functions). The unique ``Pooled`` specifications are resolved by the current process, so every value
+        of their pool is still used once.
+
+        When *pipeline* is ``True``, the rows of every model are generated and persisted concurrently: the current
+        thread generates batches of rows and puts them into a queue of at most *queue_size* batches, while a separate
+        thread (with its own database connection) persists them. The backpressure statistics of every model (see
+        ``PipelineStats``) are available in ``wrapper.pipeline_stats`` afterwards.
+
+        When *load* is ``"copy"``, the rows bypass the ORM and are loaded through the database connection with the
+        fastest method available (see ``BaseHandler.bulk_load``): ``COPY FROM STDIN`` for PostgreSQL, or a prepared
+        ``executemany`` with ``PRAGMA synchronous=OFF`` and ``PRAGMA journal_mode=MEMORY`` for SQLite (the previous
+        settings are restored at the end). The stored rows are identical to the ones persisted through the ORM.
+
+        The models are generated in the order given by ``plan()``. When their foreign keys form a cycle (for example
+        a self-referencing foreign key), a ``CyclicDependencyError`` is raised, unless *cycles* is ``"defer"``. In
+        this case, the foreign keys that break the cycles (they must be nullable) are inserted as NULL and filled with
+        an ``UPDATE`` after all the models are generated. Note that all the rows having NULL in such a field are
+        filled, not only the generated ones.
+
+        When *parallel* is set, the models of every level of the plan (which don't depend on each other) are generated
+        at the same time, by a pool of threads. Every thread uses its own database connection, closed when its model
+        is done. ``True`` uses a thread for every model of the level, while an integer limits the number of threads.
+        The same ``ForeignKeySpec`` instance must not be shared by models of the same level in this mode.
+
+        When *seed* is given, the random number generators (``random``, NumPy and Faker) are seeded again at the
+        beginning of every chunk of *commit_every* rows (of *batch_size* rows, without *commit_every*), with a seed
+        derived from *seed*, the name of the model and the index of the chunk. The same seed and the same options
+        generate the same rows, and a chunk doesn't depend on the ones before it, so chunks can be generated on
+        different machines: the positions of the unique ``Pooled`` values and of the ``"round_robin"`` and ``"fixed"``
+        foreign keys are derived from the index of the rows, and the pools are filled with their own derived seed. The
+        custom specifications must draw their values from ``random``, NumPy or Faker and keep no other state, and the
+        ``Pooled`` values filled in the background are not reproducible. The foreign keys are picked from the primary
+        keys of the referenced models in ascending order, so they are reproducible as long as the referenced tables have
+        the same rows. It can't be combined with *parallel*.
+
+        When *checkpoint* is given, the index of every chunk is recorded in this JSON file after the transaction of the
+        chunk is committed. If the generation is interrupted, calling ``generate`` again with the same counts, seed
+        and *commit_every* skips the chunks that were committed, and resumes from the first missing one. Together with
+        *seed*, the resumed run stores the same rows as an uninterrupted one. The file is removed when the generation
+        is complete.
+
+        When *shard* is given as ``(i, n)``, only the *i*-th of *n* disjoint slices of the rows of every model is
+        generated, so *n* processes (or machines) can generate the data set together, without any coordination. The rows
+        of every model are numbered from 1 to the count of the model and split in *n* contiguous ranges (of chunks of
+        *commit_every* rows, or of *batch_size* rows with *seed*), and the primary keys are set explicitly, so the
+        tables must be empty at the beginning. The foreign keys are picked from all the keys of the referenced model,
+        including the ones inserted by the other shards, so the foreign key constraints must be disabled (or deferred)
+        until all the shards are done, and nothing is deferred by *cycles*. Together with the same *seed* and
+        *batch_size* (and *commit_every*, if any), the shards generate exactly the rows of a generation without *shard*,
+        with the same restrictions on the specifications as the seed: the positions of the unique ``Pooled`` values and
+        of the ``"round_robin"`` and ``"fixed"`` foreign keys start at the first row of every shard, and a sharded call
+        doesn't move them, so the shards of a data set can be generated one after another by the same wrapper.
+
+        The fields with a unique constraint (detected from the metadata of the models) get unique values: the values
+        stored in the table are loaded at the beginning, and every generated value is checked against the values seen
+        so far (only their hashes are kept in memory, see ``SeenSet``). With *unique* set to ``"retry"``, a duplicate
+        is replaced by a new value of the specification, and a ``ValueError`` is raised if no unique value can be
+        found after 100 attempts. With ``"suffix"``, the string duplicates get a ``-<n>`` suffix instead. ``None``
+        disables the checks. The uniqueness is not checked across shards.
+
+        The statistics of the generation are available through ``stats()`` afterwards, and the observers registered
+        by ``add_observer`` are notified while it runs. When *profile* is ``"cprofile"``, the current thread is
+        profiled by ``cProfile`` (``stats().profile``), which shows if the time is spent in the specifications (for
+        example Faker) or in the database driver. When it is ``"tracemalloc"``, the allocated memory is traced
+        (``stats().memory`` and ``stats().memory_peak``). Both slow down the generation.
+
+        The progress of every model (rows done, rows per second and estimated time left) is reported through
+        *progress*: ``True`` (or ``"logging"``) logs it at the ``INFO`` level of the ``fillmydb.core.progress``
+        logger every 5 seconds (see ``LoggingProgress``), ``"tqdm"`` shows progress bars (see ``TqdmProgress``), and a
+        ``GenerationObserver`` (for example a ``LoggingProgress`` with another interval) is used as it is. ``False``
+        disables it.
+
         :param counts: the quantity of each item to be generated.
+        :param batch_size: how many rows are inserted at once. ``None`` persists every instance separately.
+        :param commit_every: how many rows are generated in a transaction. ``None`` uses the autocommit mode of the
+                             connection.
+        :param workers: how many processes generate the values of the fields. ``None`` generates them in the
+                        current process.
+        :param pipeline: if ``True``, the rows are persisted by a separate thread while the next ones are generated.
+        :param queue_size: how many batches of rows may wait to be persisted in pipeline mode.
+        :param load: ``"orm"`` persists the rows through the ORM, ``"copy"`` loads them through the database
+                     connection.
+        :param cycles: ``"error"`` or ``"defer"``.
+        :param parallel: ``True`` or the maximum number of models generated at the same time.
+        :param seed: an integer that makes the generated values reproducible.
+        :param checkpoint: the path of the file in which the committed chunks are recorded, for resuming an
+                           interrupted generation. Requires *commit_every*.
+        :param shard: a tuple ``(i, n)``, for generating the *i*-th of *n* slices of the rows.
+        :param unique: ``"retry"``, ``"suffix"`` or ``None``.
+        :param profile: ``None``, ``"cprofile"`` or ``"tracemalloc"``.
+        :param progress: ``True``, ``False``, ``"logging"``, ``"tqdm"`` or a ``GenerationObserver``.
         :return: None
         """
         if len(counts) != len(self._initial_order):
             raise ValueError("The number of count items does not match the model count")
+        reporter = self._progress_reporter(progress)
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError("Unknown profile mode '{}'. Expected one of {}".format(profile, PROFILE_MODES))
+        if load not in self.LOAD_MODES:
+            raise ValueError("Unknown load mode '{}'. Expected one of {}".format(load, self.LOAD_MODES))
+        if seed is not None and parallel:
+            raise ValueError("The models can't be generated in parallel with a seed")
+        if checkpoint and (not commit_every or pipeline):
+            raise ValueError("A checkpoint requires commit_every and can't be used in pipeline mode")
+        if shard is not None and not (len(shard) == 2 and 0 <= shard[0] < shard[1]):
+            raise ValueError("Invalid shard {}. Expected a tuple (i, n) with 0 <= i < n".format(shard))
+
+        if checkpoint:
+            checkpoint = Checkpoint(checkpoint, seed, [(model.__name__, count)
+                                                       for model, count in zip(self._initial_order, counts)],
+                                    commit_every, shard)
+
+        self.pipeline_stats = {}
+        self._prepare_unique_filters(unique)
+        options = self._GenerationOptions(batch_size, commit_every, workers=workers, pipeline=pipeline,
+                                          queue_size=queue_size, load=load, plan=self.plan(cycles),
+                                          parallel=parallel, seed=seed, checkpoint=checkpoint, shard=shard)
+        options.stats = self._start_stats(reporter)
+        with profiling(options.stats, profile):
+            if workers:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                    options.executor = executor
+                    self._generate_all(counts, options)
+            else:
+                self._generate_all(counts, options)
+        options.stats.end()
+
+        if checkpoint:
+            checkpoint.remove()
+
+    def _generate_all(self, counts, options):
+        """
+        Generates the instances of all the models, in the order given by the execution plan, then fills the deferred
+        foreign keys. Only for internal use.
+        :param counts:
+        :param options: a ``_GenerationOptions`` instance.
+        :return:
+        """
+        # the key pools are loaded again after the referenced models get new instances
+        for handler in self._handlers.values():
+            handler.key_pool = None
+        if options.shard is not None:
+            self._number_primary_keys(counts)
 
-        queue = self._ProcessingQueue(*self._handlers.values())
-        queue.initial_order()
-        while len(queue) != 0:
-            item = queue.get_next_item()
-            if self._model_has_unresolved_reference(item.model):
-                queue.put_item_back(item)
+        for level in options.plan.levels:
+            if not options.parallel or len(level) == 1:
+                for model in level:
+                    self._generate_model(model, counts[self._initial_order.index(model)], options)
                 continue
 
-            count = counts[self._initial_order.index(item.model)]
-            print("Generating {} instances of {}".format(count, item.model.__name__))
-            self._generate_instances(item, count)
-            self._processed[item.model] = True
+            threads = len(level) if options.parallel is True else min(options.parallel, len(level))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=threads,
+                                                       thread_name_prefix="fillmydb-generate") as executor:
+                futures = [executor.submit(self._generate_model_in_thread, model,
+                                           counts[self._initial_order.index(model)], options) for model in level]
+                # waits for all the models and raises the first error
+                for future in futures:
+                    future.result()
+
+        if options.shard is None:
+            self._fill_deferred_fields(options.plan, options.seed)
+
+    def _generate_model(self, model, count, options):
+        """
+        Generates *count* instances of *model*. Only for internal use.
+        """
+        logger.info("Generating %d instances of %s", count, model.__name__)
+        handler = self._handlers[model]
+        model_stats = options.stats.start_model(model, count, handler.field_plan.referenced_models)
+        options.model_stats[model] = model_stats
+        deferred = options.deferred_fields(model)
+        builder = self._compile_row_builder(handler, deferred, explicit_keys=options.shard is not None)
+        options.row_builders[model] = builder
+        self._fill_pools(handler, options.seed)
+        cursors = options.cursors[model] = self._spec_cursors(handler, deferred)
+        try:
+            self._generate_instances(handler, count, options)
+        except BaseException:
+            # the rolled back rows didn't use their values, a resumed generation uses them again
+            _seek_cursors(cursors, 0)
+            raise
+        # the shards of a data set take their values from the positions of a single generation, even when they are
+        # generated one after another by the same process
+        _seek_cursors(cursors, count if options.shard is None else 0)
+        self._end_model_stats(options.stats, model_stats, builder)
+
+    def _generate_model_in_thread(self, model, count, options):
+        """
+        Generates the instances of *model* in a thread of the pool used for parallel generation, closing the
+        database connection of the thread at the end. Only for internal use.
+        """
+        try:
+            self._generate_model(model, count, options)
+        finally:
+            self._handlers[model].close_connection()
+
+    def _fill_deferred_fields(self, plan, seed=None):
+        """
+        Fills the foreign keys that were deferred for breaking the cycles, for all the rows in which they are NULL.
+        Only for internal use.
+        :param plan: the ``ExecutionPlan``
+        :param seed: the seed of the generation, if any.
+        :return:
+        """
+        for model, fields in plan.deferred.items():
+            handler = self._handlers[model]
+            for field_name in fields:
+                if seed is not None:
+                    _seed_random_generators(derive_seed(seed, model.__name__, "deferred", field_name))
+                keys = compact_keys(handler.get_primary_keys_where_null(field_name))
+                if not keys:
+                    continue
+                key_pool = self._get_key_pool(self._handlers[handler.field_plan.referenced_models[field_name]])
+                with handler.atomic():
+                    for start in range(0, len(keys), self.DEFERRED_BATCH_SIZE):
+                        chunk = keys[start:start + self.DEFERRED_BATCH_SIZE]
+                        values = self._sample_foreign_keys(model, field_name, key_pool, len(chunk))
+                        handler.update_field_values(field_name, list(zip(chunk, values)))
+
+    def _sample_foreign_keys(self, model, field_name, key_pool, count):
+        """
+        Picks *count* keys from *key_pool* for the *field_name* foreign key of *model*, according to its
+        specification. Only for internal use.
+        """
+        field_spec = getattr(self._specs[model], field_name)
+        if not field_spec:
+            return key_pool.sample(count)
+        return field_spec.sample(key_pool, count)
+
+    def generate_to(self, path, *counts, format="csv", batch_size=None, cycles="error", shard=None, unique="retry",
+                    progress=True):
+        """
+        Generates the instances into files instead of the database: a file per table, named after the table, in the
+        *path* directory (created if needed). The rows are streamed to the files in batches of *batch_size* rows, so
+        the memory doesn't depend on the number of generated rows. The files can be loaded afterwards with the native
+        tools of the databases, in the order given by ``plan()``.
+
+        Supported formats:
 
-    def _generate_instances(self, handler, count):
+        - ``"csv"``: a header with the column names, followed by the rows (NULL is an empty field, and an empty string
+          a quoted empty field).
+        - ``"jsonl"``: a JSON object per row.
+        - ``"parquet"``: requires ``pyarrow``.
+
+        The primary keys are numbered from 1 (their specifications are ignored), and the foreign keys are picked from
+        these numbers, without querying the database. The tables are still created by the handlers, as for
+        ``generate``, but nothing is written to them. The foreign keys deferred by *cycles* are written directly,
+        because all the keys are known upfront, so loading tables with cyclic references requires deferred
+        constraints.
+
+        When *shard* is given as ``(i, n)``, only the *i*-th of *n* contiguous slices of the rows of every model is
+        written, to files named ``<table>.<i>.<format>``, with the primary keys the rows have without sharding. The
+        files of the *n* shards together hold a complete data set.
+
+        :param path: the directory in which the files are written.
+        :param counts: the quantity of each item to be generated.
+        :param format: ``"csv"``, ``"jsonl"`` or ``"parquet"``.
+        :param batch_size: how many rows are generated and written at once.
+        :param cycles: ``"error"`` or ``"defer"`` (see ``generate``).
+        :param shard: a tuple ``(i, n)``, for writing the *i*-th of *n* slices of the rows.
+        :param unique: how the values of the unique fields are kept unique (see ``generate``).
+        :param progress: how the progress is reported (see ``generate``).
+        :return: a dict mapping the models to the paths of their files.
+        """
+        if len(counts) != len(self._initial_order):
+            raise ValueError("The number of count items does not match the model count")
+        reporter = self._progress_reporter(progress)
+        if format not in WRITERS:
+            raise ValueError("Unknown format '{}'. Expected one of {}".format(format, tuple(WRITERS)))
+        if shard is not None and not (len(shard) == 2 and 0 <= shard[0] < shard[1]):
+            raise ValueError("Invalid shard {}. Expected a tuple (i, n) with 0 <= i < n".format(shard))
+
+        writer_class = WRITERS[format]
+        shard, shards = shard if shard is not None else (None, 1)
+        self._prepare_unique_filters(unique, load_existing=False)
+        batch_size = batch_size or self.GENERATION_BATCH_SIZE
+        plan = self.plan(cycles)
+        os.makedirs(path, exist_ok=True)
+
+        self._number_primary_keys(counts)
+
+        stats = self._start_stats(reporter)
+        paths = {}
+        for model in plan.order:
+            handler = self._handlers[model]
+            count = counts[self._initial_order.index(model)]
+            file_name = [handler.get_table_name(), writer_class.EXTENSION]
+            start, end = 0, count
+            if shard is not None:
+                file_name.insert(1, str(shard))
+                start, end = count * shard // shards, count * (shard + 1) // shards
+            paths[model] = os.path.join(path, ".".join(file_name))
+            logger.info("Generating %d instances of %s", end - start, model.__name__)
+
+            model_stats = stats.start_model(model, end - start, handler.field_plan.referenced_models)
+            builder = self._compile_row_builder(handler, explicit_keys=True)
+            self._fill_pools(handler)
+            cursors = self._spec_cursors(handler)
+            _seek_cursors(cursors, start)
+            with writer_class(paths[model], list(builder.columns)) as writer:
+                batches = self._iter_numbered_rows(builder, end - start, batch_size, first_key=start + 1)
+                for rows in self._timed_batches(stats, model_stats, batches):
+                    started = time.perf_counter()
+                    writer.write(rows)
+                    stats.batch_persisted(model_stats, len(rows), time.perf_counter() - started)
+            _seek_cursors(cursors, count if shard is None else 0)
+            self._end_model_stats(stats, model_stats, builder)
+        stats.end()
+        return paths
+
+    def dump_sql(self, path, *counts, dialect="sqlite", statement_size=1000, batch_size=None, cycles="error",
+                 unique="retry", progress=True):
+        """
+        Generates the instances into a SQL script instead of the database. The script inserts the rows through
+        multi-row ``INSERT INTO ... VALUES (...), (...), ...`` statements of at most *statement_size* rows, in the
+        order given by ``plan()``, inside a single transaction. It can be replayed at native speed by the client of
+        the database, for example::
+
+            wrapper.dump_sql("seed.sql", 1000000, 10000000, 50000000, dialect="postgresql")
+
+        and then ``psql -f seed.sql`` (or ``sqlite3 data.db < seed.sql``) on every machine that needs the data.
+
+        The identifiers and the values are quoted for the *dialect*. As for ``generate_to``, the primary keys are
+        numbered from 1, the foreign keys are picked from these numbers and the rows are streamed to the file, so the
+        memory doesn't depend on the number of generated rows. The foreign keys deferred by *cycles* are inserted as
+        NULL and set by ``UPDATE`` statements at the end of the script. The tables are not created by the script.
+
+        :param path: the path of the written script.
+        :param counts: the quantity of each item to be generated.
+        :param dialect: ``"sqlite"``, ``"postgresql"`` or ``"mysql"``.
+        :param statement_size: how many rows are inserted (or updated) by a statement.
+        :param batch_size: how many rows are generated at once.
+        :param cycles: ``"error"`` or ``"defer"`` (see ``generate``).
+        :param unique: how the values of the unique fields are kept unique (see ``generate``).
+        :param progress: how the progress is reported (see ``generate``).
+        :return: None
+        """
+        if len(counts) != len(self._initial_order):
+            raise ValueError("The number of count items does not match the model count")
+        reporter = self._progress_reporter(progress)
+        if dialect not in SQL_DIALECTS:
+            raise ValueError("Unknown dialect '{}'. Expected one of {}".format(dialect, tuple(SQL_DIALECTS)))
+
+        batch_size = batch_size or self.GENERATION_BATCH_SIZE
+        plan = self.plan(cycles)
+        self._number_primary_keys(counts)
+        self._prepare_unique_filters(unique, load_existing=False)
+
+        stats = self._start_stats(reporter)
+        with SqlScriptWriter(path, SQL_DIALECTS[dialect], statement_size) as writer:
+            for model in plan.order:
+                handler = self._handlers[model]
+                count = counts[self._initial_order.index(model)]
+                logger.info("Generating %d instances of %s", count, model.__name__)
+
+                model_stats = stats.start_model(model, count, handler.field_plan.referenced_models)
+                builder = self._compile_row_builder(handler, plan.deferred_fields(model), explicit_keys=True)
+                columns = list(builder.columns)
+                batches = self._iter_numbered_rows(builder, count, batch_size)
+                for rows in self._timed_batches(stats, model_stats, batches):
+                    started = time.perf_counter()
+                    writer.insert(handler.get_table_name(), columns, rows)
+                    stats.batch_persisted(model_stats, len(rows), time.perf_counter() - started)
+                self._end_model_stats(stats, model_stats, builder)
+
+            for model, fields in plan.deferred.items():
+                handler = self._handlers[model]
+                count = len(handler.key_pool)
+                key_column = handler.get_column_name(handler.field_plan.primary_key)
+                for field_name in fields:
+                    key_pool = self._handlers[handler.field_plan.referenced_models[field_name]].key_pool
+                    for start in range(0, count, batch_size):
+                        size = min(batch_size, count - start)
+                        values = self._sample_foreign_keys(model, field_name, key_pool, size)
+                        writer.update(handler.get_table_name(), key_column, handler.get_column_name(field_name),
+                                      list(zip(range(start + 1, start + size + 1), values)))
+        stats.end()
+
+    def _number_primary_keys(self, counts):
+        """
+        Replaces the key pools of all the models with the keys 1..count, the primary keys of the rows written to
+        files. Only for internal use.
+        """
+        for model, count in zip(self._initial_order, counts):
+            self._handlers[model].key_pool = KeyPool(model, range(1, count + 1))
+
+    def _iter_numbered_rows(self, builder, count, batch_size, first_key=1):
+        """
+        Yields lists of at most *batch_size* rows generated by *builder* (compiled with ``explicit_keys``), with the
+        primary keys numbered from *first_key*. Only for internal use.
+        """
+        for start in range(0, count, batch_size):
+            yield builder.build(min(batch_size, count - start), first_key=first_key + start)
+
+    async def agenerate(self, *counts, batch_size=1000, max_in_flight=4, cycles="error", unique="retry",
+                        progress=True):
+        """
+        Asynchronous version of ``generate``, for asynchronous database drivers. The rows are generated in batches of
+        *batch_size* rows and persisted through the asynchronous hooks of the handlers (``acreate_rows_bulk``),
+        keeping up to *max_in_flight* batches in flight, so several inserts run at the same time on the connection
+        pool of the driver.
+
+        SQLAlchemy models are persisted natively when the wrapper is bound to an ``AsyncEngine`` (for example
+        ``create_async_engine("sqlite+aiosqlite:///data.db")``), Django models through the asynchronous ORM interface
+        (Django 4.1+). The other handlers run their synchronous methods in the default executor of the event loop.
+
+        Every batch is inserted in its own transaction, and the first error cancels the batches in flight and is
+        raised.
+
+        :param counts: the quantity of each item to be generated.
+        :param batch_size: how many rows are inserted at once.
+        :param max_in_flight: how many batches may be inserted at the same time.
+        :param cycles: ``"error"`` or ``"defer"`` (see ``generate``).
+        :param unique: how the values of the unique fields are kept unique (see ``generate``).
+        :param progress: how the progress is reported (see ``generate``).
+        :return: None
+        """
+        if len(counts) != len(self._initial_order):
+            raise ValueError("The number of count items does not match the model count")
+        reporter = self._progress_reporter(progress)
+
+        plan = self.plan(cycles)
+        for handler in self._handlers.values():
+            handler.key_pool = None
+            await handler.acreate_table_if_not_exists()
+
+        self._prepare_unique_filters(unique, load_existing=False)
+        for model, filters in self._unique_filters.items():
+            for field_name, unique_filter in filters.items():
+                async for value in self._handlers[model].aget_field_values(field_name):
+                    unique_filter.seen.add(value)
+
+        stats = self._start_stats(reporter)
+        for model in plan.order:
+            handler = self._handlers[model]
+            deferred = plan.deferred_fields(model)
+            for field_name, ref_model in handler.field_plan.referenced_models.items():
+                if field_name not in deferred:
+                    ref_handler = self._handlers[ref_model]
+                    if ref_handler.key_pool is None:
+                        await ref_handler.aload_key_pool()
+
+            count = counts[self._initial_order.index(model)]
+            logger.info("Generating %d instances of %s", count, model.__name__)
+            model_stats = stats.start_model(model, count, handler.field_plan.referenced_models)
+            builder = self._compile_row_builder(handler, deferred)
+            await self._agenerate_instances(builder, handler, count, batch_size, max_in_flight, model_stats)
+            self._end_model_stats(stats, model_stats, builder)
+
+        for model, fields in plan.deferred.items():
+            handler = self._handlers[model]
+            for field_name in fields:
+                keys = await handler.aget_primary_keys_where_null(field_name)
+                if not keys:
+                    continue
+                ref_handler = self._handlers[handler.field_plan.referenced_models[field_name]]
+                if ref_handler.key_pool is None:
+                    await ref_handler.aload_key_pool()
+                for start in range(0, len(keys), self.DEFERRED_BATCH_SIZE):
+                    chunk = keys[start:start + self.DEFERRED_BATCH_SIZE]
+                    values = self._sample_foreign_keys(model, field_name, ref_handler.key_pool, len(chunk))
+                    await handler.aupdate_field_values(field_name, list(zip(chunk, values)))
+        stats.end()
+
+    async def _agenerate_instances(self, builder, handler, count, batch_size, max_in_flight, model_stats):
+        """
+        Generates *count* instances of the model wrapped in *handler*, keeping up to *max_in_flight* batches in
+        flight. Only for internal use.
+        """
+        slots = asyncio.Semaphore(max_in_flight)
+        in_flight = set()
+
+        stats = self._stats
+
+        async def persist(rows):
+            try:
+                started = time.perf_counter()
+                await handler.acreate_rows_bulk(builder.fields_names, rows)
+                stats.batch_persisted(model_stats, len(rows), time.perf_counter() - started)
+            finally:
+                slots.release()
+
+        try:
+            for start in range(0, count, batch_size):
+                await slots.acquire()
+                for task in [task for task in in_flight if task.done()]:
+                    in_flight.discard(task)
+                    # raises the error of a failed batch
+                    task.result()
+                started = time.perf_counter()
+                rows = builder.build(min(batch_size, count - start))
+                stats.batch_generated(model_stats, len(rows), time.perf_counter() - started)
+                in_flight.add(asyncio.ensure_future(persist(rows)))
+            await asyncio.gather(*in_flight)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+
+    def _generate_instances(self, handler, count, options):
         """
         Generates *count* instances of the model wrapped in *handler*. Only for internal use.
         :param handler:
         :param count:
+        :param options: a ``_GenerationOptions`` instance. If ``commit_every`` is set, the rows are generated in
+                        transactions of ``commit_every`` rows.
+        :return:
+        """
+        if options.pipeline:
+            self._generate_pipelined(handler, count, options)
+            return
+
+        checkpoint = options.checkpoint
+        with options.loading(handler):
+            for index, chunk, first_key in options.chunks(count):
+                if checkpoint and checkpoint.is_done(handler.model, index):
+                    continue
+                options.start_chunk(handler.model, index)
+                with options.transaction(handler):
+                    self._generate_chunk(handler, chunk, options, first_key)
+                if checkpoint:
+                    checkpoint.mark_done(handler.model, index)
+
+    def _generate_chunk(self, handler, count, options, first_key=None):
+        """
+        Generates and persists *count* instances of the model wrapped in *handler*. All the buffered rows are flushed
+        before returning, so a chunk never spans over two transactions. Only for internal use.
+        :param handler:
+        :param count:
+        :param options: a ``_GenerationOptions`` instance.
+        :param first_key: the primary key of the first row, if the keys are set explicitly.
+        :return:
+        """
+        batch_size = options.batch_size or self.GENERATION_BATCH_SIZE
+        batches = self._iter_batches(handler, count, batch_size, options, first_key)
+        for rows in self._timed_batches(options.stats, options.model_stats[handler.model], batches):
+            self._persist_rows(handler, rows, options)
+
+    def _persist_rows(self, handler, rows, options):
+        """
+        Persists the generated *rows* (tuples of the ``RowBuilder`` of the model), in bulk if ``options.batch_size``
+        is set. Only for internal use.
+        :param handler:
+        :param rows:
+        :param options:
+        :return:
+        """
+        builder = options.row_builders[handler.model]
+        started = time.perf_counter()
+        if options.load == "copy":
+            handler.bulk_load_rows(builder.fields_names, rows)
+        elif options.batch_size:
+            handler.create_rows_bulk(builder.fields_names, rows)
+        else:
+            for row in builder.as_dicts(rows):
+                handler.create_instance_and_persist(**row)
+        options.stats.batch_persisted(options.model_stats[handler.model], len(rows), time.perf_counter() - started)
+
+    def _generate_pipelined(self, handler, count, options):
+        """
+        Generates the rows in the current thread and persists them in a separate thread, connected by a bounded
+        queue. Only for internal use.
+        :param handler:
+        :param count:
+        :param options:
+        :return:
+        """
+        stats = PipelineStats(handler.model)
+        self.pipeline_stats[handler.model] = stats
+        batches = BatchQueue(options.queue_size, stats)
+        errors = []
+        consumer = threading.Thread(target=self._persist_batches, args=(handler, count, options, batches, errors),
+                                    name="fillmydb-persist-{}".format(handler.model.__name__), daemon=True)
+        consumer.start()
+
+        batch_size = options.batch_size or self.GENERATION_BATCH_SIZE
+        def chunks():
+            # the batches never span over two chunks, so the consumer can commit after each chunk
+            for index, chunk, first_key in options.chunks(count):
+                options.start_chunk(handler.model, index)
+                yield self._iter_batches(handler, chunk, batch_size, options, first_key)
+        try:
+            generated = itertools.chain.from_iterable(chunks())
+            for rows in self._timed_batches(options.stats, options.model_stats[handler.model], generated):
+                if not batches.put(rows, consumer):
+                    break
+        finally:
+            # tells the consumer that there are no more batches, or that the generation failed
+            batches.put(None, consumer)
+            consumer.join()
+
+        if errors:
+            raise errors[0]
+
+    def _persist_batches(self, handler, count, options, batches, errors):
+        """
+        The persisting stage of the pipelined generation. Runs in a separate thread, so it uses its own database
+        connection, which is closed at the end. Only for internal use.
+        :param handler:
+        :param count:
+        :param options:
+        :param batches: the ``BatchQueue`` filled by the generating stage.
+        :param errors: a list in which the raised exception is stored, to be raised again by the generating stage.
+        :return:
+        """
+        try:
+            with options.loading(handler):
+                for _, chunk, _ in options.chunks(count):
+                    with options.transaction(handler):
+                        persisted = 0
+                        while persisted < chunk:
+                            rows = batches.get()
+                            if rows is None:
+                                # the generating stage failed, the open transaction must be rolled back
+                                raise PipelineAborted()
+                            self._persist_rows(handler, rows, options)
+                            persisted += len(rows)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            handler.close_connection()
+
+    def _iter_batches(self, handler, count, batch_size, options, first_key=None):
+        """
+        Yields lists of at most *batch_size* generated rows, *count* rows in total. Only for internal use.
+        :param handler:
+        :param count:
+        :param batch_size:
+        :param options: a ``_GenerationOptions`` instance. If it has an ``executor``, the values are generated by the
+                        worker processes.
+        :param first_key: if given, the primary keys of the rows are set explicitly, starting from it.
+        :return:
+        """
+        builder = options.row_builders[handler.model]
+        # the batches are computed lazily, so a generation of any size runs in constant memory
+        batches = ((min(batch_size, count - start), None if first_key is None else first_key + start)
+                   for start in range(0, count, batch_size))
+        if not options.executor:
+            for size, key in batches:
+                yield builder.build(size, first_key=key)
+            return
+
+        specs = self._specs[handler.model]
+        field_specs = {}
+        for field_name in handler.field_plan.value_fields:
+            field_spec = getattr(specs, field_name)
+            # the unique Pooled specifications hand out every value of their pool once, from a position that only
+            # the current process can keep, so they are resolved by the row builder instead of the workers
+            if not (isinstance(field_spec, Pooled) and field_spec.unique):
+                field_specs[field_name] = field_spec
+        # the seeds of the batches are derived from a base drawn before picking any foreign key, so the output
+        # doesn't depend on the number of workers
+        base_seed = random.getrandbits(64)
+        # keep a bounded number of batches in flight, so the generated rows don't pile up in memory when the
+        # database is slower than the workers
+        pending = collections.deque()
+        for index, (size, key) in enumerate(batches):
+            seed = derive_seed(base_seed, index)
+            pending.append((size, key, options.executor.submit(_resolve_value_columns, field_specs, size, seed)))
+            if len(pending) >= 2 * options.workers:
+                size, key, future = pending.popleft()
+                yield builder.build(size, future.result(), key)
+        while pending:
+            size, key, future = pending.popleft()
+            yield builder.build(size, future.result(), key)
+
+    def _prepare_unique_filters(self, mode, load_existing=True):
+        """
+        Creates the ``UniqueFilter`` of every unique value field that has a specification, with the values already
+        stored in the table if *load_existing* is set. Only for internal use.
+        :param mode: ``"retry"``, ``"suffix"`` or ``None``.
+        """
+        if mode is not None and mode not in UniqueFilter.MODES:
+            raise ValueError("Unknown unique mode '{}'. Expected one of {}".format(mode, UniqueFilter.MODES))
+
+        self._unique_filters = {}
+        if mode is None:
+            return
+        for model, handler in self._handlers.items():
+            for field_name in handler.field_plan.value_fields:
+                field_spec = getattr(self._specs[model], field_name)
+                if field_name == handler.field_plan.primary_key or not field_spec or \
+                        not handler.is_unique_field(field_name):
+                    continue
+                seen = SeenSet()
+                if load_existing:
+                    for value in handler.get_field_values(field_name):
+                        seen.add(value)
+                self._unique_filters.setdefault(model, {})[field_name] = UniqueFilter(model, field_name, field_spec,
+                                                                                      mode, seen)
+
+    def _compile_row_builder(self, handler, deferred=(), explicit_keys=False):
+        """
+        Compiles the current specifications of the model wrapped in *handler* into a ``RowBuilder``. The key pools of
+        the referenced models are loaded now, if needed. Only for internal use.
+        :param handler:
+        :param deferred: the foreign key fields that are generated as NULL and filled afterwards.
+        :param explicit_keys: if the primary keys are set explicitly when the rows are built.
+        :return: a ``RowBuilder``
+        """
+        return compile_row_builder(handler, self._specs[handler.model].get_field_specs(),
+                                   lambda model: self._get_key_pool(self._handlers[model]),
+                                   self._unique_filters.get(handler.model), deferred, explicit_keys)
+
+    def _fill_pools(self, handler, seed=None):
+        """
+        Fills the pools of the ``Pooled`` specifications of the model wrapped in *handler*, before its first chunk, so
+        the pools don't depend on the chunk from which the generation starts. Only for internal use.
+        :param seed: the seed of the generation, if any, from which the seed of every pool is derived.
+        """
+        specs = self._specs[handler.model]
+        for field_name in handler.field_plan.value_fields:
+            field_spec = getattr(specs, field_name)
+            if isinstance(field_spec, Pooled):
+                if seed is not None:
+                    _seed_random_generators(derive_seed(seed, handler.model.__name__, "pool", field_name))
+                field_spec.fill()
+
+    def _spec_cursors(self, handler, deferred=()):
+        """
+        Returns the specifications of the model wrapped in *handler* that generate their values from a position (the
+        unique ``Pooled`` pools, the ``"round_robin"`` and ``"fixed"`` foreign keys), as ``(seek, base)`` tuples:
+        ``seek(base + n)`` moves the specification to the value of the n-th generated row. Only for internal use.
+        :param handler:
+        :param deferred: the foreign key fields that are generated as NULL and filled afterwards.
+        :return: a list of tuples.
+        """
+        plan = handler.field_plan
+        specs = self._specs[handler.model]
+        cursors = []
+        for field_name in plan.fields_names:
+            field_spec = getattr(specs, field_name)
+            if field_name in deferred:
+                continue
+            if isinstance(field_spec, ForeignKeySpec) and field_name in plan.referenced_models:
+                # the keys are picked from a reloaded key pool, which resets the position
+                key_pool = self._get_key_pool(self._handlers[plan.referenced_models[field_name]])
+                cursors.append((functools.partial(field_spec.seek, key_pool=key_pool), 0))
+            elif isinstance(field_spec, Pooled) and field_spec.unique:
+                cursors.append((field_spec.seek, field_spec.position))
+        return cursors
+
+    def _get_key_pool(self, handler):
+        """
+        Returns the pool of primary keys of the model wrapped in *handler*, loading it with a single query the first
+        time it is needed. Only for internal use.
+        :param handler:
         :return:
         """
-        for _ in range(count):
-            generated = {}
-            for field_name in handler.fields_names:
-                if handler.is_value_field(field_name):
-                    # resolving normal field
-                    field_spec = getattr(self._specs[handler.model], field_name)
-                    if not field_spec:
-                        generated[field_name] = None
-                    else:
-                        generated[field_name] = field_spec.resolve()
-                else:
-                    # resolving foreign key field
-                    generated[field_name] = self._handlers[
-                        handler.get_referenced_model_by_field_name(field_name)].pick_random_instance()
-            handler.create_instance_and_persist(**generated)
+        if handler.key_pool is None:
+            # the models generated in parallel may reference the same model
+            with self._key_pools_lock:
+                if handler.key_pool is None:
+                    handler.load_key_pool()
+        return handler.key_pool
 
 
 class FieldSpec:
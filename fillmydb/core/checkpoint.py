@@ -0,0 +1,94 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+
+
+def derive_seed(seed, *parts):
+    """
+    Derives a 64 bits seed from *seed* and *parts* (for example the name of a model and the index of a chunk). The
+    derived seeds are the same in every process and on every machine, unlike ``hash()``.
+    """
+    data = ":".join(str(part) for part in (seed,) + parts).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+
+
+class Checkpoint(object):
+    """
+    Records the chunks of rows that were committed to the database by ``ModelWrapper.generate``, in a JSON file, so an
+    interrupted generation can be resumed from the first chunk that is missing.
+
+    The committed chunks of every model are stored as a sorted list of disjoint ``[start, end)`` ranges of indexes.
+    The chunks are committed in order (or almost, with a pipeline), so the list usually holds a single range and the
+    size of the file doesn't grow with the number of chunks.
+    """
+
+    def __init__(self, path, seed, counts, commit_every, shard=None):
+        """
+        Loads the checkpoint from *path*, if the file exists.
+
+        :param path: the path of the JSON file.
+        :param seed: the seed of the generation.
+        :param counts: the number of instances generated for every model, as a list of (model name, count) tuples.
+        :param commit_every: the number of rows of every chunk.
+        :param shard: the ``(i, n)`` shard generated, if any.
+        :raises ValueError: when the existing file was written by a generation with other parameters.
+        """
+        self.path = path
+        self._parameters = {"seed": seed, "counts": [list(item) for item in counts], "commit_every": commit_every,
+                            "shard": list(shard) if shard is not None else None}
+        # the sorted [start, end) ranges of the committed chunks of every model
+        self._chunks = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if {name: data.get(name) for name in self._parameters} != self._parameters:
+                raise ValueError("The checkpoint {} was written by a generation with other parameters: {}".format(
+                    path, {name: data.get(name) for name in self._parameters}))
+            self._chunks = {model_name: [list(item) for item in ranges]
+                            for model_name, ranges in data["chunks"].items()}
+
+    def is_done(self, model, index):
+        """
+        Indicates if the *index* chunk of *model* was already committed.
+        """
+        ranges = self._chunks.get(model.__name__, ())
+        position = bisect.bisect_right(ranges, [index, float("inf")])
+        return position > 0 and index < ranges[position - 1][1]
+
+    def mark_done(self, model, index):
+        """
+        Records that the *index* chunk of *model* was committed. The file is replaced atomically, so it is never left
+        half written.
+        """
+        with self._lock:
+            ranges = self._chunks.setdefault(model.__name__, [])
+            position = bisect.bisect_right(ranges, [index, float("inf")])
+            if position > 0 and index < ranges[position - 1][1]:
+                return
+            ranges.insert(position, [index, index + 1])
+            # merges the new range with the adjacent ones
+            if position + 1 < len(ranges) and ranges[position + 1][0] == index + 1:
+                ranges[position][1] = ranges.pop(position + 1)[1]
+            if position > 0 and ranges[position - 1][1] == index:
+                ranges[position - 1][1] = ranges.pop(position)[1]
+
+            data = dict(self._parameters, chunks=self._chunks)
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(data, f)
+            os.replace(temporary_path, self.path)
+
+    def remove(self):
+        """
+        Removes the file, once the generation is complete.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __repr__(self):
+        return "<Checkpoint {} chunks={}>".format(self.path, {name: sum(end - start for start, end in ranges)
+                                                              for name, ranges in self._chunks.items()})
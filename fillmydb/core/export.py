@@ -0,0 +1,316 @@
+"""
+Writers used by ``ModelWrapper.generate_to`` and ``ModelWrapper.dump_sql`` for streaming the generated rows to files.
+Every writer receives the rows in batches, as tuples of values in the order of the columns, and keeps nothing else in
+memory.
+"""
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def _text_value(value):
+    """
+    Converts *value* to the text representation understood by the CSV importers of the databases (for example
+    ``COPY ... WITH (FORMAT csv)`` for PostgreSQL).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _csv_field(value):
+    """
+    Returns the CSV field of *value*: NULL is an empty field, while the empty strings are quoted (``""``), like the
+    fields with a delimiter, a quote or a line break, so ``COPY ... WITH (FORMAT csv)`` loads them as empty strings.
+    """
+    if value is None:
+        return ""
+    text = str(_text_value(value))
+    if not text or any(character in text for character in ',"\r\n'):
+        return '"{}"'.format(text.replace('"', '""'))
+    return text
+
+
+def _json_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+class TableWriter(object):
+    """
+    Base class for the writers of a table. Can be used as a context manager, which closes the file at the end.
+    """
+
+    # the extension of the written files
+    EXTENSION = None
+
+    def __init__(self, path, columns):
+        """
+        :param path: the path of the written file.
+        :param columns: the names of the columns of the table.
+        """
+        self.path = path
+        self.columns = columns
+
+    def write(self, rows):
+        """
+        Writes *rows*, a list of tuples with the values of the columns.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CsvWriter(TableWriter):
+    """
+    Writes a CSV file with a header. NULL values are written as empty fields and empty strings as quoted empty fields
+    (``""``), as expected by ``COPY ... WITH (FORMAT csv)``, binary values in the hex format of PostgreSQL
+    (``\\x...``) and dates in the ISO 8601 format.
+    """
+
+    EXTENSION = "csv"
+
+    def __init__(self, path, columns):
+        super(CsvWriter, self).__init__(path, columns)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._write_rows([columns])
+
+    def _write_rows(self, rows):
+        self._file.write("".join(",".join(_csv_field(value) for value in row) + "\r\n" for row in rows))
+
+    def write(self, rows):
+        self._write_rows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesWriter(TableWriter):
+    """
+    Writes a JSON object per line. Binary values are encoded in base64 and dates in the ISO 8601 format.
+    """
+
+    EXTENSION = "jsonl"
+
+    def __init__(self, path, columns):
+        super(JsonLinesWriter, self).__init__(path, columns)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        self._file.writelines(json.dumps(dict(zip(self.columns, row)), default=_json_value) + "\n" for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter(TableWriter):
+    """
+    Writes a Parquet file, with a row group per batch of rows. The schema is inferred from the first batch, so a
+    column must not be NULL in all of its rows. Requires ``pyarrow``.
+    """
+
+    EXTENSION = "parquet"
+
+    def __init__(self, path, columns):
+        if pyarrow is None:
+            raise RuntimeError("Module 'pyarrow' could not be imported")
+        super(ParquetWriter, self).__init__(path, columns)
+        self._writer = None
+
+    def write(self, rows):
+        data = {column: list(values) for column, values in zip(self.columns, zip(*rows))}
+        if self._writer is None:
+            table = pyarrow.Table.from_pydict(data)
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            table = pyarrow.Table.from_pydict(data, schema=self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            # no rows were written, the file has only the names of the columns
+            schema = pyarrow.schema([(column, pyarrow.null()) for column in self.columns])
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, schema)
+        self._writer.close()
+
+
+# the writers of the formats supported by ModelWrapper.generate_to
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "parquet": ParquetWriter,
+}
+
+
+class SqlDialect(object):
+    """
+    The quoting rules of a database, used for writing SQL scripts.
+    """
+
+    def __init__(self, name, identifier_quote='"', backslash_escapes=False):
+        """
+        :param name: the name of the database.
+        :param identifier_quote: the character that quotes the identifiers.
+        :param backslash_escapes: if the backslashes of the string literals must be escaped.
+        """
+        self.name = name
+        self.identifier_quote = identifier_quote
+        self.backslash_escapes = backslash_escapes
+
+    def quote_identifier(self, name):
+        quote = self.identifier_quote
+        return "{0}{1}{0}".format(quote, name.replace(quote, quote * 2))
+
+    def literal(self, value):
+        """
+        Returns the SQL literal of *value*.
+        """
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            if self.name == "postgresql":
+                return "TRUE" if value else "FALSE"
+            return "1" if value else "0"
+        if isinstance(value, (float, decimal.Decimal)) and not decimal.Decimal(value).is_finite():
+            return self._special_number(value)
+        if isinstance(value, (int, float, decimal.Decimal)):
+            return str(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if self.name == "postgresql":
+                return "'\\x{}'".format(bytes(value).hex())
+            return "X'{}'".format(bytes(value).hex())
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat(" ")
+        elif isinstance(value, (datetime.date, datetime.time)):
+            value = value.isoformat()
+        value = str(value)
+        if self.backslash_escapes:
+            value = value.replace("\\", "\\\\")
+        return "'{}'".format(value.replace("'", "''"))
+
+    def _special_number(self, value):
+        """
+        Returns the SQL literal of a NaN or infinite number, which only PostgreSQL can represent.
+
+        :raises ValueError: for the other dialects.
+        """
+        if self.name != "postgresql":
+            raise ValueError("Cannot write {!r} as a {} literal".format(value, self.name))
+        value = decimal.Decimal(value)
+        if value.is_nan():
+            return "'NaN'"
+        return "'-Infinity'" if value.is_signed() else "'Infinity'"
+
+    def __repr__(self):
+        return "<SqlDialect {}>".format(self.name)
+
+
+# the dialects supported by ModelWrapper.dump_sql
+SQL_DIALECTS = {
+    "sqlite": SqlDialect("sqlite"),
+    "postgresql": SqlDialect("postgresql"),
+    "mysql": SqlDialect("mysql", identifier_quote="`", backslash_escapes=True),
+}
+
+
+class SqlScriptWriter(object):
+    """
+    Writes a SQL script of multi-row statements, wrapped in a transaction. Can be used as a context manager, which
+    closes the file at the end. The transaction is rolled back at the end of the script if the block raised an
+    exception, so an incomplete script doesn't insert anything.
+    """
+
+    def __init__(self, path, dialect, statement_size=1000):
+        """
+        :param path: the path of the written script.
+        :param dialect: a ``SqlDialect``.
+        :param statement_size: how many rows are inserted (or updated) by a statement.
+        """
+        self.path = path
+        self.dialect = dialect
+        self.statement_size = statement_size
+        # the rows of the last table that don't fill a statement yet, as (table name, columns, rows)
+        self._pending = None
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("BEGIN;\n")
+
+    def insert(self, table_name, columns, rows):
+        """
+        Writes the statements inserting *rows* (tuples of values, in the order of *columns*) into the table. The rows
+        that don't fill a statement are kept until the next call, so the statements don't depend on the size of the
+        batches of rows.
+        """
+        if self._pending and self._pending[:2] != (table_name, columns):
+            self.flush()
+        pending_rows = self._pending[2] + list(rows) if self._pending else list(rows)
+        full = len(pending_rows) - len(pending_rows) % self.statement_size
+        for start in range(0, full, self.statement_size):
+            self._write_insert(table_name, columns, pending_rows[start:start + self.statement_size])
+        self._pending = (table_name, columns, pending_rows[full:]) if full < len(pending_rows) else None
+
+    def flush(self):
+        """
+        Writes the statement inserting the rows kept by ``insert``.
+        """
+        if self._pending:
+            self._write_insert(*self._pending)
+            self._pending = None
+
+    def _write_insert(self, table_name, columns, rows):
+        literal = self.dialect.literal
+        self._file.write("INSERT INTO {} ({}) VALUES\n".format(
+            self.dialect.quote_identifier(table_name),
+            ", ".join(self.dialect.quote_identifier(column) for column in columns)))
+        self._file.write(",\n".join("({})".format(", ".join(literal(value) for value in row)) for row in rows))
+        self._file.write(";\n")
+
+    def update(self, table_name, key_column, column, pairs):
+        """
+        Writes the statements setting *column* to the values of the (key, value) *pairs*, a ``CASE`` expression per
+        statement.
+        """
+        literal = self.dialect.literal
+        key_column = self.dialect.quote_identifier(key_column)
+        self.flush()
+        for start in range(0, len(pairs), self.statement_size):
+            chunk = pairs[start:start + self.statement_size]
+            self._file.write("UPDATE {} SET {} = CASE {}\n{}\nEND WHERE {} IN ({});\n".format(
+                self.dialect.quote_identifier(table_name), self.dialect.quote_identifier(column), key_column,
+                "\n".join("WHEN {} THEN {}".format(literal(key), literal(value)) for key, value in chunk),
+                key_column, ", ".join(literal(key) for key, _ in chunk)))
+
+    def close(self, commit=True):
+        if commit:
+            self.flush()
+        self._file.write("COMMIT;\n" if commit else "ROLLBACK;\n")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(commit=exc_type is None)
@@ -0,0 +1,142 @@
+"""
+Inference of default field specifications from the types, the constraints and the names of the fields, used by
+``ModelWrapper(auto_specs=True)``. The inferred specifications are the built-in ``BatchFieldSpec`` subclasses, which
+generate a whole column of values at once.
+"""
+import datetime
+import decimal
+import logging
+import string
+
+from fillmydb.core.specs import IntegerRange, FloatRange, DecimalRange, Choice, Boolean, DateRange, DateTimeRange, \
+    TimeRange, RandomBytes, RandomUUID, RandomString
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+               "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen"]
+
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
+
+# the strings generated for the text fields without a better match
+TEXT_ALPHABET = string.ascii_lowercase + "     "
+
+# (name fragments, template of the string, minimum length, maximum length, alphabet) of the string fields, checked in
+# order against the name of the field
+STRING_HEURISTICS = [
+    (("email",), "{}@example.com", 6, 12, string.ascii_lowercase + string.digits),
+    (("username", "user_name", "login", "slug"), "{}", 6, 12, string.ascii_lowercase + string.digits),
+    (("url", "website", "link"), "https://example.com/{}", 6, 12, string.ascii_lowercase + string.digits),
+    (("phone",), "{}", 10, 10, string.digits),
+    (("password", "hash", "token"), "{}", 32, 64, string.ascii_letters + string.digits),
+    (("title", "subject"), "{}", 10, 40, TEXT_ALPHABET),
+    (("description", "text", "body", "content", "comment", "bio"), "{}", 20, 200, TEXT_ALPHABET),
+]
+
+# (name fragments, min value, max value) of the integer fields
+INTEGER_HEURISTICS = [
+    (("age",), 18, 90),
+    (("year",), 1970, 2030),
+    (("count", "visits", "quantity", "views"), 0, 1000),
+]
+
+MIN_DATE = datetime.date(2000, 1, 1)
+MAX_DATE = datetime.date(2030, 12, 31)
+
+# the upper bound of the float and decimal fields without a better match
+MAX_NUMBER = 1000
+
+# the digits after the decimal point of the decimal fields without a scale
+DECIMAL_PLACES = 2
+
+
+def _matches(field_name, fragments):
+    field_name = field_name.lower()
+    return any(fragment in field_name for fragment in fragments)
+
+
+def _string_spec(field_name, max_length, unique, text=False):
+    for fragments, template, min_length, max_random_length, alphabet in STRING_HEURISTICS:
+        if _matches(field_name, fragments):
+            break
+    else:
+        names = []
+        if field_name.lower() in ("first_name", "firstname"):
+            names = FIRST_NAMES
+        elif field_name.lower() in ("last_name", "lastname", "surname"):
+            names = LAST_NAMES
+        elif _matches(field_name, ("name",)):
+            names = ["{} {}".format(first, last) for first in FIRST_NAMES for last in LAST_NAMES]
+        names = [name for name in names if not max_length or len(name) <= max_length]
+        if names and not unique:
+            return Choice(names)
+        template, min_length, max_random_length, alphabet = "{}", 8, 16, string.ascii_lowercase + string.digits
+        if text:
+            min_length, max_random_length, alphabet = 20, 200, TEXT_ALPHABET
+
+    if unique:
+        # long enough for the collisions to be rare
+        min_length, max_random_length = max(min_length, 12), max(max_random_length, 16)
+        alphabet = alphabet.replace(" ", "") or string.ascii_lowercase
+    if max_length:
+        # the random part must fit in the column, together with the template
+        budget = max(max_length - len(template.format("")), 1)
+        min_length, max_random_length = min(min_length, budget), min(max_random_length, budget)
+    return RandomString(min_length, max_random_length, alphabet=alphabet, template=template)
+
+
+def _decimal_spec(precision, scale):
+    if not precision:
+        return DecimalRange(0, MAX_NUMBER, DECIMAL_PLACES if scale is None else scale)
+    scale = scale or 0
+    # the largest value with *precision* digits, *scale* of them after the decimal point
+    largest = decimal.Decimal(10) ** (precision - scale) - decimal.Decimal(10) ** -scale
+    return DecimalRange(0, min(MAX_NUMBER, largest), scale)
+
+
+def infer_field_spec(field_name, field_info, unique=False):
+    """
+    Returns the default specification of a field, or ``None`` if its type is not supported. The fields without a
+    specification are written as ``NULL``, so a warning is logged for the ones that don't accept ``NULL`` values.
+
+    The unique fields with choices pick from their choices too: the ``UniqueFilter`` of the generation fails once they
+    run out of distinct values.
+
+    :param field_name: the name of the field, used for picking a better generator for the common names (``email``,
+                       ``username``, ``first_name``, ``age``, ...).
+    :param field_info: the ``FieldInfo`` of the field.
+    :param unique: if the field has a unique constraint.
+    """
+    kind = field_info.kind
+    if field_info.choices:
+        return Choice(field_info.choices)
+    if kind in ("string", "text"):
+        return _string_spec(field_name, field_info.max_length, unique, text=kind == "text")
+    if kind == "integer":
+        for fragments, min_value, max_value in INTEGER_HEURISTICS:
+            if not unique and _matches(field_name, fragments):
+                return IntegerRange(min_value, max_value)
+        return IntegerRange(0, 2 ** 31 - 1)
+    if kind == "float":
+        return FloatRange(0, MAX_NUMBER)
+    if kind == "decimal":
+        return _decimal_spec(field_info.precision, field_info.scale)
+    if kind == "boolean":
+        return Boolean()
+    if kind == "date":
+        return DateRange(MIN_DATE, MAX_DATE)
+    if kind == "datetime":
+        # the aware datetimes are in UTC
+        tzinfo = datetime.timezone.utc if field_info.timezone else None
+        return DateTimeRange(datetime.datetime.combine(MIN_DATE, datetime.time(), tzinfo),
+                             datetime.datetime.combine(MAX_DATE, datetime.time(), tzinfo))
+    if kind == "time":
+        return TimeRange(datetime.time.min, datetime.time(23, 59, 59))
+    if kind == "binary":
+        return RandomBytes(min(field_info.max_length or 16, 64))
+    if kind == "uuid":
+        return RandomUUID()
+    if not field_info.nullable:
+        logger.warning("Cannot infer the specification of the NOT NULL field %r, its values will be NULL", field_name)
+    return None
@@ -0,0 +1,95 @@
+import queue
+import time
+
+
+class PipelineStats:
+    """
+    Backpressure statistics of the pipelined generation of a model (see ``ModelWrapper.generate``).
+
+    - ``producer_blocked``: seconds the generating stage waited because the queue was full. A high value means the
+      database is the bottleneck.
+    - ``consumer_blocked``: seconds the persisting stage waited because the queue was empty. A high value means the
+      value generation is the bottleneck.
+    - ``max_queue_depth`` and ``average_queue_depth``: how many batches were waiting in the queue.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.batches = 0
+        self.rows = 0
+        self.producer_blocked = 0.0
+        self.consumer_blocked = 0.0
+        self.max_queue_depth = 0
+        self._total_queue_depth = 0
+
+    @property
+    def average_queue_depth(self):
+        if not self.batches:
+            return 0.0
+        return self._total_queue_depth / self.batches
+
+    def record_put(self, blocked, queue_depth):
+        self.batches += 1
+        self.producer_blocked += blocked
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        self._total_queue_depth += queue_depth
+
+    def record_get(self, blocked, rows):
+        self.consumer_blocked += blocked
+        self.rows += rows
+
+    def __repr__(self):
+        return "<PipelineStats({}) batches={} rows={} producer_blocked={:.3f}s consumer_blocked={:.3f}s " \
+               "max_queue_depth={} average_queue_depth={:.2f}>".format(
+                   self.model.__name__, self.batches, self.rows, self.producer_blocked, self.consumer_blocked,
+                   self.max_queue_depth, self.average_queue_depth)
+
+
+class PipelineAborted(Exception):
+    """
+    Raised in the persisting stage when the generating stage failed, so the open transaction is rolled back.
+    """
+    pass
+
+
+class BatchQueue:
+    """
+    A bounded queue of row batches between the generating stage (the producer) and the persisting stage (the
+    consumer), that records the time each stage spent blocked.
+    """
+
+    # how often a blocked producer checks that the consumer is still alive
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, maxsize, stats):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.stats = stats
+
+    def put(self, rows, consumer):
+        """
+        Puts a batch of *rows* (or ``None``, marking the end of the batches) into the queue.
+
+        :param consumer: the thread of the persisting stage.
+        :return: False if the consumer stopped (because of an error) and will never take the batch.
+        """
+        start = time.perf_counter()
+        while True:
+            try:
+                self._queue.put(rows, timeout=self.POLL_INTERVAL)
+                break
+            except queue.Full:
+                if not consumer.is_alive():
+                    return False
+        if rows is not None:
+            self.stats.record_put(time.perf_counter() - start, self._queue.qsize())
+        return True
+
+    def get(self):
+        """
+        Returns the next batch of rows, or ``None`` if the producer has no more batches.
+        """
+        start = time.perf_counter()
+        rows = self._queue.get()
+        if rows is not None:
+            self.stats.record_get(time.perf_counter() - start, len(rows))
+        return rows
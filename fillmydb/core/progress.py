@@ -0,0 +1,124 @@
+"""
+Progress reporting of the generation: observers (see ``GenerationObserver``) reporting the rows done, the rows per
+second and the estimated time left of every model, through ``logging`` or a ``tqdm`` progress bar.
+"""
+import logging
+import time
+
+try:
+    import tqdm
+except ImportError:
+    tqdm = None
+
+from fillmydb.core.stats import GenerationObserver
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds):
+    """
+    Formats *seconds* as ``H:MM:SS``, or ``?`` when it is not known.
+    """
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02}:{:02}".format(hours, minutes, seconds)
+
+
+class ProgressReporter(GenerationObserver):
+    """
+    Base class of the progress reporters. ``report`` is called at most once every *interval* seconds for every
+    model, after a batch of rows is persisted, and once at the end of the model, so the reporting costs a clock read
+    per batch.
+    """
+
+    def __init__(self, interval=5.0):
+        """
+        :param interval: the minimum number of seconds between two reports of the same model.
+        """
+        self.interval = interval
+        self._last_reports = {}
+
+    def on_model_start(self, model_stats):
+        self._last_reports[model_stats.model] = time.monotonic()
+
+    def on_batch_persisted(self, model_stats, size, seconds):
+        now = time.monotonic()
+        if now - self._last_reports.get(model_stats.model, 0) >= self.interval:
+            self._last_reports[model_stats.model] = now
+            self.report(model_stats)
+
+    def on_model_end(self, model_stats):
+        self.report(model_stats, done=True)
+
+    def report(self, model_stats, done=False):
+        """
+        Reports the progress of the model of *model_stats* (a ``ModelStats``).
+
+        :param done: if all the rows of the model were persisted.
+        """
+        raise NotImplementedError()
+
+
+class LoggingProgress(ProgressReporter):
+    """
+    Logs the progress of every model at the ``INFO`` level, for example::
+
+        Post: 1200000/5000000 rows (24.0%), 41230 rows/s, ETA 0:01:32
+    """
+
+    def __init__(self, interval=5.0, logger=logger, level=logging.INFO):
+        """
+        :param interval: the minimum number of seconds between two reports of the same model.
+        :param logger: the ``logging.Logger`` used.
+        :param level: the level of the records.
+        """
+        super(LoggingProgress, self).__init__(interval)
+        self.logger = logger
+        self.level = level
+
+    def report(self, model_stats, done=False):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if done:
+            self.logger.log(self.level, "%s: %d rows in %s, %.0f rows/s", model_stats.model.__name__,
+                            model_stats.rows, format_duration(model_stats.elapsed), model_stats.rows_per_second)
+            return
+        percent = 100.0 * model_stats.rows / model_stats.count if model_stats.count else 100.0
+        self.logger.log(self.level, "%s: %d/%d rows (%.1f%%), %.0f rows/s, ETA %s", model_stats.model.__name__,
+                        model_stats.rows, model_stats.count, percent, model_stats.rows_per_second,
+                        format_duration(model_stats.eta))
+
+
+class TqdmProgress(GenerationObserver):
+    """
+    Shows a ``tqdm`` progress bar for every model, with the rows per second and the estimated time left. Requires
+    ``tqdm``. The bars are updated after every persisted batch, since ``tqdm`` limits their refresh rate by itself.
+    """
+
+    def __init__(self, **tqdm_options):
+        """
+        :param tqdm_options: the keyword arguments of the ``tqdm.tqdm`` bars (``file``, ``mininterval``, ...).
+        """
+        if tqdm is None:
+            raise RuntimeError("Module 'tqdm' could not be imported")
+        self.tqdm_options = tqdm_options
+        self._bars = {}
+
+    def on_model_start(self, model_stats):
+        self._bars[model_stats.model] = tqdm.tqdm(total=model_stats.count, desc=model_stats.model.__name__,
+                                                  unit="rows", **self.tqdm_options)
+
+    def on_batch_persisted(self, model_stats, size, seconds):
+        self._bars[model_stats.model].update(size)
+
+    def on_model_end(self, model_stats):
+        self._bars.pop(model_stats.model).close()
+
+
+# the progress reporters selected by name through the progress argument of ModelWrapper.generate
+PROGRESS_REPORTERS = {
+    "logging": LoggingProgress,
+    "tqdm": TqdmProgress,
+}
@@ -0,0 +1,140 @@
+"""
+The row builders of ``ModelWrapper``: the specifications of the fields of a model are compiled once per generation
+into a list of column generators, so the generation loop doesn't look up the specifications, nor branch on the kind
+of every field, for every row. The values are generated column by column, even by the specifications that don't
+support batches (which are called once per value). The rows are tuples in the order of ``RowBuilder.fields_names``,
+which the bulk insert methods of the handlers (``BaseHandler.create_rows_bulk``, ``BaseHandler.bulk_load_rows``)
+consume directly.
+"""
+import functools
+import time
+
+
+def _constant_column(value, count):
+    return [value] * count
+
+
+def _resolved_column(resolve, count):
+    return [resolve() for _ in range(count)]
+
+
+def _picked_column(pick, key_pool, count):
+    return [pick(key_pool) for _ in range(count)]
+
+
+def _filtered_column(unique_filter, generate_column, count):
+    return unique_filter.filter(generate_column(count))
+
+
+class RowBuilder(object):
+    """
+    Generates the rows of a model as tuples, column by column: every field of the row has a column generator
+    (``f(count) -> list``), and the rows are the columns zipped together. The time spent generating every column is
+    added to ``field_times``.
+    """
+
+    def __init__(self, model, fields_names, columns, column_generators, unique_filters=None, primary_key=None):
+        """
+        :param model: the generated model.
+        :param fields_names: the names of the fields of the rows, in order.
+        :param columns: the names of the database columns of the fields, in the same order.
+        :param column_generators: the column generators of the fields, in order.
+        :param unique_filters: a dict mapping the names of the unique fields to their ``UniqueFilter``.
+        :param primary_key: the name of the primary key, when it is set explicitly by ``build``.
+        """
+        self.model = model
+        self.fields_names = tuple(fields_names)
+        self.columns = tuple(columns)
+        self.field_times = dict.fromkeys(self.fields_names, 0.0)
+        self._column_generators = tuple(column_generators)
+        self._unique_filters = unique_filters or {}
+        self._primary_key_index = self.fields_names.index(primary_key) if primary_key is not None else None
+
+    def build(self, count, value_columns=None, first_key=None):
+        """
+        Generates *count* rows.
+
+        :param count: the number of rows.
+        :param value_columns: optional dict with the already generated values of the value fields (by the worker
+                              processes). Only the other fields are generated in this case.
+        :param first_key: the primary key of the first row, when the primary keys are set explicitly.
+        :return: a list of tuples.
+        """
+        if not self.fields_names:
+            return [()] * count
+
+        key_index = self._primary_key_index if first_key is not None else None
+        field_times = self.field_times
+        columns = []
+        for index, (field_name, generate_column) in enumerate(zip(self.fields_names, self._column_generators)):
+            start = time.perf_counter()
+            if index == key_index:
+                columns.append(range(first_key, first_key + count))
+            elif value_columns is not None and field_name in value_columns:
+                column = value_columns[field_name]
+                if field_name in self._unique_filters:
+                    column = self._unique_filters[field_name].filter(column)
+                columns.append(column)
+            else:
+                columns.append(generate_column(count))
+            field_times[field_name] += time.perf_counter() - start
+        return list(zip(*columns))
+
+    def as_dicts(self, rows):
+        """
+        Converts *rows* to dicts mapping the field names to the values, for the handler methods that take keyword
+        arguments.
+        """
+        fields_names = self.fields_names
+        return [dict(zip(fields_names, row)) for row in rows]
+
+    def __repr__(self):
+        return "<RowBuilder({}) {}>".format(self.model.__name__, ", ".join(self.fields_names))
+
+
+def compile_row_builder(handler, specs, key_pool_of, unique_filters=None, deferred=(), explicit_keys=False):
+    """
+    Compiles the specifications of the fields of the model wrapped in *handler* into a ``RowBuilder``.
+
+    :param handler: the handler of the model.
+    :param specs: a dict mapping the names of the fields to their specifications (``None`` for no specification).
+    :param key_pool_of: a callable returning the ``KeyPool`` of a referenced model, called once per foreign key.
+    :param unique_filters: a dict mapping the names of the unique fields to their ``UniqueFilter``.
+    :param deferred: the foreign key fields that are generated as NULL and filled afterwards.
+    :param explicit_keys: if the primary keys are set explicitly by ``RowBuilder.build``. Otherwise the primary key
+                          is left out of the rows (so the database assigns it), unless it has a specification.
+    :return: a ``RowBuilder``.
+    """
+    plan = handler.field_plan
+    unique_filters = unique_filters or {}
+
+    fields_names, columns, column_generators = [], [], []
+    for field_name, column in zip(plan.fields_names, plan.columns):
+        field_spec = specs[field_name]
+        if field_name == plan.primary_key and not explicit_keys and not field_spec:
+            continue
+
+        if field_name in deferred or (field_name not in plan.referenced_models and not field_spec):
+            generate_column = functools.partial(_constant_column, None)
+        elif field_name not in plan.referenced_models:
+            if hasattr(field_spec, "resolve_batch"):
+                generate_column = field_spec.resolve_batch
+            else:
+                generate_column = functools.partial(_resolved_column, field_spec.resolve)
+            if field_name in unique_filters:
+                generate_column = functools.partial(_filtered_column, unique_filters[field_name], generate_column)
+        else:
+            key_pool = key_pool_of(plan.referenced_models[field_name])
+            if not field_spec:
+                generate_column = key_pool.sample
+            elif hasattr(field_spec, "sample"):
+                generate_column = functools.partial(field_spec.sample, key_pool)
+            else:
+                generate_column = functools.partial(_picked_column, field_spec.pick, key_pool)
+
+        fields_names.append(field_name)
+        columns.append(column)
+        column_generators.append(generate_column)
+
+    return RowBuilder(handler.model, fields_names, columns, column_generators, unique_filters,
+                      plan.primary_key if explicit_keys else None)
@@ -0,0 +1,211 @@
+import collections
+
+
+class CyclicDependencyError(ValueError):
+    """
+    Raised when the foreign keys of the models form a cycle that can't be broken.
+    """
+
+    def __init__(self, models, message=None):
+        self.models = list(models)
+        super(CyclicDependencyError, self).__init__(message or (
+            "The foreign keys of {} form a cycle. Generate with cycles=\"defer\" to insert NULL in a nullable "
+            "foreign key of the cycle and fill it afterwards".format(", ".join(model.__name__ for model in models))))
+
+
+class ExecutionPlan:
+    """
+    The order in which the models are generated.
+
+    - ``levels``: a list of lists of models. The models of a level reference only models from the previous levels, so
+      they don't depend on each other.
+    - ``deferred``: a dict mapping models to the foreign key fields that are inserted as NULL and filled with an
+      ``UPDATE`` after all the models are generated, in order to break the cycles.
+    """
+
+    def __init__(self, levels, deferred):
+        self.levels = levels
+        self.deferred = deferred
+
+    @property
+    def order(self):
+        """
+        The models, in the order they are generated.
+        """
+        return [model for level in self.levels for model in level]
+
+    def deferred_fields(self, model):
+        return self.deferred.get(model, [])
+
+    def __repr__(self):
+        lines = ["<ExecutionPlan"]
+        for index, level in enumerate(self.levels):
+            lines.append("  level {}: {}".format(index, ", ".join(model.__name__ for model in level)))
+        for model, fields in self.deferred.items():
+            lines.append("  deferred: {}.{}".format(model.__name__, ", {}.".format(model.__name__).join(fields)))
+        return "\n".join(lines) + ">"
+
+
+class DependencyScheduler:
+    """
+    Orders the models so that every model is generated after the models it references through foreign keys, using
+    Kahn's algorithm. Models that belong to the same level don't depend on each other.
+    """
+
+    CYCLE_STRATEGIES = ("error", "defer")
+
+    def __init__(self, handlers, cycles="error"):
+        """
+        :param handlers: the handlers of the models, in the order the models were given to the ``ModelWrapper``. The
+                         order is preserved inside every level.
+        :param cycles: ``"error"`` raises a ``CyclicDependencyError`` when the foreign keys form a cycle (including
+                       self-referencing foreign keys). ``"defer"`` breaks the cycles by deferring nullable foreign
+                       keys, which are filled after all the models are generated.
+        """
+        if cycles not in self.CYCLE_STRATEGIES:
+            raise ValueError("Unknown cycle strategy '{}'. Expected one of {}".format(cycles, self.CYCLE_STRATEGIES))
+        self.handlers = list(handlers)
+        self.cycles = cycles
+
+    def _foreign_keys(self, handler, models):
+        """
+        Returns the (field name, referenced model) pairs of the foreign keys of *handler* that point to *models*.
+        Foreign keys to models that are not generated are expected to be satisfied already.
+        """
+        foreign_keys = []
+        for field_name in handler.fields_names:
+            if handler.is_foreign_key_field(field_name):
+                ref_model = handler.get_referenced_model_by_field_name(field_name)
+                if ref_model in models:
+                    foreign_keys.append((field_name, ref_model))
+        return foreign_keys
+
+    def plan(self):
+        """
+        Computes the execution plan.
+
+        :return: an ``ExecutionPlan``
+        :raises CyclicDependencyError: when there is a cycle that can't be broken.
+        """
+        models = [handler.model for handler in self.handlers]
+        handlers = {handler.model: handler for handler in self.handlers}
+
+        # dependencies[model] holds the foreign key fields of model, grouped by the referenced model
+        dependencies = collections.OrderedDict((model, collections.OrderedDict()) for model in models)
+        dependents = {model: set() for model in models}
+        generated = set(models)
+        for model in models:
+            for field_name, ref_model in self._foreign_keys(handlers[model], generated):
+                dependencies[model].setdefault(ref_model, []).append(field_name)
+                dependents[ref_model].add(model)
+
+        deferred = collections.OrderedDict()
+        if self.cycles == "defer":
+            # self-references never get resolved, so they are deferred from the beginning
+            for model in models:
+                if model in dependencies[model]:
+                    self._defer(model, model, handlers, dependencies, dependents, deferred)
+
+        # the number of unresolved dependencies of a model is len(dependencies[model]), so a model is queued for the
+        # next level when its last dependency is generated
+        positions = {model: position for position, model in enumerate(models)}
+        levels = []
+        placed = set()
+        ready = [model for model in models if not dependencies[model]]
+        while len(placed) < len(models):
+            if not ready:
+                remaining = [model for model in models if model not in placed]
+                ready = self._break_cycle(remaining, handlers, dependencies, dependents, deferred)
+                continue
+
+            level = sorted(ready, key=positions.__getitem__)
+            levels.append(level)
+            placed.update(level)
+            ready = []
+            for model in level:
+                for dependent in dependents[model]:
+                    dependencies[dependent].pop(model, None)
+                    if not dependencies[dependent]:
+                        ready.append(dependent)
+        return ExecutionPlan(levels, deferred)
+
+    def _break_cycle(self, remaining, handlers, dependencies, dependents, deferred):
+        """
+        Defers the foreign keys from a model of a blocking cycle to another model of the same cycle, so the
+        topological sort can go on. Only the foreign keys inside the strongly connected component that blocks the
+        sort are candidates, tried in the order the models were given, so the models that merely reference the cycle
+        are not deferred.
+
+        :return: the models that have no dependencies left.
+        """
+        component = self._blocking_component(remaining, dependencies)
+        if self.cycles == "error":
+            raise CyclicDependencyError(component)
+
+        members = set(component)
+        for model in component:
+            for ref_model in list(dependencies[model]):
+                if ref_model in members and self._defer(model, ref_model, handlers, dependencies, dependents,
+                                                        deferred):
+                    return [] if dependencies[model] else [model]
+
+        raise CyclicDependencyError(component, "The foreign keys of {} form a cycle that can't be broken, because "
+                                               "none of them is nullable".format(
+                                                   ", ".join(model.__name__ for model in component)))
+
+    @staticmethod
+    def _blocking_component(remaining, dependencies):
+        """
+        Returns a strongly connected component of the *remaining* models that depends only on itself, in the order
+        the models were given. Every remaining model has a dependency, so such a component is a cycle, and it is the
+        first component found by Tarjan's algorithm (which finds the components in reverse topological order).
+        """
+        positions = {model: position for position, model in enumerate(remaining)}
+        indexes, lowlinks = {}, {}
+        stack, on_stack = [], set()
+        for root in remaining:
+            if root in indexes:
+                continue
+            indexes[root] = lowlinks[root] = len(indexes)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(dependencies[root]))]
+            while work:
+                model, ref_models = work[-1]
+                for ref_model in ref_models:
+                    if ref_model not in indexes:
+                        indexes[ref_model] = lowlinks[ref_model] = len(indexes)
+                        stack.append(ref_model)
+                        on_stack.add(ref_model)
+                        work.append((ref_model, iter(dependencies[ref_model])))
+                        break
+                    if ref_model in on_stack:
+                        lowlinks[model] = min(lowlinks[model], indexes[ref_model])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlinks[parent] = min(lowlinks[parent], lowlinks[model])
+                    if lowlinks[model] == indexes[model]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member is model:
+                                return sorted(component, key=positions.__getitem__)
+        return list(remaining)
+
+    def _defer(self, model, ref_model, handlers, dependencies, dependents, deferred):
+        """
+        Defers the foreign keys from *model* to *ref_model*, if all of them are nullable.
+
+        :return: True if the foreign keys were deferred.
+        """
+        fields = dependencies[model][ref_model]
+        if not all(handlers[model].is_nullable_field(field_name) for field_name in fields):
+            return False
+        deferred.setdefault(model, []).extend(fields)
+        del dependencies[model][ref_model]
+        dependents[ref_model].discard(model)
+        return True
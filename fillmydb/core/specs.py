@@ -0,0 +1,623 @@
+import datetime
+import decimal
+import math
+import random
+import string
+import threading
+import uuid
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BatchFieldSpec:
+    """
+    Base class for the built-in field specifications that can generate many values at once.
+
+    Besides ``resolve()``, these specifications implement ``resolve_batch(n)``, which returns a list of *n* values.
+    ``ModelWrapper`` always generates the rows column by column (see ``RowBuilder``): the fields with such a
+    specification get their column through a single call, the other ones through a call per value. The batches are
+    generated through NumPy if it is installed, and value by value otherwise.
+    """
+
+    def resolve(self):
+        """
+        Returns a single generated value.
+        """
+        raise NotImplementedError
+
+    def resolve_batch(self, n):
+        """
+        Returns a list with *n* generated values.
+        """
+        if numpy is None:
+            return [self.resolve() for _ in range(n)]
+        return self._resolve_numpy(n)
+
+    def _resolve_numpy(self, n):
+        raise NotImplementedError
+
+
+class IntegerRange(BatchFieldSpec):
+    """
+    Generates integers between *min_value* and *max_value*, both included.
+    """
+
+    def __init__(self, min_value=0, max_value=2 ** 31 - 1):
+        if min_value > max_value:
+            raise ValueError("Invalid range [{}, {}]".format(min_value, max_value))
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def resolve(self):
+        return random.randint(self.min_value, self.max_value)
+
+    def _resolve_numpy(self, n):
+        return numpy.random.randint(self.min_value, self.max_value + 1, size=n, dtype=numpy.int64).tolist()
+
+    def __repr__(self):
+        return "<IntegerRange [{}, {}]>".format(self.min_value, self.max_value)
+
+
+class FloatRange(BatchFieldSpec):
+    """
+    Generates floats between *min_value* and *max_value*.
+    """
+
+    def __init__(self, min_value=0.0, max_value=1.0):
+        if min_value > max_value:
+            raise ValueError("Invalid range [{}, {}]".format(min_value, max_value))
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def resolve(self):
+        return random.uniform(self.min_value, self.max_value)
+
+    def _resolve_numpy(self, n):
+        return numpy.random.uniform(self.min_value, self.max_value, size=n).tolist()
+
+    def __repr__(self):
+        return "<FloatRange [{}, {}]>".format(self.min_value, self.max_value)
+
+
+class DecimalRange(BatchFieldSpec):
+    """
+    Generates ``decimal.Decimal`` numbers between *min_value* and *max_value*, both included, with *places* digits
+    after the decimal point, so they are written as they are stored by a ``DECIMAL`` column.
+    """
+
+    def __init__(self, min_value=0, max_value=1, places=2):
+        # the bounds in units of the last digit (through str(), so the float bounds are taken as they are written)
+        self._min_units = int(decimal.Decimal(str(min_value)).scaleb(places).to_integral_value(decimal.ROUND_CEILING))
+        self._max_units = int(decimal.Decimal(str(max_value)).scaleb(places).to_integral_value(decimal.ROUND_FLOOR))
+        if self._min_units > self._max_units:
+            raise ValueError("Invalid range [{}, {}] with {} places".format(min_value, max_value, places))
+        self.min_value = min_value
+        self.max_value = max_value
+        self.places = places
+
+    def _to_decimal(self, units):
+        # built from a string, so the precision of the decimal context doesn't round it
+        return decimal.Decimal("{}E{}".format(units, -self.places))
+
+    def resolve(self):
+        return self._to_decimal(random.randint(self._min_units, self._max_units))
+
+    def _resolve_numpy(self, n):
+        if max(abs(self._min_units), abs(self._max_units)) >= 2 ** 62:
+            return [self.resolve() for _ in range(n)]
+        units = numpy.random.randint(self._min_units, self._max_units + 1, size=n, dtype=numpy.int64)
+        return [self._to_decimal(value) for value in units.tolist()]
+
+    def __repr__(self):
+        return "<DecimalRange [{}, {}] places={}>".format(self.min_value, self.max_value, self.places)
+
+
+class Choice(BatchFieldSpec):
+    """
+    Picks values from *choices*, optionally with the relative *weights*.
+    """
+
+    def __init__(self, choices, weights=None):
+        self.choices = list(choices)
+        if not self.choices:
+            raise ValueError("At least one choice is required")
+        if weights is not None and len(weights) != len(self.choices):
+            raise ValueError("Expected {} weights, got {}".format(len(self.choices), len(weights)))
+        self.weights = list(weights) if weights is not None else None
+
+    def resolve(self):
+        return random.choices(self.choices, weights=self.weights)[0]
+
+    def _resolve_numpy(self, n):
+        probabilities = None
+        if self.weights is not None:
+            total = float(sum(self.weights))
+            probabilities = [weight / total for weight in self.weights]
+        indexes = numpy.random.choice(len(self.choices), size=n, p=probabilities).tolist()
+        return [self.choices[index] for index in indexes]
+
+    def __repr__(self):
+        if len(self.choices) > 10:
+            return "<Choice {} ... ({} choices)>".format(self.choices[:10], len(self.choices))
+        return "<Choice {}>".format(self.choices)
+
+
+class Boolean(BatchFieldSpec):
+    """
+    Generates ``True`` with the given *probability* and ``False`` otherwise.
+    """
+
+    def __init__(self, probability=0.5):
+        if not 0 <= probability <= 1:
+            raise ValueError("The probability must be between 0 and 1, got {}".format(probability))
+        self.probability = probability
+
+    def resolve(self):
+        return random.random() < self.probability
+
+    def _resolve_numpy(self, n):
+        return (numpy.random.random_sample(n) < self.probability).tolist()
+
+    def __repr__(self):
+        return "<Boolean probability={}>".format(self.probability)
+
+
+class DateRange(BatchFieldSpec):
+    """
+    Generates ``datetime.date`` objects between *start* and *end*, both included.
+    """
+
+    def __init__(self, start, end):
+        if start > end:
+            raise ValueError("Invalid range [{}, {}]".format(start, end))
+        self.start = start
+        self.end = end
+        self._days = (end - start).days
+
+    def resolve(self):
+        return self.start + datetime.timedelta(days=random.randint(0, self._days))
+
+    def _resolve_numpy(self, n):
+        offsets = numpy.random.randint(0, self._days + 1, size=n).astype("timedelta64[D]")
+        return (numpy.datetime64(self.start, "D") + offsets).tolist()
+
+    def __repr__(self):
+        return "<DateRange [{}, {}]>".format(self.start, self.end)
+
+
+class DateTimeRange(BatchFieldSpec):
+    """
+    Generates ``datetime.datetime`` objects between *start* and *end*, with a resolution of one second.
+    """
+
+    def __init__(self, start, end):
+        if start > end:
+            raise ValueError("Invalid range [{}, {}]".format(start, end))
+        self.start = start
+        self.end = end
+        self._seconds = int((end - start).total_seconds())
+
+    def resolve(self):
+        return self.start + datetime.timedelta(seconds=random.randint(0, self._seconds))
+
+    def _resolve_numpy(self, n):
+        offsets = numpy.random.randint(0, self._seconds + 1, size=n).astype("timedelta64[s]")
+        # NumPy doesn't know about time zones: the offsets are added to the exact (naive) start, with its microseconds,
+        # then the time zone of the start is set back, like the wall clock arithmetic of resolve()
+        values = (numpy.datetime64(self.start.replace(tzinfo=None), "us") + offsets).tolist()
+        if self.start.tzinfo is None:
+            return values
+        return [value.replace(tzinfo=self.start.tzinfo) for value in values]
+
+    def __repr__(self):
+        return "<DateTimeRange [{}, {}]>".format(self.start, self.end)
+
+
+class TimeRange(BatchFieldSpec):
+    """
+    Generates ``datetime.time`` objects between *start* and *end*, with a resolution of one second.
+    """
+
+    def __init__(self, start, end):
+        if start > end:
+            raise ValueError("Invalid range [{}, {}]".format(start, end))
+        self.start = start
+        self.end = end
+        self._start_seconds = start.hour * 3600 + start.minute * 60 + start.second
+        self._seconds = end.hour * 3600 + end.minute * 60 + end.second - self._start_seconds
+        if end.microsecond < start.microsecond:
+            self._seconds -= 1
+
+    def _to_time(self, seconds):
+        seconds += self._start_seconds
+        return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60, self.start.microsecond,
+                             tzinfo=self.start.tzinfo)
+
+    def resolve(self):
+        return self._to_time(random.randint(0, self._seconds))
+
+    def _resolve_numpy(self, n):
+        return [self._to_time(seconds) for seconds in numpy.random.randint(0, self._seconds + 1, size=n).tolist()]
+
+    def __repr__(self):
+        return "<TimeRange [{}, {}]>".format(self.start, self.end)
+
+
+class RandomBytes(BatchFieldSpec):
+    """
+    Generates random ``bytes`` objects of fixed *length*, drawn from the seedable random number generators (not from
+    ``os.urandom``), so they are reproducible with a seed.
+    """
+
+    def __init__(self, length):
+        self.length = length
+
+    def resolve(self):
+        return random.getrandbits(self.length * 8).to_bytes(self.length, "little")
+
+    def _resolve_numpy(self, n):
+        data = numpy.random.bytes(n * self.length)
+        return [data[start:start + self.length] for start in range(0, n * self.length, self.length)]
+
+    def __repr__(self):
+        return "<RandomBytes length={}>".format(self.length)
+
+
+class RandomUUID(BatchFieldSpec):
+    """
+    Generates random (version 4) ``uuid.UUID`` objects, drawn from the seedable random number generators, so they are
+    reproducible with a seed.
+    """
+
+    def resolve(self):
+        return uuid.UUID(int=random.getrandbits(128), version=4)
+
+    def _resolve_numpy(self, n):
+        data = numpy.random.bytes(n * 16)
+        return [uuid.UUID(bytes=data[start:start + 16], version=4) for start in range(0, n * 16, 16)]
+
+    def __repr__(self):
+        return "<RandomUUID>"
+
+
+class RandomString(BatchFieldSpec):
+    """
+    Generates strings of *min_length* to *max_length* random characters from *alphabet*, formatted with *template*
+    (for example ``"{}@example.com"``).
+    """
+
+    def __init__(self, min_length=8, max_length=None, alphabet=string.ascii_lowercase + string.digits,
+                 template="{}"):
+        max_length = min_length if max_length is None else max_length
+        if not 0 <= min_length <= max_length:
+            raise ValueError("Invalid length range [{}, {}]".format(min_length, max_length))
+        if not alphabet:
+            raise ValueError("The alphabet must not be empty")
+        self.min_length = min_length
+        self.max_length = max_length
+        self.alphabet = alphabet
+        self.template = template
+
+    def resolve(self):
+        length = random.randint(self.min_length, self.max_length)
+        return self.template.format("".join(random.choices(self.alphabet, k=length)))
+
+    def _resolve_numpy(self, n):
+        lengths = numpy.random.randint(self.min_length, self.max_length + 1, size=n).tolist()
+        alphabet = numpy.array([ord(character) for character in self.alphabet], dtype=numpy.uint32)
+        # the characters of all the strings, drawn at once and encoded in UTF-32
+        data = alphabet[numpy.random.randint(0, len(self.alphabet), size=sum(lengths))].tobytes().decode("utf-32-le")
+        values = []
+        position = 0
+        for length in lengths:
+            values.append(self.template.format(data[position:position + length]))
+            position += length
+        return values
+
+    def __repr__(self):
+        return "<RandomString [{}, {}] template={!r}>".format(self.min_length, self.max_length, self.template)
+
+
+class Pooled(BatchFieldSpec):
+    """
+    Wraps an expensive specification (for example a Faker provider, such as ``Paragraph()`` or ``UserAgent()``): *size*
+    values are generated once, the first time they are needed, and the fields get values sampled from this pool by
+    index afterwards, which is much cheaper than calling the provider for every row::
+
+        wrapper[User].description = Pooled(Paragraph(nb_sentences=3), size=10000)
+
+    With *background*, the pool is filled by a separate thread, started by the constructor, so it is ready by the time
+    the generation reaches the field. The values are then not reproducible with a seed.
+
+    With *unique*, the pool holds *size* distinct values, and every value is used at most once, in a random order. A
+    ``ValueError`` is raised when the values are exhausted, or when the wrapped specification can't generate enough
+    distinct values. The values are taken in the order of the pool, from a position that ``ModelWrapper`` derives
+    from the index of the generated rows (see ``seek``), so a chunk of rows gets the same values when it is generated
+    alone (by a resumed generation or a shard).
+    """
+
+    # how many times the wrapped specification is called, relative to the size of the pool, when looking for distinct
+    # values
+    MAX_ATTEMPTS_FACTOR = 10
+
+    def __init__(self, spec, size=10000, background=False, unique=False):
+        """
+        :param spec: the wrapped specification, an object with a ``resolve()`` method.
+        :param size: how many values are generated.
+        :param background: if ``True``, the pool is filled by a background thread.
+        :param unique: if ``True``, every value of the pool is used only once.
+        """
+        if size < 1:
+            raise ValueError("The size of the pool must be at least 1, got {}".format(size))
+        self.spec = spec
+        self.size = size
+        self.background = background
+        self.unique = unique
+
+        self._values = None
+        # the position of the next value, in unique mode
+        self._position = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._error = None
+        if background:
+            self._thread = threading.Thread(target=self._fill_in_background, name="fillmydb-pool", daemon=True)
+            self._thread.start()
+
+    def _fill(self):
+        if not self.unique:
+            return [self.spec.resolve() for _ in range(self.size)]
+
+        seen = set()
+        values = []
+        for _ in range(self.size * self.MAX_ATTEMPTS_FACTOR):
+            value = self.spec.resolve()
+            if value not in seen:
+                seen.add(value)
+                values.append(value)
+                if len(values) == self.size:
+                    random.shuffle(values)
+                    return values
+        raise ValueError("Could not generate {} distinct values with {}, got {}".format(
+            self.size, self.spec, len(values)))
+
+    def _fill_in_background(self):
+        try:
+            self._values = self._fill()
+        except Exception as e:
+            self._error = e
+
+    def _get_values(self):
+        """
+        Returns the pool, filling it (or waiting for the background thread) the first time.
+        """
+        if self._values is None:
+            with self._lock:
+                if self._thread is not None:
+                    self._thread.join()
+                    self._thread = None
+                    if self._error is not None:
+                        raise self._error
+                if self._values is None:
+                    self._values = self._fill()
+        return self._values
+
+    def fill(self):
+        """
+        Fills the pool now, if it is not filled yet (or waits for the background thread).
+        """
+        self._get_values()
+
+    @property
+    def position(self):
+        """
+        The position of the next value, in unique mode.
+        """
+        return self._position
+
+    def seek(self, position):
+        """
+        Moves to the *position*-th value of the pool, in unique mode.
+        """
+        with self._lock:
+            self._position = position
+
+    def _take(self, n):
+        """
+        Returns the next *n* values of the pool, in unique mode.
+        """
+        values = self._get_values()
+        with self._lock:
+            start = self._position
+            if start + n > len(values):
+                raise ValueError("The {} unique values of {} are exhausted".format(len(values), self.spec))
+            self._position += n
+        return values[start:start + n]
+
+    def resolve(self):
+        if self.unique:
+            return self._take(1)[0]
+        return random.choice(self._get_values())
+
+    def resolve_batch(self, n):
+        if self.unique:
+            return self._take(n)
+        return super(Pooled, self).resolve_batch(n)
+
+    def _resolve_numpy(self, n):
+        values = self._get_values()
+        return [values[index] for index in numpy.random.randint(0, len(values), size=n).tolist()]
+
+    def __getstate__(self):
+        # the pool is filled before being sent to the worker processes
+        self._get_values()
+        state = self.__dict__.copy()
+        state.update(_lock=None, _thread=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<Pooled {} size={} unique={}>".format(self.spec, self.size, self.unique)
+
+
+class ZipfSampler(object):
+    """
+    Samples ranks from 1 to *size*, the rank n with a probability proportional to ``1 / n ** s``, through the
+    rejection-inversion method of Hörmann and Derflinger. Nothing is stored per rank, so the memory doesn't depend on
+    *size*, and a rank takes a few draws of ``random`` on average.
+    """
+
+    def __init__(self, size, s):
+        self.size = size
+        self.s = s
+        self._integral_first = self._integral(1.5) - 1
+        self._integral_last = self._integral(size + 0.5)
+        self._threshold = 2 - self._inverse_integral(self._integral(2.5) - self._h(2))
+
+    def _h(self, x):
+        return math.exp(-self.s * math.log(x))
+
+    def _integral(self, x):
+        # the integral of h, from 1 to x
+        log_x = math.log(x)
+        t = (1 - self.s) * log_x
+        return (math.expm1(t) / t if abs(t) > 1e-8 else 1 + t / 2 * (1 + t / 3 * (1 + t / 4))) * log_x
+
+    def _inverse_integral(self, x):
+        t = max(x * (1 - self.s), -1)
+        return math.exp((math.log1p(t) / t if abs(t) > 1e-8 else 1 - t * (1 / 2 - t * (1 / 3 - t / 4))) * x)
+
+    def sample(self):
+        """
+        Returns a rank, from 1 to ``size``.
+        """
+        while True:
+            u = self._integral_last + random.random() * (self._integral_first - self._integral_last)
+            x = self._inverse_integral(u)
+            rank = min(max(int(x + 0.5), 1), self.size)
+            if rank - x <= self._threshold or u >= self._integral(rank + 0.5) - self._h(rank):
+                return rank
+
+
+class ForeignKeySpec:
+    """
+    The generation logic for foreign key fields. Keys are sampled from the key pool of the referenced model in batches
+    of *batch_size*, according to one of the following distributions:
+
+    - ``"uniform"``: every referenced instance has the same chance to be picked (the default behaviour).
+    - ``"zipf"``: the probability of the n-th key from the pool is proportional to ``1 / n ** s``, so the first
+      instances of the referenced model (the ones with the lowest primary keys) get most of the references.
+    - ``"round_robin"``: the referenced instances are picked one after another, in the order of the pool.
+    - ``"fixed"``: every referenced instance is picked exactly *k* times in a row (a fixed fan-out), then the next
+      one follows.
+
+    Usage::
+
+        wrapper[Post].by_user = ForeignKeySpec(distribution="zipf", s=1.2)
+        wrapper[Like].to_post = ForeignKeySpec(distribution="fixed", k=3)
+    """
+
+    DISTRIBUTIONS = ("uniform", "zipf", "round_robin", "fixed")
+
+    def __init__(self, distribution="uniform", s=1.0, k=1, batch_size=1024):
+        """
+        :param distribution: one of ``ForeignKeySpec.DISTRIBUTIONS``.
+        :param s: the exponent of the ``"zipf"`` distribution. Must be positive.
+        :param k: how many times each key is repeated by the ``"fixed"`` distribution.
+        :param batch_size: how many keys are sampled at once.
+        :raises ValueError: when the distribution or its parameters are invalid.
+        """
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError("Unknown distribution '{}'. Expected one of {}".format(distribution, self.DISTRIBUTIONS))
+        if s <= 0:
+            raise ValueError("The zipf exponent must be positive, got {}".format(s))
+        if k < 1:
+            raise ValueError("The fan-out must be at least 1, got {}".format(k))
+
+        self.distribution = distribution
+        self.s = s
+        self.k = k
+        self.batch_size = batch_size
+
+        self._key_pool = None
+        self._buffer = []
+        self._position = 0
+        self._zipf = None
+
+    def _bind(self, key_pool):
+        """
+        Resets the sampling state when the keys are picked from a different (or reloaded) key pool.
+        """
+        if key_pool is self._key_pool:
+            return
+        if not len(key_pool):
+            raise ValueError("No instances of {} to reference".format(key_pool.model.__name__))
+        self._key_pool = key_pool
+        self._buffer = []
+        self._position = 0
+        self._zipf = ZipfSampler(len(key_pool), self.s) if self.distribution == "zipf" else None
+
+    @property
+    def position(self):
+        """
+        The position of the next key, for the ``"round_robin"`` and ``"fixed"`` distributions.
+        """
+        return self._position
+
+    def seek(self, position, key_pool=None):
+        """
+        Moves to the *position*-th key of the ``"round_robin"`` and ``"fixed"`` distributions, so the keys picked for
+        a row depend on its index, not on the rows generated before by the current process.
+
+        :param position: the position of the next key.
+        :param key_pool: if given, the key pool from which the next keys are picked. Binding a new key pool resets
+                         the position, so it must be given before the first key is picked from it.
+        """
+        if key_pool is not None:
+            self._bind(key_pool)
+        self._buffer = []
+        self._position = position
+
+    def sample(self, key_pool, n):
+        """
+        Returns a list of *n* keys picked from *key_pool*.
+
+        :param key_pool: a ``KeyPool`` with the keys of the referenced model.
+        :param n: how many keys to return.
+        """
+        self._bind(key_pool)
+        keys = key_pool.keys
+
+        if self.distribution == "uniform":
+            return random.choices(keys, k=n)
+        if self.distribution == "zipf":
+            sample = self._zipf.sample
+            return [keys[sample() - 1] for _ in range(n)]
+
+        start = self._position
+        self._position += n
+        size = len(keys)
+        if self.distribution == "round_robin":
+            return [keys[position % size] for position in range(start, start + n)]
+        return [keys[(position // self.k) % size] for position in range(start, start + n)]
+
+    def pick(self, key_pool):
+        """
+        Returns a single key from *key_pool*. The keys are sampled in batches and served from a buffer.
+
+        :param key_pool: a ``KeyPool`` with the keys of the referenced model.
+        """
+        self._bind(key_pool)
+        if not self._buffer:
+            self._buffer = self.sample(key_pool, self.batch_size)
+            self._buffer.reverse()
+        return self._buffer.pop()
+
+    def __repr__(self):
+        return "<ForeignKeySpec distribution={} s={} k={}>".format(self.distribution, self.s, self.k)
@@ -0,0 +1,278 @@
+"""
+Instrumentation of the generation: the statistics collected for every model (see ``ModelWrapper.stats``) and the
+observers notified while the rows are generated (see ``ModelWrapper.add_observer``).
+"""
+import collections
+import contextlib
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class Latency(object):
+    """
+    A summary of the latencies of the batches of a model: how many batches, the total, the mean, the minimum and the
+    maximum time, in seconds.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def __repr__(self):
+        return "<Latency count={} mean={:.6f} min={} max={}>".format(self.count, self.mean, self.min, self.max)
+
+
+class ModelStats(object):
+    """
+    The statistics of the generation of a model.
+
+    - ``rows``: how many rows were persisted (or written to the files).
+    - ``generate_latency`` and ``persist_latency``: the ``Latency`` of generating and persisting the batches of rows.
+      Their totals tell if the generation is bound by the specifications or by the database.
+    - ``field_times``: the seconds spent generating the values of every field (resolving the specifications, or
+      picking the foreign keys), in the current process.
+    - ``retries``: how many duplicate values of the unique fields were replaced.
+    - ``elapsed``: the wall time of the generation of the model, in seconds.
+    """
+
+    def __init__(self, model, count, foreign_keys=()):
+        """
+        :param model: the generated model.
+        :param count: how many rows are generated.
+        :param foreign_keys: the names of the foreign key fields of the model.
+        """
+        self.model = model
+        self.count = count
+        self.foreign_keys = frozenset(foreign_keys)
+        self.rows = 0
+        self.generate_latency = Latency()
+        self.persist_latency = Latency()
+        self.field_times = {}
+        self.retries = 0
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    @property
+    def resolve_time(self):
+        """
+        The seconds spent resolving the specifications of the value fields.
+        """
+        return sum(seconds for field_name, seconds in self.field_times.items() if field_name not in self.foreign_keys)
+
+    @property
+    def pick_time(self):
+        """
+        The seconds spent picking the foreign keys.
+        """
+        return sum(seconds for field_name, seconds in self.field_times.items() if field_name in self.foreign_keys)
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        if not elapsed:
+            return 0.0
+        return self.rows / elapsed
+
+    @property
+    def eta(self):
+        """
+        The estimated number of seconds until all the rows are persisted, at the current rate, or ``None`` before the
+        first batch.
+        """
+        rate = self.rows_per_second
+        if not rate:
+            return None
+        return max(self.count - self.rows, 0) / rate
+
+    def __repr__(self):
+        return "<ModelStats({}) rows={}/{} rows/s={:.1f} generate={:.3f}s persist={:.3f}s>".format(
+            self.model.__name__, self.rows, self.count, self.rows_per_second, self.generate_latency.total,
+            self.persist_latency.total)
+
+
+class GenerationObserver(object):
+    """
+    Base class of the observers of the generation (see ``ModelWrapper.add_observer``). The methods do nothing by
+    default, so the subclasses override only the events they need. The events of the models generated in parallel,
+    and the persisted batches of the pipeline mode, are notified from other threads.
+    """
+
+    def on_generation_start(self, stats):
+        """
+        Called before the first model is generated, with the ``GenerationStats`` of the generation.
+        """
+        pass
+
+    def on_model_start(self, model_stats):
+        """
+        Called before the rows of a model are generated, with its ``ModelStats``.
+        """
+        pass
+
+    def on_batch_generated(self, model_stats, size, seconds):
+        """
+        Called after a batch of *size* rows was generated in *seconds*.
+        """
+        pass
+
+    def on_batch_persisted(self, model_stats, size, seconds):
+        """
+        Called after a batch of *size* rows was persisted (or written to the files) in *seconds*.
+        """
+        pass
+
+    def on_model_end(self, model_stats):
+        """
+        Called after all the rows of a model were persisted.
+        """
+        pass
+
+    def on_generation_end(self, stats):
+        """
+        Called after the generation is complete (but not when it failed).
+        """
+        pass
+
+
+class GenerationStats(object):
+    """
+    The statistics of a generation: a ``ModelStats`` per model in ``models``, and the profile of the generation when
+    one was captured:
+
+    - ``profile``: a ``pstats.Stats`` with the profile of the current thread, for ``profile="cprofile"``.
+    - ``memory``: a ``tracemalloc.Snapshot`` of the memory allocated at the end of the generation, and
+      ``memory_peak`` the peak size of the traced memory in bytes, for ``profile="tracemalloc"``.
+
+    It also dispatches the events of the generation to the observers.
+    """
+
+    def __init__(self, observers=()):
+        self.models = collections.OrderedDict()
+        self.observers = list(observers)
+        self.profile = None
+        self.memory = None
+        self.memory_peak = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self):
+        return sum(model_stats.rows for model_stats in self.models.values())
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        if not elapsed:
+            return 0.0
+        return self.rows / elapsed
+
+    def _notify(self, event, *args):
+        for observer in self.observers:
+            getattr(observer, event)(*args)
+
+    def start(self):
+        self._notify("on_generation_start", self)
+
+    def start_model(self, model, count, foreign_keys=()):
+        """
+        Records that the generation of *count* rows of *model* starts, and returns its ``ModelStats``.
+        """
+        model_stats = ModelStats(model, count, foreign_keys)
+        with self._lock:
+            self.models[model] = model_stats
+        self._notify("on_model_start", model_stats)
+        return model_stats
+
+    def batch_generated(self, model_stats, size, seconds):
+        model_stats.generate_latency.add(seconds)
+        self._notify("on_batch_generated", model_stats, size, seconds)
+
+    def batch_persisted(self, model_stats, size, seconds):
+        model_stats.rows += size
+        model_stats.persist_latency.add(seconds)
+        self._notify("on_batch_persisted", model_stats, size, seconds)
+
+    def end_model(self, model_stats, field_times=None, retries=0):
+        """
+        Records the end of the generation of a model, with the time spent on every field and the number of replaced
+        duplicates.
+        """
+        model_stats.field_times = dict(field_times or {})
+        model_stats.retries = retries
+        model_stats.elapsed = time.perf_counter() - model_stats.started
+        self._notify("on_model_end", model_stats)
+
+    def end(self):
+        self.elapsed = time.perf_counter() - self.started
+        self._notify("on_generation_end", self)
+
+    def report(self):
+        """
+        Returns a text table with the statistics of every model.
+        """
+        lines = ["{:<20} {:>10} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+            "model", "rows", "rows/s", "resolve", "pick", "persist", "retries")]
+        for model_stats in self.models.values():
+            lines.append("{:<20} {:>10} {:>12.1f} {:>9.3f}s {:>9.3f}s {:>9.3f}s {:>10}".format(
+                model_stats.model.__name__, model_stats.rows, model_stats.rows_per_second, model_stats.resolve_time,
+                model_stats.pick_time, model_stats.persist_latency.total, model_stats.retries))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "<GenerationStats models={} rows={} rows/s={:.1f}>".format(len(self.models), self.rows,
+                                                                          self.rows_per_second)
+
+
+# the profilers that can be enabled during a generation
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+@contextlib.contextmanager
+def profiling(stats, mode):
+    """
+    Captures a profile of the enclosed block into *stats* (a ``GenerationStats``): the CPU profile of the current
+    thread for ``"cprofile"``, the allocated memory for ``"tracemalloc"``. ``None`` captures nothing.
+    """
+    if mode is None:
+        yield
+    elif mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            stats.profile = pstats.Stats(profiler)
+    elif mode == "tracemalloc":
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            stats.memory = tracemalloc.take_snapshot()
+            stats.memory_peak = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+    else:
+        raise ValueError("Unknown profile mode '{}'. Expected one of {}".format(mode, PROFILE_MODES))
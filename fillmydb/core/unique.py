@@ -0,0 +1,170 @@
+"""
+Enforcement of the unique constraints of the fields before the rows are inserted, so a generation doesn't fail with an
+``IntegrityError`` after thousands of inserts.
+"""
+import hashlib
+import struct
+from array import array
+
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _mix64(x):
+    """
+    The finalizer of splitmix64: a bijection of the 64 bits integers, which spreads the bits of consecutive integers
+    over the whole range.
+    """
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return x ^ (x >> 31)
+
+
+class SeenSet(object):
+    """
+    A compact set of the values seen so far: only the 64 bits hashes of the values are stored, in an open addressing
+    hash table backed by an ``array`` of 8 bytes per slot. The table is kept between a quarter and half full, so a value
+    takes 16 to 32 bytes regardless of its size (48 while the table is doubled, when the old and the new tables
+    coexist), while a ``set`` of strings takes about 100 bytes per value.
+
+    The 64 bits integers and the floats are mixed by a bijection, so they never collide. The larger integers are
+    hashed by BLAKE2 and the other values by ``hash()`` (randomized SipHash for strings and bytes): two different
+    values with the same hash are considered equal, which only causes an extra value to be generated, with a
+    negligible probability. The builtin ``hash()`` is not used for the numbers, because it is reduced modulo
+    ``2 ** 61 - 1`` (``hash(-1) == hash(-2)``).
+    """
+
+    # the table is resized when it is more than half full
+    MAX_LOAD = 0.5
+
+    def __init__(self, capacity=1024):
+        size = 1
+        while size < capacity / self.MAX_LOAD:
+            size *= 2
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+        # 0 marks the empty slots, so the values hashed to 0 are tracked apart
+        self._has_zero = False
+
+    @staticmethod
+    def _hash(value):
+        if isinstance(value, int):
+            if -2 ** 63 <= value < 2 ** 63:
+                return _mix64(value & _MASK_64)
+            data = value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+            return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+        if isinstance(value, float):
+            # -0.0 == 0.0
+            return _mix64(struct.unpack("<Q", struct.pack("<d", value + 0.0))[0])
+        return hash(value) & _MASK_64
+
+    def _find(self, slots, mask, key):
+        index = key & mask
+        while slots[index] and slots[index] != key:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, value):
+        """
+        Adds *value* to the set.
+
+        :return: ``True`` if the value was added, ``False`` if it was already in the set.
+        """
+        key = self._hash(value)
+        if not key:
+            if self._has_zero:
+                return False
+            self._has_zero = True
+            self._count += 1
+            return True
+        index = self._find(self._slots, self._mask, key)
+        if self._slots[index]:
+            return False
+        self._slots[index] = key
+        self._count += 1
+        if self._count > len(self._slots) * self.MAX_LOAD:
+            self._grow()
+        return True
+
+    def __contains__(self, value):
+        key = self._hash(value)
+        if not key:
+            return self._has_zero
+        return bool(self._slots[self._find(self._slots, self._mask, key)])
+
+    def _grow(self):
+        slots = array("Q", bytes(16 * len(self._slots)))
+        mask = len(slots) - 1
+        for key in self._slots:
+            if key:
+                slots[self._find(slots, mask, key)] = key
+        self._slots, self._mask = slots, mask
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "<SeenSet size={} slots={}>".format(self._count, len(self._slots))
+
+
+class UniqueFilter(object):
+    """
+    Replaces the duplicate values generated for a unique field. In ``"retry"`` mode, a duplicate is replaced by a new
+    value of the specification, up to *max_attempts* times. In ``"suffix"`` mode, the string duplicates get a
+    deterministic ``-<n>`` suffix instead (the other values are retried).
+    """
+
+    MODES = ("retry", "suffix")
+
+    def __init__(self, model, field_name, field_spec, mode="retry", seen=None, max_attempts=100):
+        """
+        :param model: the model of the field. Used only for error reporting.
+        :param field_name: the name of the field.
+        :param field_spec: the specification generating the values of the field.
+        :param mode: ``"retry"`` or ``"suffix"``.
+        :param seen: a ``SeenSet`` with the values that are already used (for example stored in the table).
+        :param max_attempts: how many times a duplicate is generated again before giving up.
+        """
+        if mode not in self.MODES:
+            raise ValueError("Unknown unique mode '{}'. Expected one of {}".format(mode, self.MODES))
+        self.model = model
+        self.field_name = field_name
+        self.field_spec = field_spec
+        self.mode = mode
+        self.seen = seen if seen is not None else SeenSet()
+        self.max_attempts = max_attempts
+        # the next suffix, in "suffix" mode
+        self._suffix = 1
+        # how many duplicates were replaced
+        self.duplicates = 0
+
+    def filter_value(self, value):
+        """
+        Returns *value* if it wasn't seen before, or a replacement.
+
+        :raises ValueError: when no unique value could be generated.
+        """
+        if self.seen.add(value):
+            return value
+        self.duplicates += 1
+        if self.mode == "suffix" and isinstance(value, str):
+            while True:
+                candidate = "{}-{}".format(value, self._suffix)
+                self._suffix += 1
+                if self.seen.add(candidate):
+                    return candidate
+        for _ in range(self.max_attempts):
+            value = self.field_spec.resolve()
+            if self.seen.add(value):
+                return value
+        raise ValueError("Could not generate a unique value for {}.{} after {} attempts ({} values are used)".format(
+            self.model.__name__, self.field_name, self.max_attempts, len(self.seen)))
+
+    def filter(self, values):
+        """
+        Returns the list of *values*, with the duplicates replaced.
+        """
+        return [self.filter_value(value) for value in values]
+
+    def __repr__(self):
+        return "<UniqueFilter {}.{} mode={}>".format(self.model.__name__, self.field_name, self.mode)
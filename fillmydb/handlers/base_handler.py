@@ -1,4 +1,35 @@
 import abc
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import itertools
+import types
+
+from fillmydb.handlers.key_pool import KeyPool, compact_keys
+
+# the description of a field, independent of the ORM:
+# - kind: one of FIELD_KINDS, or None when the type is not known
+# - max_length: the maximum length of the strings (or bytes), if any
+# - choices: the list of the allowed values, if any
+# - nullable: if the field accepts NULL values
+# - precision: the maximum number of digits of the decimals, if any
+# - scale: the number of digits after the decimal point of the decimals, if any
+# - timezone: if the datetimes are stored with their time zone (or converted to UTC by the ORM)
+FieldInfo = collections.namedtuple("FieldInfo", ["kind", "max_length", "choices", "nullable", "precision", "scale",
+                                                 "timezone"], defaults=(None, None, False))
+
+# the layout of the fields of a model, computed once by the handler, so the generation loops don't introspect the model
+# for every row:
+# - fields_names: the names of all the fields, in the order of BaseHandler.fields_names
+# - value_fields: the names of the fields with normal values
+# - referenced_models: a read-only mapping from the names of the foreign keys to the referenced models
+# - columns: the names of the database columns, in the order of fields_names
+# - primary_key: the name of the primary key field
+FieldPlan = collections.namedtuple("FieldPlan", ["fields_names", "value_fields", "referenced_models", "columns",
+                                                 "primary_key"])
+
+FIELD_KINDS = ("string", "text", "integer", "float", "decimal", "boolean", "date", "datetime", "time", "binary", "uuid")
 
 
 class BaseHandler(metaclass=abc.ABCMeta):
@@ -12,6 +43,95 @@ class BaseHandler(metaclass=abc.ABCMeta):
         self.create_table_if_not_exists()
         self.fields, self.fields_names = self.get_fields()
         self.ref_models = self.get_referenced_models()
+        self.field_plan = self._build_field_plan()
+
+        # the primary keys that can be referenced by other models, loaded on demand by load_key_pool
+        self.key_pool = None
+
+    def _build_field_plan(self):
+        """
+        Introspects the model once and returns its FieldPlan.
+        """
+        referenced_models = {field_name: self.get_referenced_model_by_field_name(field_name)
+                             for field_name in self.fields_names if self.is_foreign_key_field(field_name)}
+        return FieldPlan(
+            fields_names=tuple(self.fields_names),
+            value_fields=tuple(field_name for field_name in self.fields_names if self.is_value_field(field_name)),
+            referenced_models=types.MappingProxyType(referenced_models),
+            columns=tuple(self.get_column_name(field_name) for field_name in self.fields_names),
+            primary_key=self.get_primary_key_field_name())
+
+    def load_key_pool(self):
+        """
+        Loads the primary keys of the table into ``self.key_pool`` through a single query. Foreign keys pointing to
+        this model are picked from this pool afterwards.
+        :return: the loaded KeyPool
+        """
+        self.key_pool = KeyPool(self.model, self.get_primary_keys())
+        return self.key_pool
+
+    # asynchronous hooks, used by ModelWrapper.agenerate. By default they run the synchronous methods in the default
+    # executor of the event loop, so the handlers of asynchronous drivers override them.
+
+    async def _run_in_executor(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+    async def acreate_table_if_not_exists(self):
+        """
+        Asynchronous version of BaseHandler.create_table_if_not_exists. By default it does nothing, because the table
+        is created by the constructor.
+        """
+        pass
+
+    async def acreate_instances_bulk(self, rows):
+        """
+        Asynchronous version of BaseHandler.create_instances_bulk.
+        """
+        await self._run_in_executor(self.create_instances_bulk, rows)
+
+    async def acreate_rows_bulk(self, fields_names, rows):
+        """
+        Asynchronous version of BaseHandler.create_rows_bulk.
+        """
+        await self._run_in_executor(self.create_rows_bulk, fields_names, rows)
+
+    async def aload_key_pool(self):
+        """
+        Asynchronous version of BaseHandler.load_key_pool.
+        """
+        self.key_pool = await self._run_in_executor(lambda: KeyPool(self.model, self.get_primary_keys()))
+        return self.key_pool
+
+    async def aget_field_values(self, field_name, chunk_size=10000):
+        """
+        Asynchronous version of BaseHandler.get_field_values: an asynchronous iterator of the values, read in chunks
+        of *chunk_size* values by a dedicated thread (the cursor stays in the thread that opened it), so the column
+        is not loaded in memory at once.
+        """
+        loop = asyncio.get_running_loop()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            values = await loop.run_in_executor(executor, lambda: iter(self.get_field_values(field_name)))
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(executor, lambda: list(itertools.islice(values, chunk_size)))
+                    if not chunk:
+                        return
+                    for value in chunk:
+                        yield value
+            finally:
+                await loop.run_in_executor(executor, self.close_connection)
+
+    async def aget_primary_keys_where_null(self, field_name):
+        """
+        Asynchronous version of BaseHandler.get_primary_keys_where_null.
+        """
+        return await self._run_in_executor(lambda: compact_keys(self.get_primary_keys_where_null(field_name)))
+
+    async def aupdate_field_values(self, field_name, pairs):
+        """
+        Asynchronous version of BaseHandler.update_field_values.
+        """
+        await self._run_in_executor(self.update_field_values, field_name, pairs)
 
     @abc.abstractmethod
     def create_table_if_not_exists(self):
@@ -44,6 +164,103 @@ class BaseHandler(metaclass=abc.ABCMeta):
         """
         pass
 
+    @abc.abstractmethod
+    def create_instances_bulk(self, rows):
+        """
+        Persists many instances at once. *rows* is a list of dicts, each one holding the attributes of an instance
+        (same as the keyword arguments of BaseHandler.create_instance_and_persist). Implementations must use a
+        single multi-row insert per call instead of one query per instance.
+        :param rows:
+        :return:
+        """
+        pass
+
+    def create_rows_bulk(self, fields_names, rows):
+        """
+        Same as BaseHandler.create_instances_bulk, but *rows* is a list of tuples with the values of the
+        *fields_names* fields, in this order (as generated by ``RowBuilder``), so no dict is built for every row. The
+        fields that are not listed get their default values. The handlers override it with a native implementation;
+        by default the rows are converted to dicts.
+        :param fields_names:
+        :param rows:
+        :return:
+        """
+        self.create_instances_bulk([dict(zip(fields_names, row)) for row in rows])
+
+    def bulk_load_rows(self, fields_names, rows):
+        """
+        Same as BaseHandler.bulk_load, for rows given as tuples (see BaseHandler.create_rows_bulk).
+        :param fields_names:
+        :param rows:
+        :return:
+        """
+        self.bulk_load([dict(zip(fields_names, row)) for row in rows])
+
+    @abc.abstractmethod
+    def bulk_load(self, rows):
+        """
+        Same as BaseHandler.create_instances_bulk, but bypasses the ORM and loads the rows through the database
+        connection with the fastest method available: ``COPY FROM STDIN`` for PostgreSQL and a prepared
+        ``executemany`` for SQLite. The values are converted the same way the ORM converts them, so the stored rows
+        are identical. Other databases fall back to BaseHandler.create_instances_bulk.
+        :param rows:
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def bulk_load_context(self):
+        """
+        Returns a context manager that prepares the connection of the current thread for BaseHandler.bulk_load and
+        restores it at the end. For SQLite, the synchronous writes are turned off and the rollback journal is kept
+        in memory.
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def atomic(self):
+        """
+        Returns a context manager that runs the enclosed queries in a transaction. The transaction is committed when
+        the block exits normally and rolled back when it raises an exception.
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def close_connection(self):
+        """
+        Closes the database connection of the current thread. Called by the threads that persist instances in the
+        background, when they are done.
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_table_name(self):
+        """
+        Returns the name of the database table of the model.
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_column_name(self, field_name):
+        """
+        Returns the name of the database column of the *field_name* field.
+        :param field_name:
+        :return:
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_primary_key_field_name(self):
+        """
+        Returns the name of the primary key field.
+        :return:
+        """
+        pass
+
     @abc.abstractmethod
     def get_referenced_models(self):
         """
@@ -70,6 +287,43 @@ class BaseHandler(metaclass=abc.ABCMeta):
         """
         pass
 
+    @abc.abstractmethod
+    def is_nullable_field(self, field_name):
+        """
+        Indicates if the *field_name* field accepts NULL values.
+        :param field_name:
+        :return: True or False
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_field_info(self, field_name):
+        """
+        Describes the type and the constraints of the *field_name* field.
+        :param field_name:
+        :return: a FieldInfo
+        """
+        pass
+
+    @abc.abstractmethod
+    def is_unique_field(self, field_name):
+        """
+        Indicates if the *field_name* field has a unique constraint (on this single field).
+        :param field_name:
+        :return: True or False
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_field_values(self, field_name):
+        """
+        Returns the values of the *field_name* field of all the instances from the table, loaded through a single
+        query.
+        :param field_name:
+        :return: an iterable of values
+        """
+        pass
+
     @abc.abstractmethod
     def get_referenced_model_by_field_name(self, field_name):
         """
@@ -87,6 +341,36 @@ class BaseHandler(metaclass=abc.ABCMeta):
         """
         pass
 
+    @abc.abstractmethod
+    def get_primary_keys(self):
+        """
+        Returns the primary keys of all the instances from the table in ascending order, loaded through a single
+        query. The keys should be streamed from the cursor instead of being collected in a list, so they can be
+        stored compactly by KeyPool.
+        :return: an iterable of primary keys
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_primary_keys_where_null(self, field_name):
+        """
+        Returns the primary keys of the instances that have NULL in the *field_name* field, preferably streamed from the
+        cursor.
+        :param field_name:
+        :return: an iterable of primary keys
+        """
+        pass
+
+    @abc.abstractmethod
+    def update_field_values(self, field_name, pairs):
+        """
+        Sets the *field_name* field of existing instances. *pairs* is a list of (primary key, value) tuples.
+        :param field_name:
+        :param pairs:
+        :return:
+        """
+        pass
+
     @abc.abstractmethod
     def __repr__(self):
         pass
@@ -0,0 +1,86 @@
+"""
+Helpers for loading rows through the DB-API connection of a handler, bypassing the ORM: ``COPY FROM STDIN`` for
+PostgreSQL and a prepared ``executemany`` for SQLite. The rows must already be converted to database values.
+"""
+import contextlib
+import io
+
+
+def quote_identifier(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def insert_rows(cursor, table_name, columns, rows, placeholder="?"):
+    """
+    Inserts *rows* (sequences of values, in the order of *columns*) through a single prepared statement.
+    """
+    query = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote_identifier(table_name), ", ".join(quote_identifier(column) for column in columns),
+        ", ".join([placeholder] * len(columns)))
+    cursor.executemany(query, rows)
+
+
+def _copy_text_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea in hex format, with the backslash escaped for the text format of COPY
+        return "\\\\x" + bytes(value).hex()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_text(rows):
+    """
+    Serializes *rows* in the text format of the PostgreSQL ``COPY`` command.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(cursor, table_name, columns, rows):
+    """
+    Streams *rows* into the table through ``COPY ... FROM STDIN``. Supports psycopg2 and psycopg (3) cursors.
+    """
+    query = "COPY {} ({}) FROM STDIN".format(
+        quote_identifier(table_name), ", ".join(quote_identifier(column) for column in columns))
+    data = copy_text(rows)
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(query, data)
+    else:
+        with cursor.copy(query) as copy:
+            copy.write(data.getvalue())
+
+
+def _pragma(cursor, name, value=None):
+    if value is None:
+        cursor.execute("PRAGMA {}".format(name))
+        return cursor.fetchone()[0]
+    cursor.execute("PRAGMA {}={}".format(name, value))
+    # some pragmas return the new value
+    cursor.fetchall()
+
+
+@contextlib.contextmanager
+def sqlite_fast_pragmas(cursor):
+    """
+    Turns off the synchronous writes and keeps the rollback journal in memory for the duration of the block, then
+    restores the previous settings. Trades durability in case of a crash for speed. The pragmas apply only to the
+    connection of *cursor*.
+
+    :param cursor: a DB-API cursor.
+    """
+    synchronous = _pragma(cursor, "synchronous")
+    journal_mode = _pragma(cursor, "journal_mode")
+    _pragma(cursor, "synchronous", "OFF")
+    _pragma(cursor, "journal_mode", "MEMORY")
+    try:
+        yield
+    finally:
+        _pragma(cursor, "journal_mode", journal_mode)
+        _pragma(cursor, "synchronous", synchronous)
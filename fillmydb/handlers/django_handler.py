@@ -1,11 +1,17 @@
+import contextlib
+import logging
 import random
 
-from django.db.models import Field, ForeignKey, ManyToManyField, OneToOneField, ManyToOneRel
+from django.db.models import Model, Field, ForeignKey, ManyToManyField, OneToOneField, ManyToOneRel
 from django.db.models.aggregates import Count
 from django.conf import settings
+from django.db import connection, transaction
 import django.core.exceptions
 
-from fillmydb.handlers.base_handler import BaseHandler
+from fillmydb.handlers.base_handler import BaseHandler, FieldInfo
+from fillmydb.handlers import bulk_load
+
+logger = logging.getLogger(__name__)
 
 
 class DjangoHandler(BaseHandler):
@@ -13,6 +19,9 @@ class DjangoHandler(BaseHandler):
 
     def __init__(self, model):
         super(DjangoHandler, self).__init__(model)
+        # the "<field>_id" attributes of the foreign keys
+        self._foreign_key_attnames = {field_name: self.model._meta.get_field(field_name).attname
+                                      for field_name in self.field_plan.referenced_models}
 
     def create_table_if_not_exists(self):
         # no need to handle table creation as django handles it
@@ -25,8 +34,7 @@ class DjangoHandler(BaseHandler):
             if field_obj.concrete:
                 field_objs.append(field_obj)
                 field_names.append(field_obj.name)
-        print(field_names)
-        print(field_objs)
+        logger.debug("Fields of %s: %s", self.model.__name__, field_names)
         return field_objs, field_names
 
     def is_value_field(self, field_name):
@@ -40,26 +48,147 @@ class DjangoHandler(BaseHandler):
             return True
         return False
 
+    def get_table_name(self):
+        return self.model._meta.db_table
+
+    def get_column_name(self, field_name):
+        return self.model._meta.get_field(field_name).column
+
+    def get_primary_key_field_name(self):
+        return self.model._meta.pk.name
+
     def get_referenced_models(self):
         models = []
         for field in self.fields_names:
             if self.is_foreign_key_field(field):
                 models.append(self.get_referenced_model_by_field_name(field))
-        print("{} : {}".format(self.model, models))
+        logger.debug("Models referenced by %s: %s", self.model.__name__, [model.__name__ for model in models])
         return models
 
+    def is_nullable_field(self, field_name):
+        return self.model._meta.get_field(field_name).null
+
+    # the kinds of the Django field types (Field.get_internal_type)
+    FIELD_KINDS = {
+        "CharField": "string", "SlugField": "string", "TextField": "text",
+        "AutoField": "integer", "BigAutoField": "integer", "SmallAutoField": "integer", "IntegerField": "integer",
+        "BigIntegerField": "integer", "SmallIntegerField": "integer", "PositiveIntegerField": "integer",
+        "PositiveBigIntegerField": "integer", "PositiveSmallIntegerField": "integer",
+        "FloatField": "float", "DecimalField": "decimal", "BooleanField": "boolean", "NullBooleanField": "boolean",
+        "DateField": "date", "DateTimeField": "datetime", "TimeField": "time", "BinaryField": "binary",
+        "UUIDField": "uuid",
+    }
+
+    def get_field_info(self, field_name):
+        field = self.model._meta.get_field(field_name)
+        choices = [choice[0] for choice in field.flatchoices] if field.choices else None
+        kind = self.FIELD_KINDS.get(field.get_internal_type())
+        # with USE_TZ, Django expects aware datetimes
+        return FieldInfo(kind, field.max_length, choices, field.null, getattr(field, "max_digits", None),
+                         getattr(field, "decimal_places", None), kind == "datetime" and bool(settings.USE_TZ))
+
+    def is_unique_field(self, field_name):
+        return self.model._meta.get_field(field_name).unique
+
+    def get_field_values(self, field_name):
+        return self.model.objects.values_list(field_name, flat=True).iterator()
+
     def get_referenced_model_by_field_name(self, field_name):
         if self.is_foreign_key_field(field_name):
-            ref_model = self.model._meta.get_field(field_name).rel.to
-            if ref_model != self.model:
-                return ref_model
+            field_object = self.model._meta.get_field(field_name)
+            # Django 2.0 removed the "rel" attribute
+            if hasattr(field_object, "remote_field"):
+                return field_object.remote_field.model
+            return field_object.rel.to
         raise ValueError("Fied '{}' is not a foreign key".format(field_name))
 
     def create_instance_and_persist(self, **attrs):
-        return self.model.objects.create(**attrs)
+        return self.model.objects.create(**self._resolve_foreign_keys(attrs))
+
+    def create_instances_bulk(self, rows):
+        self.model.objects.bulk_create([self.model(**self._resolve_foreign_keys(row)) for row in rows],
+                                       batch_size=len(rows))
+
+    async def acreate_instances_bulk(self, rows):
+        # the asynchronous ORM interface was added in Django 4.1
+        if not hasattr(self.model.objects, "abulk_create"):
+            return await super(DjangoHandler, self).acreate_instances_bulk(rows)
+        await self.model.objects.abulk_create([self.model(**self._resolve_foreign_keys(row)) for row in rows],
+                                              batch_size=len(rows))
+
+    def create_rows_bulk(self, fields_names, rows):
+        self.model.objects.bulk_create(self._instances_of_rows(fields_names, rows), batch_size=len(rows))
+
+    async def acreate_rows_bulk(self, fields_names, rows):
+        if not hasattr(self.model.objects, "abulk_create"):
+            return await super(DjangoHandler, self).acreate_rows_bulk(fields_names, rows)
+        await self.model.objects.abulk_create(self._instances_of_rows(fields_names, rows), batch_size=len(rows))
+
+    def _instances_of_rows(self, fields_names, rows):
+        # the generated foreign keys are primary keys, assigned through the "<field>_id" attributes
+        attnames = [self._foreign_key_attnames.get(field_name, field_name) for field_name in fields_names]
+        return [self.model(**dict(zip(attnames, row))) for row in rows]
+
+    def bulk_load(self, rows):
+        fields_names = [name for name in rows[0]
+                        if not (self.model._meta.get_field(name).primary_key and rows[0][name] is None)]
+        self.bulk_load_rows(fields_names, [tuple(row[name] for name in fields_names) for row in rows])
+
+    def bulk_load_rows(self, fields_names, rows):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.create_rows_bulk(fields_names, rows)
+            return
+
+        fields = [self.model._meta.get_field(name) for name in fields_names]
+        values = [[field.get_db_prep_save(self._primary_key_of(value), connection) for field, value in zip(fields, row)]
+                  for row in rows]
+        columns = [field.column for field in fields]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                bulk_load.copy_rows(cursor, self.model._meta.db_table, columns, values)
+            else:
+                bulk_load.insert_rows(cursor, self.model._meta.db_table, columns, values, placeholder="%s")
+
+    def bulk_load_context(self):
+        if connection.vendor == "sqlite":
+            return bulk_load.sqlite_fast_pragmas(connection.cursor())
+        return contextlib.ExitStack()
+
+    def _primary_key_of(self, value):
+        if isinstance(value, Model):
+            return value.pk
+        return value
+
+    def atomic(self):
+        return transaction.atomic()
 
     def create_instance(self, **attrs):
-        return self.model(**attrs)
+        return self.model(**self._resolve_foreign_keys(attrs))
+
+    def _resolve_foreign_keys(self, attrs):
+        """
+        Foreign keys picked from a key pool are primary keys, not model instances, so they are assigned through the
+        ``<field>_id`` attribute of the field.
+        """
+        attnames = self._foreign_key_attnames
+        resolved = {}
+        for field_name, value in attrs.items():
+            if field_name in attnames and value is not None and not isinstance(value, Model):
+                field_name = attnames[field_name]
+            resolved[field_name] = value
+        return resolved
+
+    def get_primary_keys_where_null(self, field_name):
+        return self.model.objects.filter(**{field_name + "__isnull": True}).values_list("pk", flat=True).iterator()
+
+    def update_field_values(self, field_name, pairs):
+        attname = self.model._meta.get_field(field_name).attname
+        instances = [self.model(**{"pk": key, attname: value}) for key, value in pairs]
+        self.model.objects.bulk_update(instances, [field_name], batch_size=500)
+
+    def close_connection(self):
+        connection.close()
 
     def __repr__(self):
         return "<DjangoHandler for {}>".format(self.model.__name__)
@@ -68,3 +197,6 @@ class DjangoHandler(BaseHandler):
         count = self.model.objects.all().count()
         random_index = random.randint(0, count - 1)
         return self.model.objects.all()[random_index]
+
+    def get_primary_keys(self):
+        return self.model.objects.order_by("pk").values_list("pk", flat=True).iterator()
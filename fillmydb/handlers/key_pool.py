@@ -0,0 +1,113 @@
+import itertools
+import random
+from array import array
+
+
+def compact_keys(keys, chunk_size=65536):
+    """
+    Stores *keys* (an iterable of primary keys, usually in ascending order) in the most compact way, reading them in
+    chunks of *chunk_size* keys:
+
+    - a ``range`` for contiguous integers (for example the keys of a table filled by a single generation), which takes
+      no memory at all;
+    - an ``array('q')`` for other 64 bits integers, 8 bytes per key (a list of ints takes about 36 bytes per key);
+    - a ``list`` for any other type of keys (UUIDs, strings, ...).
+    """
+    if isinstance(keys, (range, array)):
+        return keys
+    compactor = KeyCompactor()
+    iterator = iter(keys)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return compactor.keys()
+        compactor.extend(chunk)
+
+
+class KeyCompactor(object):
+    """
+    Builds the storage of ``compact_keys`` incrementally, from chunks of keys, for the sources that can't be read as
+    an iterable (for example the partitions of an asynchronous result).
+    """
+
+    def __init__(self):
+        # the keys added so far are range(start, start + count) while compact and other are None
+        self._start = 0
+        self._count = 0
+        self._compact = None
+        self._other = None
+
+    def extend(self, chunk):
+        """
+        Adds the keys of *chunk* (a list).
+        """
+        if self._other is not None:
+            self._other.extend(chunk)
+            return
+        try:
+            values = array("q", chunk)
+        except (TypeError, OverflowError):
+            self._other = list(self.keys()) + list(chunk)
+            return
+        if self._compact is None:
+            if not self._count and chunk:
+                self._start = chunk[0]
+            end = self._start + self._count
+            if chunk == list(range(end, end + len(chunk))):
+                self._count += len(chunk)
+                return
+            self._compact = array("q", range(self._start, end))
+        self._compact.extend(values)
+
+    def keys(self):
+        """
+        Returns the keys added so far, as a ``range``, an ``array('q')`` or a ``list``.
+        """
+        if self._other is not None:
+            return self._other
+        if self._compact is not None:
+            return self._compact
+        return range(self._start, self._start + self._count)
+
+
+class KeyPool:
+    """
+    An in-memory pool with the primary keys of a table. Foreign keys are assigned by picking a key from the pool of
+    the referenced model, without querying the database for every generated row. The keys are stored compactly (see
+    ``compact_keys``), so the pool of a table with a hundred million rows fits in memory.
+    """
+
+    def __init__(self, model, keys):
+        """
+        :param model: the model the keys belong to. Used only for error reporting.
+        :param keys: an iterable with the primary keys. It is consumed in chunks, without building a list of all the
+                     keys first.
+        """
+        self.model = model
+        self.keys = compact_keys(keys)
+
+    def pick(self):
+        """
+        Returns a random key from the pool.
+
+        :raises ValueError: when the pool is empty (there is no instance to be referenced).
+        """
+        if not self.keys:
+            raise ValueError("No instances of {} to reference".format(self.model.__name__))
+        return random.choice(self.keys)
+
+    def sample(self, n):
+        """
+        Returns a list of *n* random keys from the pool.
+
+        :raises ValueError: when the pool is empty.
+        """
+        if not self.keys:
+            raise ValueError("No instances of {} to reference".format(self.model.__name__))
+        return random.choices(self.keys, k=n)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return "<KeyPool({}) size={}>".format(self.model.__name__, len(self.keys))
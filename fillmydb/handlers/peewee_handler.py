@@ -1,6 +1,9 @@
+import contextlib
+
 import peewee
 
-from fillmydb.handlers.base_handler import BaseHandler
+from fillmydb.handlers.base_handler import BaseHandler, FieldInfo
+from fillmydb.handlers import bulk_load
 
 
 class PeeweeHandler(BaseHandler):
@@ -17,7 +20,8 @@ class PeeweeHandler(BaseHandler):
         fields_names = []
         for field_name in dir(self.model):
             field = getattr(self.model, field_name)
-            if isinstance(field, peewee.Field):
+            # foreign keys are also reachable through their "<name>_id" accessor, which must not be listed twice
+            if isinstance(field, peewee.Field) and field.name == field_name:
                 fields.append(field)
                 fields_names.append(field_name)
         return fields, fields_names
@@ -28,6 +32,58 @@ class PeeweeHandler(BaseHandler):
     def create_instance_and_persist(self, **attrs):
         return self.model.create(**attrs)
 
+    def create_instances_bulk(self, rows):
+        primary_key = self.model._meta.primary_key.name
+        # let the database assign the primary keys that were not generated
+        rows = [{name: value for name, value in row.items() if name != primary_key or value is not None}
+                for row in rows]
+        self.model.insert_many(rows).execute()
+
+    def create_rows_bulk(self, fields_names, rows):
+        fields = [self.model._meta.fields[name] for name in fields_names]
+        self.model.insert_many(rows, fields=fields).execute()
+
+    def bulk_load(self, rows):
+        primary_key = self.model._meta.primary_key.name
+        fields_names = [name for name in rows[0] if name != primary_key or rows[0][name] is not None]
+        self.bulk_load_rows(fields_names, [tuple(row[name] for name in fields_names) for row in rows])
+
+    def bulk_load_rows(self, fields_names, rows):
+        database = self.model._meta.database
+        if not isinstance(database, (peewee.SqliteDatabase, peewee.PostgresqlDatabase)):
+            self.create_rows_bulk(fields_names, rows)
+            return
+
+        fields = [self.model._meta.fields[name] for name in fields_names]
+        converters = [field.db_value for field in fields]
+        values = [[convert(value) for convert, value in zip(converters, row)] for row in rows]
+        columns = [field.column_name for field in fields]
+
+        with database.atomic():
+            cursor = database.cursor()
+            if isinstance(database, peewee.PostgresqlDatabase):
+                bulk_load.copy_rows(cursor, self.model._meta.table_name, columns, values)
+            else:
+                bulk_load.insert_rows(cursor, self.model._meta.table_name, columns, values)
+
+    def bulk_load_context(self):
+        database = self.model._meta.database
+        if isinstance(database, peewee.SqliteDatabase):
+            return bulk_load.sqlite_fast_pragmas(database.cursor())
+        return contextlib.ExitStack()
+
+    def atomic(self):
+        return self.model._meta.database.atomic()
+
+    def get_table_name(self):
+        return self.model._meta.table_name
+
+    def get_column_name(self, field_name):
+        return self.model._meta.fields[field_name].column_name
+
+    def get_primary_key_field_name(self):
+        return self.model._meta.primary_key.name
+
     def get_referenced_models(self):
         dependencies = []
         for field in self.fields:
@@ -43,6 +99,37 @@ class PeeweeHandler(BaseHandler):
         if isinstance(field, peewee.ForeignKeyField):
             return True
 
+    def is_nullable_field(self, field_name):
+        return getattr(self.model, field_name).null
+
+    # the kinds of the peewee field types (Field.field_type)
+    FIELD_KINDS = {
+        "CHAR": "string", "VARCHAR": "string", "TEXT": "text",
+        "AUTO": "integer", "BIGAUTO": "integer", "INT": "integer", "BIGINT": "integer", "SMALLINT": "integer",
+        "FLOAT": "float", "DOUBLE": "float", "DECIMAL": "decimal", "BOOL": "boolean",
+        "DATE": "date", "DATETIME": "datetime", "TIMESTAMPTZ": "datetime", "TIME": "time", "BLOB": "binary",
+        "UUID": "uuid",
+    }
+
+    def get_field_info(self, field_name):
+        field = getattr(self.model, field_name)
+        choices = [choice[0] for choice in field.choices] if field.choices else None
+        return FieldInfo(self.FIELD_KINDS.get(field.field_type), getattr(field, "max_length", None), choices,
+                         field.null, getattr(field, "max_digits", None), getattr(field, "decimal_places", None),
+                         field.field_type == "TIMESTAMPTZ")
+
+    def is_unique_field(self, field_name):
+        field = getattr(self.model, field_name)
+        if field.unique:
+            return True
+        # unique indexes declared in Meta.indexes, as ((field names), unique) tuples
+        return any(unique and tuple(fields) == (field_name,) for fields, unique in self.model._meta.indexes
+                   if isinstance(fields, (list, tuple)))
+
+    def get_field_values(self, field_name):
+        query = self.model.select(getattr(self.model, field_name)).tuples()
+        return (row[0] for row in query.iterator())
+
     def get_referenced_model_by_field_name(self, field_name):
         return getattr(self.model, field_name).rel_model
 
@@ -51,5 +138,26 @@ class PeeweeHandler(BaseHandler):
         for item in query:
             return item
 
+    def get_primary_keys(self):
+        primary_key = self.model._meta.primary_key
+        query = self.model.select(primary_key).order_by(primary_key).tuples()
+        # streamed from the cursor, so the keys can be stored compactly by KeyPool
+        return (row[0] for row in query.iterator())
+
+    def get_primary_keys_where_null(self, field_name):
+        primary_key = self.model._meta.primary_key
+        query = self.model.select(primary_key).where(getattr(self.model, field_name).is_null()).tuples()
+        return (row[0] for row in query.iterator())
+
+    def update_field_values(self, field_name, pairs):
+        primary_key = self.model._meta.primary_key.name
+        instances = [self.model(**{primary_key: key, field_name: value}) for key, value in pairs]
+        self.model.bulk_update(instances, fields=[getattr(self.model, field_name)], batch_size=500)
+
+    def close_connection(self):
+        database = self.model._meta.database
+        if not database.is_closed():
+            database.close()
+
     def __repr__(self):
         return "<PeeweeHandler for {}>".format(self.model.__name__)
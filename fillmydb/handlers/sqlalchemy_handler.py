@@ -1,42 +1,326 @@
-from fillmydb.handlers.base_handler import BaseHandler
+import contextlib
+import datetime
+import decimal
+import threading
+import uuid
+
+from sqlalchemy import insert, select, update, func, bindparam, UniqueConstraint, Enum, Text
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+except ImportError:
+    AsyncEngine = None
+
+from fillmydb.handlers.base_handler import BaseHandler, FieldInfo
+from fillmydb.handlers.key_pool import KeyPool, KeyCompactor
+from fillmydb.handlers import bulk_load
 
 
 class SqlalchemyHandler(BaseHandler):
     DB_TYPE = "sqlalchemy"
 
-    def __init__(self, model):
+    def __init__(self, model, bind=None):
+        """
+        :param model: a declarative model.
+        :param bind: the engine used for persisting instances. Defaults to the engine bound to the metadata of the
+                     model (only for SQLAlchemy versions older than 2.0). An ``AsyncEngine`` can only be used through
+                     the asynchronous hooks (``ModelWrapper.agenerate``).
+        :raises ValueError: when no engine can be found.
+        """
+        self.table = model.__table__
+        self.bind = bind if bind is not None else getattr(self.table.metadata, "bind", None)
+        if self.bind is None:
+            raise ValueError("No engine is bound to {}. Pass it to the ModelWrapper through bind=...".format(
+                model.__name__))
+
+        self.is_async = AsyncEngine is not None and isinstance(self.bind, AsyncEngine)
+
+        # the connection of the transaction opened by atomic() in the current thread
+        self._local = threading.local()
+
         super(SqlalchemyHandler, self).__init__(model)
 
     def __repr__(self):
-        "<SqlalchemyHandler for {}>".format(self.model.__name__)
+        return "<SqlalchemyHandler for {}>".format(self.model.__name__)
 
     def get_referenced_model_by_field_name(self, field_name):
-        pass
+        if not self.is_foreign_key_field(field_name):
+            raise ValueError("Field '{}' is not a foreign key".format(field_name))
+        ref_table = next(iter(getattr(self.table.c, field_name).foreign_keys)).column.table
+        for mapper in self.model.registry.mappers:
+            if mapper.local_table is ref_table:
+                return mapper.class_
+        raise ValueError("No model is mapped to the table '{}' referenced by '{}'".format(ref_table.name, field_name))
 
     def create_instance(self, **attrs):
-        pass
+        return self.model(**attrs)
 
     def pick_random_instance(self):
-        pass
+        query = select(self.table).order_by(func.random()).limit(1)
+        with self._connection() as connection:
+            row = connection.execute(query).first()
+        if row is not None:
+            return self.model(**row._mapping)
+
+    def get_primary_keys(self):
+        primary_key = self._primary_key_column()
+        return self._stream_scalars(select(primary_key).order_by(primary_key))
+
+    def _stream_scalars(self, query, chunk_size=10000):
+        """
+        Yields the values of the single column selected by *query*, fetched from the database in chunks of
+        *chunk_size* rows.
+        """
+        with self._connection() as connection:
+            yield from connection.execution_options(yield_per=chunk_size).execute(query).scalars()
 
     def get_fields(self):
         field_names = []
         field_objs = []
 
-        for field in self.model.__table__.columns:
-            pass
+        for field in self.table.columns:
+            field_objs.append(field)
+            field_names.append(field.key)
+        return field_objs, field_names
 
     def create_table_if_not_exists(self):
-        self.model.__table__.create(checkfirst=True)
+        # asynchronous engines create the table in acreate_table_if_not_exists
+        if not self.is_async:
+            self.table.create(bind=self.bind, checkfirst=True)
 
     def is_value_field(self, field_name):
         return not self.is_foreign_key_field(field_name)
 
+    def get_table_name(self):
+        return self.table.name
+
+    def get_column_name(self, field_name):
+        return getattr(self.table.c, field_name).name
+
+    def get_primary_key_field_name(self):
+        return self._primary_key_column().key
+
     def get_referenced_models(self):
-        pass
+        models = []
+        for field in self.fields_names:
+            if self.is_foreign_key_field(field):
+                models.append(self.get_referenced_model_by_field_name(field))
+        return models
 
     def create_instance_and_persist(self, **attrs):
+        attrs = self._without_empty_primary_key(attrs)
+        with self._connection() as connection:
+            result = connection.execute(insert(self.table).values(**attrs))
+        instance = self.model(**attrs)
+        setattr(instance, self._primary_key_column().key, result.inserted_primary_key[0])
+        return instance
+
+    def create_instances_bulk(self, rows):
+        rows = [self._without_empty_primary_key(row) for row in rows]
+        # a list of parameters makes the driver use executemany
+        with self._connection() as connection:
+            connection.execute(insert(self.table), rows)
+
+    def create_rows_bulk(self, fields_names, rows):
+        # the driver takes the parameters of executemany as mappings
+        with self._connection() as connection:
+            connection.execute(insert(self.table), [dict(zip(fields_names, row)) for row in rows])
+
+    def bulk_load(self, rows):
+        rows = [self._without_empty_primary_key(row) for row in rows]
+        fields_names = list(rows[0])
+        self.bulk_load_rows(fields_names, [tuple(row[name] for name in fields_names) for row in rows])
+
+    def bulk_load_rows(self, fields_names, rows):
+        dialect = self.bind.dialect
+        if dialect.name not in ("sqlite", "postgresql"):
+            self.create_rows_bulk(fields_names, rows)
+            return
+
+        columns = [getattr(self.table.c, name) for name in fields_names]
+        processors = [column.type.dialect_impl(dialect).bind_processor(dialect) for column in columns]
+        values = [[processor(value) if processor else value for processor, value in zip(processors, row)]
+                  for row in rows]
+        columns_names = [column.name for column in columns]
+
+        with self._connection() as connection:
+            cursor = connection.connection.dbapi_connection.cursor()
+            if dialect.name == "postgresql":
+                bulk_load.copy_rows(cursor, self.table.name, columns_names, values)
+            else:
+                bulk_load.insert_rows(cursor, self.table.name, columns_names, values)
+
+    @contextlib.contextmanager
+    def bulk_load_context(self):
+        if self.bind.dialect.name != "sqlite":
+            yield
+            return
+
+        # the pragmas are set on a connection, so the same connection is used until the end of the block
+        with self.bind.connect() as connection:
+            self._local.pinned_connection = connection
+            try:
+                with bulk_load.sqlite_fast_pragmas(connection.connection.dbapi_connection.cursor()):
+                    yield
+            finally:
+                self._local.pinned_connection = None
+
+    def atomic(self):
+        return self._transaction()
+
+    def close_connection(self):
+        # the connections are returned to the pool of the engine after every statement or transaction
         pass
 
+    def is_nullable_field(self, field_name):
+        return getattr(self.table.c, field_name).nullable
+
+    def get_primary_keys_where_null(self, field_name):
+        query = select(self._primary_key_column()).where(getattr(self.table.c, field_name).is_(None))
+        return self._stream_scalars(query)
+
+    def update_field_values(self, field_name, pairs):
+        query = update(self.table).where(self._primary_key_column() == bindparam("_key")).values(
+            {field_name: bindparam("_value")})
+        with self._connection() as connection:
+            connection.execute(query, [{"_key": key, "_value": value} for key, value in pairs])
+
+    def get_field_info(self, field_name):
+        column = getattr(self.table.c, field_name)
+        column_type = column.type
+        choices = list(column_type.enums) if isinstance(column_type, Enum) else None
+        try:
+            python_type = column_type.python_type
+        except NotImplementedError:
+            python_type = None
+
+        kind = None
+        # datetime is a subclass of date, so it is checked first
+        for types, type_kind in [((bool,), "boolean"), ((int,), "integer"), ((float,), "float"),
+                                 ((decimal.Decimal,), "decimal"), ((datetime.datetime,), "datetime"),
+                                 ((datetime.date,), "date"), ((datetime.time,), "time"), ((bytes,), "binary"),
+                                 ((uuid.UUID,), "uuid"), ((str,), "string")]:
+            if python_type is not None and issubclass(python_type, types):
+                kind = type_kind
+                break
+        max_length = getattr(column_type, "length", None)
+        if kind == "string" and isinstance(column_type, Text) and not max_length:
+            kind = "text"
+        precision, scale = None, None
+        if kind == "decimal":
+            precision, scale = getattr(column_type, "precision", None), getattr(column_type, "scale", None)
+        timezone = kind == "datetime" and bool(getattr(column_type, "timezone", False))
+        return FieldInfo(kind, max_length, choices, column.nullable, precision, scale, timezone)
+
+    def is_unique_field(self, field_name):
+        column = getattr(self.table.c, field_name)
+        if column.unique:
+            return True
+        constraints = [constraint for constraint in self.table.constraints if isinstance(constraint, UniqueConstraint)]
+        constraints += [index for index in self.table.indexes if index.unique]
+        return any(list(constraint.columns) == [column] for constraint in constraints)
+
+    def get_field_values(self, field_name):
+        return self._stream_scalars(select(getattr(self.table.c, field_name)))
+
     def is_foreign_key_field(self, field_name):
-        pass
\ No newline at end of file
+        return bool(getattr(self.table.c, field_name).foreign_keys)
+
+    def _primary_key_column(self):
+        return list(self.table.primary_key.columns)[0]
+
+    def _without_empty_primary_key(self, attrs):
+        # let the database assign the primary keys that were not generated
+        primary_key = self._primary_key_column().key
+        return {name: value for name, value in attrs.items() if name != primary_key or value is not None}
+
+    async def acreate_table_if_not_exists(self):
+        if not self.is_async:
+            return
+        async with self.bind.begin() as connection:
+            await connection.run_sync(self.table.create, checkfirst=True)
+
+    async def acreate_instances_bulk(self, rows):
+        if not self.is_async:
+            return await super(SqlalchemyHandler, self).acreate_instances_bulk(rows)
+        rows = [self._without_empty_primary_key(row) for row in rows]
+        async with self.bind.begin() as connection:
+            await connection.execute(insert(self.table), rows)
+
+    async def acreate_rows_bulk(self, fields_names, rows):
+        if not self.is_async:
+            return await super(SqlalchemyHandler, self).acreate_rows_bulk(fields_names, rows)
+        async with self.bind.begin() as connection:
+            await connection.execute(insert(self.table), [dict(zip(fields_names, row)) for row in rows])
+
+    async def _acompact_keys(self, query, chunk_size=10000):
+        """
+        Returns the keys selected by *query*, streamed from the database in chunks of *chunk_size* rows and stored
+        compactly (see ``compact_keys``).
+        """
+        compactor = KeyCompactor()
+        async with self.bind.connect() as connection:
+            result = await connection.stream(query)
+            async for partition in result.scalars().partitions(chunk_size):
+                compactor.extend(partition)
+        return compactor.keys()
+
+    async def aload_key_pool(self):
+        if not self.is_async:
+            return await super(SqlalchemyHandler, self).aload_key_pool()
+        primary_key = self._primary_key_column()
+        self.key_pool = KeyPool(self.model, await self._acompact_keys(select(primary_key).order_by(primary_key)))
+        return self.key_pool
+
+    async def aget_field_values(self, field_name):
+        if not self.is_async:
+            async for value in super(SqlalchemyHandler, self).aget_field_values(field_name):
+                yield value
+            return
+        async with self.bind.connect() as connection:
+            result = await connection.stream(select(getattr(self.table.c, field_name)))
+            async for value in result.scalars():
+                yield value
+
+    async def aget_primary_keys_where_null(self, field_name):
+        if not self.is_async:
+            return await super(SqlalchemyHandler, self).aget_primary_keys_where_null(field_name)
+        query = select(self._primary_key_column()).where(getattr(self.table.c, field_name).is_(None))
+        return await self._acompact_keys(query)
+
+    async def aupdate_field_values(self, field_name, pairs):
+        if not self.is_async:
+            return await super(SqlalchemyHandler, self).aupdate_field_values(field_name, pairs)
+        query = update(self.table).where(self._primary_key_column() == bindparam("_key")).values(
+            {field_name: bindparam("_value")})
+        async with self.bind.begin() as connection:
+            await connection.execute(query, [{"_key": key, "_value": value} for key, value in pairs])
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        if self.is_async:
+            raise RuntimeError("The engine of {} is asynchronous, use ModelWrapper.agenerate".format(
+                self.model.__name__))
+        pinned_connection = getattr(self._local, "pinned_connection", None)
+        if pinned_connection is not None:
+            transaction = pinned_connection.begin()
+        else:
+            transaction = self.bind.begin()
+        with transaction as connection:
+            # Connection.begin() returns the transaction, Engine.begin() the connection
+            connection = pinned_connection if pinned_connection is not None else connection
+            self._local.connection = connection
+            try:
+                yield connection
+            finally:
+                self._local.connection = None
+
+    def _connection(self):
+        """
+        Returns a context manager with the connection of the transaction opened by atomic() in the current thread,
+        or with a new connection in its own transaction.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            return contextlib.nullcontext(connection)
+        return self._transaction()
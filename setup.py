@@ -22,9 +22,12 @@ setup(
 
     classifiers=[
         "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 3.4",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
+        "Programming Language :: Python :: 3.12",
         "Topic :: Database"
     ],
 
@@ -36,6 +39,7 @@ setup(
     ],
 
     # dependencies
+    python_requires=">=3.7",
     install_requires=[
         "fake-factory"
     ],
@@ -49,6 +53,18 @@ setup(
         ],
         "sqlalchemy": [
             "sqlalchemy"
+        ],
+        "parquet": [
+            "pyarrow"
+        ],
+        "numpy": [
+            "numpy"
+        ],
+        "progress": [
+            "tqdm"
+        ],
+        "async": [
+            "aiosqlite"
         ]
     }
 )
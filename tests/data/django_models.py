@@ -1,21 +1,30 @@
-from django.db.models import Model, CharField, IntegerField, ForeignKey
+from django.db.models import Model, CharField, IntegerField, BinaryField, ForeignKey, CASCADE
 
 
 class User(Model):
-    name = CharField()
-    username = CharField()
-    password_hash = BlobField()
-    email = CharField()
+    name = CharField(max_length=255)
+    username = CharField(max_length=255)
+    password_hash = BinaryField()
+    email = CharField(max_length=255)
     visits = IntegerField()
-    description = CharField()
+    description = CharField(max_length=255)
+
+    class Meta:
+        app_label = "data"
 
 
 class Post(Model):
-    title = CharField()
-    text = CharField()
-    by_user = ForeignKey(User)
+    title = CharField(max_length=255)
+    text = CharField(max_length=255)
+    by_user = ForeignKey(User, on_delete=CASCADE)
+
+    class Meta:
+        app_label = "data"
 
 
 class Like(Model):
-    by_user = ForeignKey(User)
-    to_post = ForeignKey(Post)
+    by_user = ForeignKey(User, on_delete=CASCADE)
+    to_post = ForeignKey(Post, on_delete=CASCADE)
+
+    class Meta:
+        app_label = "data"
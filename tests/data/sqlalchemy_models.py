@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Binary, Sequence, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, Column, Integer, String, LargeBinary, Sequence, ForeignKey
+from sqlalchemy.orm import declarative_base
 
-engine = create_engine("sqlite:///test.db")
+DB_NAME = "test3.db"
+engine = create_engine("sqlite:///test3.db")
 
-Base = declarative_base(bind=engine)
+Base = declarative_base()
 
 
 class User(Base):
@@ -16,7 +17,7 @@ class User(Base):
     email = Column(String)
     description = Column(String)
 
-    password_hash = Column(Binary)
+    password_hash = Column(LargeBinary)
 
     visits = Column(Integer)
 
@@ -42,8 +43,8 @@ class Like(Base):
 
 
 if __name__ == '__main__':
-    User.__table__.create(checkfirst=True)
-    Post.__table__.create(checkfirst=True)
-    Like.__table__.create(checkfirst=True)
+    User.__table__.create(bind=engine, checkfirst=True)
+    Post.__table__.create(bind=engine, checkfirst=True)
+    Like.__table__.create(bind=engine, checkfirst=True)
 
     print(Like.__table__.columns)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from unittest import TestCase, skipIf
+
+from sqlalchemy import select, func
+
+from fillmydb import ModelWrapper, Choice, IntegerRange
+from tests.data.sqlalchemy_models import User, Post, Like
+from tests.data import peewee_models
+
+try:
+    import aiosqlite
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError:
+    aiosqlite = None
+
+DB_NAME = "test5.db"
+
+
+@skipIf(aiosqlite is None, "aiosqlite is not installed")
+class SqlalchemyAsyncGenerationTestCases(TestCase):
+    def setUp(self):
+        if os.path.exists(DB_NAME):
+            os.remove(DB_NAME)
+        self.engine = create_async_engine("sqlite+aiosqlite:///{}".format(DB_NAME))
+
+    def tearDown(self):
+        asyncio.run(self.engine.dispose())
+        os.remove(DB_NAME)
+
+    async def count(self, model):
+        async with self.engine.connect() as connection:
+            return (await connection.execute(select(func.count()).select_from(model.__table__))).scalar()
+
+    def test_agenerate(self):
+        async def run():
+            wrapper = ModelWrapper(User, Post, Like, bind=self.engine)
+            wrapper[User].name = Choice(["a", "b"])
+            wrapper[User].visits = IntegerRange(0, 10)
+
+            await wrapper.agenerate(10, 45, 30, batch_size=7, max_in_flight=3)
+            self.assertEqual(await self.count(User), 10)
+            self.assertEqual(await self.count(Post), 45)
+            self.assertEqual(await self.count(Like), 30)
+
+            async with self.engine.connect() as connection:
+                user_ids = set((await connection.execute(select(User.__table__.c.id))).scalars().all())
+                post_users = set((await connection.execute(select(Post.__table__.c.by_user))).scalars().all())
+            self.assertTrue(post_users <= user_ids)
+
+            with self.assertRaises(RuntimeError):
+                wrapper.generate(1, 1, 1)
+
+        asyncio.run(run())
+
+    def test_streamed_keys_and_values(self):
+        async def run():
+            wrapper = ModelWrapper(User, Post, Like, bind=self.engine)
+            wrapper[User].name = Choice(["a", "b"])
+            wrapper[User].visits = IntegerRange(0, 10)
+            await wrapper.agenerate(25, 0, 0, batch_size=10)
+
+            handler = wrapper._handlers[User]
+            # the keys are stored compactly, without a list of all the keys
+            self.assertEqual((await handler.aload_key_pool()).keys, range(1, 26))
+            self.assertEqual(await handler.aget_primary_keys_where_null("description"), range(1, 26))
+            names = [name async for name in handler.aget_field_values("name")]
+            self.assertEqual(len(names), 25)
+            self.assertTrue(set(names) <= {"a", "b"})
+
+        asyncio.run(run())
+
+    def test_agenerate_propagates_errors(self):
+        async def run():
+            wrapper = ModelWrapper(User, Post, Like, bind=self.engine)
+            with self.assertRaises(ValueError):
+                # no users to reference
+                await wrapper.agenerate(0, 10, 10)
+
+        asyncio.run(run())
+
+
+class PeeweeAsyncGenerationTestCases(TestCase):
+    def setUp(self):
+        models = [peewee_models.User, peewee_models.Post, peewee_models.Like]
+        peewee_models.database_obj.drop_tables(models, safe=True)
+        peewee_models.database_obj.create_tables(models)
+
+    @classmethod
+    def tearDownClass(cls):
+        peewee_models.database_obj.close()
+        os.remove(peewee_models.DB_NAME)
+
+    def test_agenerate_in_executor(self):
+        User, Post, Like = peewee_models.User, peewee_models.Post, peewee_models.Like
+        wrapper = ModelWrapper(User, Post, Like)
+        for field in ["name", "username", "email", "description"]:
+            setattr(wrapper[User], field, Choice(["a"]))
+        wrapper[User].password_hash = Choice([b"hash"])
+        wrapper[User].visits = IntegerRange(0, 10)
+        wrapper[Post].title = Choice(["title"])
+        wrapper[Post].text = Choice(["text"])
+
+        asyncio.run(wrapper.agenerate(5, 12, 20, batch_size=5))
+        self.assertEqual(User.select().count(), 5)
+        self.assertEqual(Post.select().count(), 12)
+        self.assertEqual(Like.select().count(), 20)
+
+        async def field_values():
+            return [title async for title in wrapper._handlers[Post].aget_field_values("title", chunk_size=5)]
+
+        self.assertEqual(asyncio.run(field_values()), ["title"] * 12)
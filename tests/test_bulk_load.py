@@ -0,0 +1,32 @@
+import sqlite3
+from unittest import TestCase
+
+from fillmydb.handlers import bulk_load
+
+
+class BulkLoadTestCases(TestCase):
+    def test_copy_text(self):
+        data = bulk_load.copy_text([
+            (1, "text", None, True),
+            (2, "tab\tnew\nline\\", b"\x00\xff", False),
+        ])
+        self.assertEqual(data.getvalue(), "1\ttext\t\\N\tt\n2\ttab\\tnew\\nline\\\\\t\\\\x00ff\tf\n")
+
+    def test_quote_identifier(self):
+        self.assertEqual(bulk_load.quote_identifier("user"), '"user"')
+        self.assertEqual(bulk_load.quote_identifier('a"b'), '"a""b"')
+
+    def test_insert_rows_and_pragmas(self):
+        connection = sqlite3.connect(":memory:")
+        connection.execute('CREATE TABLE "like" (id INTEGER PRIMARY KEY, "value" TEXT)')
+
+        def pragma(name):
+            return connection.execute("PRAGMA {}".format(name)).fetchone()[0]
+
+        synchronous = pragma("synchronous")
+        with bulk_load.sqlite_fast_pragmas(connection.cursor()):
+            self.assertEqual(pragma("synchronous"), 0)
+            bulk_load.insert_rows(connection.cursor(), "like", ["value"], [("a",), ("b",)])
+            connection.commit()
+        self.assertEqual(pragma("synchronous"), synchronous)
+        self.assertEqual(connection.execute('SELECT "value" FROM "like" ORDER BY id').fetchall(), [("a",), ("b",)])
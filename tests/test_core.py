@@ -1,9 +1,17 @@
 import os
+import json
+import random
+import tempfile
+import multiprocessing
 from unittest import TestCase
 
-from peewee import Model, CharField, SqliteDatabase
+from peewee import Model, CharField, SqliteDatabase, IntegrityError
 
-from fillmydb import FieldSpec, ModelWrapper
+from fillmydb import FieldSpec, ForeignKeySpec, ModelWrapper, Choice, IntegerRange, RandomBytes, RandomString, \
+    Pooled
+from tests.data.peewee_models import User, Post, Like, database_obj, DB_NAME
+from fillmydb.core.specs import numpy
+from fillmydb.core.checkpoint import Checkpoint
 
 TEST_DB = os.path.join(os.path.abspath("."), "test.db")
 
@@ -52,6 +60,59 @@ def generate_mockup_field_spec(to_return=None):
     return MockupFieldSpec()
 
 
+def numpy_seed(seed):
+    if numpy is not None:
+        numpy.random.seed(seed)
+
+
+def value_from_index(index):
+    return "value{}".format(index)
+
+
+def generate_failing_field_spec(fail_after):
+    class FailingFieldSpec:
+        def __init__(self):
+            self.calls = 0
+
+        def resolve(self):
+            self.calls += 1
+            if self.calls > fail_after:
+                raise RuntimeError("failed after {} values".format(fail_after))
+            return "value{}".format(self.calls)
+
+    return FailingFieldSpec()
+
+
+class InterruptingFieldSpec:
+    """
+    Generates random values, and raises an exception after *fail_after* values, as if the process was interrupted.
+    """
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def resolve(self):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise KeyboardInterrupt()
+        return "value{}".format(random.randint(0, 10 ** 9))
+
+
+def generate_shard(shard, shards):
+    """
+    Generates a shard of the User/Post/Like data set in a separate process.
+    """
+    wrapper = ModelWrapper(User, Like, Post)
+    for field in ["name", "username", "password_hash", "email", "description"]:
+        setattr(wrapper[User], field, FieldSpec(value_from_index, shard))
+    wrapper[User].visits = IntegerRange(0, 10)
+    wrapper[Post].title = InterruptingFieldSpec()
+    wrapper[Post].text = Choice(["text"])
+    wrapper.generate(20, 60, 40, batch_size=5, commit_every=10, seed=11, shard=(shard, shards))
+    database_obj.close()
+
+
 class PeeweeBasicFunctionalityTestCases(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -112,3 +173,395 @@ class PeeweeBasicFunctionalityTestCases(TestCase):
         wrapper = ModelWrapper(TestModel1)
         with self.assertRaises(KeyError):
             x = wrapper[TestModel2]
+
+
+class PeeweeBulkGenerationTestCases(TestCase):
+    def setUp(self):
+        TestModel2.drop_table(fail_silently=True)
+        TestModel2.create_table()
+
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(TEST_DB)
+
+    def test_generate_in_batches(self):
+        wrapper = ModelWrapper(TestModel2)
+        wrapper[TestModel2].field1 = generate_mockup_field_spec("test1")
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        wrapper.generate(25, batch_size=10)
+        self.assertEqual(TestModel2.select().count(), 25)
+        self.assertEqual(TestModel2.select().where(TestModel2.field1 == "test1").count(), 25)
+        self.assertEqual(TestModel2.select().where(TestModel2.field2.is_null()).count(), 25)
+
+    def test_generate_in_single_batch(self):
+        wrapper = ModelWrapper(TestModel2)
+        wrapper[TestModel2].field1 = generate_mockup_field_spec("test1")
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        wrapper.generate(7, batch_size=100)
+        self.assertEqual(TestModel2.select().count(), 7)
+
+    def test_generate_with_commit_interval(self):
+        wrapper = ModelWrapper(TestModel2)
+        wrapper[TestModel2].field1 = generate_mockup_field_spec("test1")
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        wrapper.generate(25, commit_every=10)
+        self.assertEqual(TestModel2.select().count(), 25)
+
+        wrapper.generate(25, batch_size=4, commit_every=10)
+        self.assertEqual(TestModel2.select().count(), 50)
+
+    def test_generate_pipelined(self):
+        wrapper = ModelWrapper(TestModel2)
+        wrapper[TestModel2].field1 = generate_mockup_field_spec("test1")
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        wrapper.generate(95, batch_size=10, commit_every=30, pipeline=True, queue_size=2)
+        self.assertEqual(TestModel2.select().count(), 95)
+
+        stats = wrapper.pipeline_stats[TestModel2]
+        self.assertEqual(stats.batches, 10)
+        self.assertEqual(stats.rows, 95)
+        self.assertLessEqual(stats.max_queue_depth, 2)
+        self.assertGreaterEqual(stats.producer_blocked, 0)
+        self.assertGreaterEqual(stats.consumer_blocked, 0)
+
+    def test_generate_pipelined_rolls_back_current_transaction_on_error(self):
+        wrapper = ModelWrapper(TestModel2)
+        wrapper[TestModel2].field1 = generate_failing_field_spec(fail_after=15)
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        with self.assertRaises(RuntimeError):
+            wrapper.generate(25, batch_size=5, commit_every=10, pipeline=True)
+        self.assertEqual(TestModel2.select().count(), 10)
+
+    def test_generate_pipelined_propagates_persist_errors(self):
+        wrapper = ModelWrapper(TestModel2)
+        # field1 is NOT NULL
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        with self.assertRaises(IntegrityError):
+            wrapper.generate(50, batch_size=5, pipeline=True, queue_size=1)
+
+    def test_generate_rolls_back_current_transaction_on_error(self):
+        wrapper = ModelWrapper(TestModel2)
+        wrapper[TestModel2].field1 = generate_failing_field_spec(fail_after=15)
+        wrapper[TestModel2].field3 = generate_mockup_field_spec("test3")
+
+        with self.assertRaises(RuntimeError):
+            wrapper.generate(25, commit_every=10)
+        # only the first transaction was committed
+        self.assertEqual(TestModel2.select().count(), 10)
+
+
+class PeeweeForeignKeyGenerationTestCases(TestCase):
+    def setUp(self):
+        for model in [Like, Post, User]:
+            model.drop_table(fail_silently=True)
+        for model in [User, Post, Like]:
+            model.create_table()
+
+    @classmethod
+    def tearDownClass(cls):
+        database_obj.close()
+        os.remove(DB_NAME)
+
+    def _get_wrapper(self):
+        wrapper = ModelWrapper(User, Like, Post)
+        for field in ["name", "username", "password_hash", "email", "description"]:
+            setattr(wrapper[User], field, generate_mockup_field_spec(field))
+        wrapper[User].visits = generate_mockup_field_spec(0)
+        wrapper[Post].title = generate_mockup_field_spec("title")
+        wrapper[Post].text = generate_mockup_field_spec("text")
+        return wrapper
+
+    def test_generate_foreign_keys(self):
+        wrapper = self._get_wrapper()
+        wrapper.generate(5, 30, 10, batch_size=10)
+
+        self.assertEqual(User.select().count(), 5)
+        self.assertEqual(Post.select().count(), 10)
+        self.assertEqual(Like.select().count(), 30)
+
+        user_ids = {user.id for user in User.select()}
+        post_ids = {post.id for post in Post.select()}
+        for like in Like.select():
+            self.assertIn(like.by_user_id, user_ids)
+            self.assertIn(like.to_post_id, post_ids)
+
+    def test_key_pools_are_reloaded_for_every_generation(self):
+        wrapper = self._get_wrapper()
+        wrapper.generate(1, 0, 0)
+        wrapper.generate(1, 0, 5)
+
+        self.assertEqual(len(wrapper._handlers[User].key_pool), 2)
+        self.assertEqual(Post.select().count(), 5)
+
+    def test_foreign_key_distribution(self):
+        wrapper = self._get_wrapper()
+        wrapper[Like].to_post = ForeignKeySpec(distribution="fixed", k=3)
+        wrapper.generate(2, 12, 4)
+
+        for post in Post.select():
+            self.assertEqual(Like.select().where(Like.to_post == post).count(), 3)
+
+    def test_generate_column_wise(self):
+        wrapper = ModelWrapper(User, Like, Post)
+        for field in ["name", "username", "email", "description"]:
+            setattr(wrapper[User], field, Choice(["a", "b"]))
+        wrapper[User].password_hash = RandomBytes(8)
+        wrapper[User].visits = IntegerRange(1, 3)
+        wrapper[Post].title = Choice(["title"])
+        wrapper[Post].text = Choice(["text"])
+
+        wrapper.generate(20, 40, 10, batch_size=15)
+
+        self.assertEqual(User.select().count(), 20)
+        self.assertEqual(Like.select().count(), 40)
+        for user in User.select():
+            self.assertIn(user.visits, [1, 2, 3])
+            self.assertEqual(len(user.password_hash), 8)
+
+    def test_row_builder(self):
+        wrapper = self._get_wrapper()
+        wrapper.generate(3, 0, 0)
+        handler = wrapper._handlers[Post]
+        builder = wrapper._compile_row_builder(handler)
+
+        # the database assigns the primary keys
+        self.assertNotIn("id", builder.fields_names)
+        rows = builder.build(4)
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertIsInstance(row, tuple)
+            values = dict(zip(builder.fields_names, row))
+            self.assertEqual(values["title"], "title")
+            self.assertIn(values["by_user"], [user.id for user in User.select()])
+
+        handler.create_rows_bulk(builder.fields_names, rows)
+        self.assertEqual(Post.select().count(), 4)
+
+    def test_row_builder_with_explicit_keys(self):
+        wrapper = self._get_wrapper()
+        wrapper[Post].title = Choice(["title"])
+        wrapper[Post].text = None
+        wrapper.generate(2, 0, 0)
+        handler = wrapper._handlers[Post]
+        builder = wrapper._compile_row_builder(handler, deferred=("by_user",), explicit_keys=True)
+
+        self.assertEqual(builder.fields_names, handler.field_plan.fields_names)
+        self.assertEqual(builder.columns, handler.field_plan.columns)
+        rows = [dict(zip(builder.fields_names, row)) for row in builder.build(3, first_key=10)]
+        self.assertEqual([row["id"] for row in rows], [10, 11, 12])
+        self.assertEqual([row["by_user"] for row in rows], [None] * 3)
+        self.assertEqual([row["text"] for row in rows], [None] * 3)
+
+    def test_generate_with_workers(self):
+        wrapper = ModelWrapper(User, Like, Post)
+        for field in ["name", "username", "email", "description"]:
+            setattr(wrapper[User], field, FieldSpec(value_from_index, 1))
+        wrapper[User].password_hash = RandomBytes(8)
+        wrapper[User].visits = IntegerRange(1, 1000)
+        wrapper[Post].title = Choice(["a", "b", "c"])
+        wrapper[Post].text = Choice(["text"])
+
+        def generated_values():
+            return [(user.visits, user.password_hash) for user in User.select().order_by(User.id)], \
+                   [(post.title, post.by_user_id) for post in Post.select().order_by(Post.id)]
+
+        random.seed(10)
+        wrapper.generate(20, 40, 30, batch_size=7, workers=2)
+        self.assertEqual(User.select().count(), 20)
+        self.assertEqual(Post.select().count(), 30)
+        self.assertEqual(Like.select().count(), 40)
+        self.assertEqual(User.select().where(User.name == "value1").count(), 20)
+        first_run = generated_values()
+
+        # the same seed in the main process generates the same values, regardless of the number of workers
+        self.setUp()
+        random.seed(10)
+        wrapper.generate(20, 40, 30, batch_size=7, workers=3)
+        self.assertEqual(generated_values(), first_run)
+
+    def test_generate_unique_pooled_values_with_workers(self):
+        wrapper = ModelWrapper(User, Like, Post)
+        for field in ["name", "username", "password_hash", "email", "description"]:
+            setattr(wrapper[User], field, FieldSpec(value_from_index, 1))
+        wrapper[User].visits = IntegerRange(1, 1000)
+        wrapper[Post].title = Pooled(RandomString(16), size=100, unique=True)
+        wrapper[Post].text = Choice(["text"])
+        wrapper.generate(5, 0, 100, batch_size=10, workers=2)
+
+        titles = [post.title for post in Post.select()]
+        self.assertEqual(len(titles), 100)
+        self.assertEqual(len(set(titles)), 100)
+
+    def stored_rows(self):
+        return [list(User.select().order_by(User.id).tuples()), list(Post.select().order_by(Post.id).tuples()),
+                list(Like.select().order_by(Like.id).tuples())]
+
+    def test_generate_with_seed(self):
+        wrapper = self._get_wrapper()
+        wrapper[User].name = FieldSpec(random.randint, 0, 10 ** 9)
+        wrapper[Post].title = InterruptingFieldSpec()
+
+        wrapper.generate(10, 40, 30, batch_size=7, commit_every=10, seed=42)
+        first_run = self.stored_rows()
+
+        self.setUp()
+        random.seed(1)
+        wrapper.generate(10, 40, 30, batch_size=7, commit_every=10, seed=42)
+        self.assertEqual(self.stored_rows(), first_run)
+
+        self.setUp()
+        wrapper.generate(10, 40, 30, batch_size=7, commit_every=10, seed=43)
+        self.assertNotEqual(self.stored_rows(), first_run)
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(1, 1, 1, seed=42, parallel=True)
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = os.path.join(os.path.abspath("."), "checkpoint.json")
+        wrapper = self._get_wrapper()
+        wrapper[Post].title = InterruptingFieldSpec()
+        wrapper.generate(10, 40, 30, batch_size=4, commit_every=8, seed=7)
+        uninterrupted = self.stored_rows()
+
+        self.setUp()
+        # interrupted in the 3rd chunk of Post, before generating Like
+        wrapper[Post].title = InterruptingFieldSpec(fail_after=20)
+        with self.assertRaises(KeyboardInterrupt):
+            wrapper.generate(10, 40, 30, batch_size=4, commit_every=8, seed=7, checkpoint=checkpoint)
+        self.assertEqual(Post.select().count(), 16)
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(10, 40, 30, batch_size=4, commit_every=8, seed=8, checkpoint=checkpoint)
+
+        wrapper[Post].title = InterruptingFieldSpec()
+        wrapper.generate(10, 40, 30, batch_size=4, commit_every=8, seed=7, checkpoint=checkpoint)
+        self.assertEqual(self.stored_rows(), uninterrupted)
+        self.assertFalse(os.path.exists(checkpoint))
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(1, 1, 1, checkpoint=checkpoint)
+
+    def _get_stateful_wrapper(self, fail_after=None):
+        wrapper = self._get_wrapper()
+        wrapper[User].password_hash = FieldSpec(RandomBytes(8).resolve)
+        wrapper[Post].title = Pooled(RandomString(12), size=100, unique=True)
+        wrapper[Post].text = InterruptingFieldSpec(fail_after)
+        wrapper[Post].by_user = ForeignKeySpec(distribution="fixed", k=3)
+        wrapper[Like].to_post = ForeignKeySpec(distribution="round_robin")
+        return wrapper
+
+    def test_resume_with_stateful_specs(self):
+        checkpoint = os.path.join(os.path.abspath("."), "checkpoint.json")
+        self._get_stateful_wrapper().generate(10, 40, 30, batch_size=4, commit_every=8, seed=7)
+        uninterrupted = self.stored_rows()
+
+        # the positions of the pool and of the foreign keys are derived from the chunk, not from the rows generated
+        # before by the process
+        self.setUp()
+        wrapper = self._get_stateful_wrapper(fail_after=20)
+        with self.assertRaises(KeyboardInterrupt):
+            wrapper.generate(10, 40, 30, batch_size=4, commit_every=8, seed=7, checkpoint=checkpoint)
+        wrapper[Post].text = InterruptingFieldSpec()
+        wrapper.generate(10, 40, 30, batch_size=4, commit_every=8, seed=7, checkpoint=checkpoint)
+        self.assertEqual(self.stored_rows(), uninterrupted)
+
+    def test_generate_shards(self):
+        # with specifications that keep a position, which starts at the first row of every shard
+        for commit_every in (8, None):
+            self.setUp()
+            wrapper = self._get_stateful_wrapper()
+            wrapper.generate(10, 40, 30, batch_size=4, commit_every=commit_every, seed=5)
+            unsharded = self.stored_rows()
+
+            # the shards generate disjoint slices, which together are the rows of the generation without sharding
+            self.setUp()
+            wrapper = self._get_stateful_wrapper()
+            for shard in [2, 0, 1]:
+                wrapper.generate(10, 40, 30, batch_size=4, commit_every=commit_every, seed=5, shard=(shard, 3))
+            self.assertEqual(self.stored_rows(), unsharded)
+
+        self.setUp()
+        for shard in range(4):
+            wrapper.generate(10, 40, 30, batch_size=4, shard=(shard, 4))
+        self.assertEqual([post.id for post in Post.select().order_by(Post.id)], list(range(1, 31)))
+        self.assertEqual(Like.select().where(Like.to_post > 30).count(), 0)
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(1, 1, 1, shard=(3, 3))
+
+    def test_generate_shards_in_processes(self):
+        with multiprocessing.get_context("spawn").Pool(3) as pool:
+            pool.starmap(generate_shard, [(shard, 3) for shard in range(3)])
+
+        self.assertEqual([post.id for post in Post.select().order_by(Post.id)], list(range(1, 41)))
+        self.assertEqual(Like.select().count(), 60)
+        self.assertEqual(Like.select().where(Like.to_post > 40).count(), 0)
+
+    def test_copy_load_stores_the_same_rows(self):
+        wrapper = ModelWrapper(User, Like, Post)
+        for field in ["name", "username", "email", "description"]:
+            setattr(wrapper[User], field, Choice(["a", "b\tc", "d\\e", ""]))
+        wrapper[User].password_hash = RandomBytes(8)
+        wrapper[User].visits = IntegerRange(1, 1000)
+        wrapper[Post].title = Choice(["title"])
+        wrapper[Post].text = Choice(["text"])
+
+        def stored_rows():
+            return [list(User.select().order_by(User.id).tuples()), list(Post.select().order_by(Post.id).tuples()),
+                    list(Like.select().order_by(Like.id).tuples())]
+
+        random.seed(3)
+        numpy_seed(3)
+        wrapper.generate(20, 40, 30, batch_size=7, commit_every=10)
+        orm_rows = stored_rows()
+
+        self.setUp()
+        random.seed(3)
+        numpy_seed(3)
+        wrapper.generate(20, 40, 30, batch_size=7, commit_every=10, load="copy")
+        self.assertEqual(stored_rows(), orm_rows)
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(1, 1, 1, load="csv")
+
+    def test_copy_load_restores_pragmas(self):
+        wrapper = self._get_wrapper()
+        journal_mode = database_obj.execute_sql("PRAGMA journal_mode").fetchone()[0]
+        synchronous = database_obj.execute_sql("PRAGMA synchronous").fetchone()[0]
+
+        wrapper.generate(5, 5, 5, load="copy", pipeline=True)
+        wrapper.generate(5, 5, 5, load="copy")
+        self.assertEqual(Like.select().count(), 10)
+        self.assertEqual(database_obj.execute_sql("PRAGMA journal_mode").fetchone()[0], journal_mode)
+        self.assertEqual(database_obj.execute_sql("PRAGMA synchronous").fetchone()[0], synchronous)
+
+
+class CheckpointTestCases(TestCase):
+    def test_chunks_are_stored_as_ranges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.json")
+            checkpoint = Checkpoint(path, 1, [("User", 100)], 10)
+            for index in [0, 1, 2, 5, 4, 7, 3]:
+                checkpoint.mark_done(User, index)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["chunks"], {"User": [[0, 6], [7, 8]]})
+            self.assertFalse(os.path.exists(path + ".tmp"))
+
+            # the file doesn't grow with the chunks committed in order, the repeated ones are ignored
+            for index in range(6, 1000):
+                checkpoint.mark_done(User, index)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["chunks"], {"User": [[0, 1000]]})
+
+            checkpoint = Checkpoint(path, 1, [("User", 100)], 10)
+            self.assertTrue(checkpoint.is_done(User, 0))
+            self.assertTrue(checkpoint.is_done(User, 999))
+            self.assertFalse(checkpoint.is_done(User, 1000))
+            self.assertFalse(checkpoint.is_done(Post, 0))
@@ -0,0 +1,207 @@
+import csv
+import datetime
+import decimal
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, skipIf
+
+import peewee
+
+from fillmydb import ModelWrapper, Choice, IntegerRange, RandomBytes, RandomString, Pooled, ForeignKeySpec
+from fillmydb.core.export import pyarrow, SQL_DIALECTS, CsvWriter
+from tests.data.peewee_models import User, Post, Like, database_obj, DB_NAME
+
+category_database = peewee.SqliteDatabase(":memory:")
+
+
+class Category(peewee.Model):
+    name = peewee.CharField()
+    parent = peewee.ForeignKeyField("self", null=True)
+
+    class Meta:
+        database = category_database
+
+
+class GenerateToTestCases(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wrapper = ModelWrapper(User, Post, Like)
+        for field in ["name", "username", "email", "description"]:
+            setattr(self.wrapper[User], field, Choice(["a", "b"]))
+        self.wrapper[User].password_hash = RandomBytes(4)
+        self.wrapper[User].visits = IntegerRange(0, 10)
+        self.wrapper[Post].title = Choice(["title"])
+        self.wrapper[Post].text = Choice(["text"])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @classmethod
+    def tearDownClass(cls):
+        database_obj.close()
+        if os.path.exists(DB_NAME):
+            os.remove(DB_NAME)
+
+    def read_csv(self, path):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_csv(self):
+        users_before = User.select().count()
+        paths = self.wrapper.generate_to(self.directory.name, 5, 30, 12, format="csv", batch_size=7)
+
+        self.assertEqual(paths[User], os.path.join(self.directory.name, "user.csv"))
+        users = self.read_csv(paths[User])
+        posts = self.read_csv(paths[Post])
+        likes = self.read_csv(paths[Like])
+        self.assertEqual([user["id"] for user in users], [str(key) for key in range(1, 6)])
+        self.assertEqual(len(posts), 30)
+        self.assertEqual(len(likes), 12)
+        # the columns of the foreign keys are named as in the database
+        self.assertIn("by_user_id", posts[0])
+        self.assertTrue(all(1 <= int(post["by_user_id"]) <= 5 for post in posts))
+        self.assertTrue(all(1 <= int(like["to_post_id"]) <= 30 for like in likes))
+        self.assertTrue(users[0]["password_hash"].startswith("\\x"))
+        # nothing is written to the database
+        self.assertEqual(User.select().count(), users_before)
+
+    def test_csv_null_and_empty_string(self):
+        # COPY ... WITH (FORMAT csv) loads an unquoted empty field as NULL and a quoted one as an empty string
+        path = os.path.join(self.directory.name, "values.csv")
+        with CsvWriter(path, ["id", "name", "bio"]) as writer:
+            writer.write([(1, None, ""), (2, 'a "b", c', "d\ne")])
+        with open(path, newline="") as f:
+            self.assertEqual(f.read(), 'id,name,bio\r\n1,,""\r\n2,"a ""b"", c","d\ne"\r\n')
+        self.assertEqual([row["bio"] for row in self.read_csv(path)], ["", "d\ne"])
+
+    def test_jsonl(self):
+        paths = self.wrapper.generate_to(self.directory.name, 3, 4, 0, format="jsonl")
+        with open(paths[Post]) as f:
+            posts = [json.loads(line) for line in f]
+        self.assertEqual([post["id"] for post in posts], [1, 2, 3, 4])
+        self.assertEqual(posts[0]["title"], "title")
+        with open(paths[Like]) as f:
+            self.assertEqual(f.read(), "")
+
+    @skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        paths = self.wrapper.generate_to(self.directory.name, 3, 10, 20, format="parquet", batch_size=4)
+        table = pyarrow.parquet.read_table(paths[Like])
+        self.assertEqual(table.num_rows, 20)
+        self.assertEqual(table.column_names, [Like._meta.fields[name].column_name for name in
+                                              self.wrapper._handlers[Like].fields_names])
+
+    def test_shards(self):
+        pooled = Pooled(RandomString(12), size=30, unique=True)
+        self.wrapper[Post].title = pooled
+        self.wrapper[Post].by_user = ForeignKeySpec(distribution="round_robin")
+        for shard in [2, 0, 1]:
+            self.wrapper.generate_to(self.directory.name, 7, 30, 12, shard=(shard, 3))
+        posts = []
+        for shard in range(3):
+            posts.extend(self.read_csv(os.path.join(self.directory.name, "post.{}.csv".format(shard))))
+        self.assertEqual([post["id"] for post in posts], [str(key) for key in range(1, 31)])
+        # the positions of the specifications start at the first row of every shard, and the shards of the data
+        # set don't move the pool
+        self.assertEqual([post["by_user_id"] for post in posts], [str(key % 7 + 1) for key in range(30)])
+        self.assertEqual([post["title"] for post in posts], pooled.resolve_batch(30))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.wrapper.generate_to(self.directory.name, 1, 1, 1, format="xml")
+
+    def test_missing_referenced_instances(self):
+        with self.assertRaises(ValueError):
+            self.wrapper.generate_to(self.directory.name, 0, 1, 0)
+
+
+class DumpSqlTestCases(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "seed.sql")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @classmethod
+    def tearDownClass(cls):
+        category_database.close()
+        database_obj.close()
+        if os.path.exists(DB_NAME):
+            os.remove(DB_NAME)
+
+    def replay(self, *models):
+        """
+        Creates the tables of *models* in a new SQLite database and runs the script in it.
+        """
+        connection = sqlite3.connect(":memory:")
+        for model in models:
+            for sql, params in [model._schema._create_table().query()]:
+                connection.execute(sql, params)
+        with open(self.path) as f:
+            connection.executescript(f.read())
+        return connection
+
+    def test_replay(self):
+        wrapper = ModelWrapper(User, Post, Like)
+        for field in ["name", "username", "email", "description"]:
+            setattr(wrapper[User], field, Choice(["it's", "a\\b"]))
+        wrapper[User].password_hash = RandomBytes(4)
+        wrapper[User].visits = IntegerRange(0, 10)
+        wrapper[Post].title = Choice(["title"])
+        wrapper[Post].text = Choice(["text"])
+
+        wrapper.dump_sql(self.path, 5, 30, 25, statement_size=10, batch_size=7)
+        with open(self.path) as f:
+            script = f.read()
+        self.assertEqual(script.count('INSERT INTO "like"'), 3)
+
+        connection = self.replay(User, Post, Like)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM "post"').fetchone()[0], 30)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM "like"').fetchone()[0], 25)
+        self.assertEqual(connection.execute(
+            'SELECT COUNT(*) FROM "like" WHERE "to_post_id" NOT IN (SELECT "id" FROM "post")').fetchone()[0], 0)
+        names = {row[0] for row in connection.execute('SELECT "name" FROM "user"')}
+        self.assertTrue(names <= {"it's", "a\\b"})
+        self.assertEqual(len(connection.execute('SELECT "password_hash" FROM "user"').fetchone()[0]), 4)
+
+    def test_deferred_cycles(self):
+        wrapper = ModelWrapper(Category)
+        wrapper[Category].name = Choice(["c"])
+        wrapper.dump_sql(self.path, 23, cycles="defer", statement_size=10, batch_size=10)
+
+        connection = self.replay(Category)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM "category" WHERE "parent_id" IS NULL').fetchone()[0],
+                         0)
+        parents = {row[0] for row in connection.execute('SELECT "parent_id" FROM "category"')}
+        self.assertTrue(parents <= set(range(1, 24)))
+
+    def test_dialect_literals(self):
+        postgresql, mysql, sqlite = SQL_DIALECTS["postgresql"], SQL_DIALECTS["mysql"], SQL_DIALECTS["sqlite"]
+        self.assertEqual(mysql.quote_identifier("like"), "`like`")
+        self.assertEqual(sqlite.quote_identifier('a"b'), '"a""b"')
+        self.assertEqual(postgresql.literal(b"\x01\xff"), "'\\x01ff'")
+        self.assertEqual(sqlite.literal(b"\x01\xff"), "X'01ff'")
+        self.assertEqual(postgresql.literal(True), "TRUE")
+        self.assertEqual(sqlite.literal(True), "1")
+        self.assertEqual(mysql.literal("it's a\\b"), "'it''s a\\\\b'")
+        self.assertEqual(sqlite.literal(datetime.datetime(2020, 1, 2, 3, 4, 5)), "'2020-01-02 03:04:05'")
+        self.assertEqual(sqlite.literal(None), "NULL")
+
+        # only PostgreSQL has NaN and infinite numbers
+        self.assertEqual(postgresql.literal(float("nan")), "'NaN'")
+        self.assertEqual(postgresql.literal(float("inf")), "'Infinity'")
+        self.assertEqual(postgresql.literal(decimal.Decimal("-Infinity")), "'-Infinity'")
+        for dialect in (sqlite, mysql):
+            with self.assertRaises(ValueError):
+                dialect.literal(float("nan"))
+            with self.assertRaises(ValueError):
+                dialect.literal(float("-inf"))
+
+    def test_unknown_dialect(self):
+        with self.assertRaises(ValueError):
+            ModelWrapper(Category).dump_sql(self.path, 1, dialect="oracle")
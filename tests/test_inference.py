@@ -0,0 +1,150 @@
+import datetime
+import decimal
+import logging
+import os
+from unittest import TestCase
+
+import peewee
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, Float, LargeBinary, Enum, Numeric, \
+    Time, create_engine
+from sqlalchemy.orm import declarative_base
+
+from fillmydb import ModelWrapper, IntegerRange, DecimalRange, DateTimeRange, RandomString, RandomUUID, Choice
+from fillmydb.core.inference import infer_field_spec
+from fillmydb.handlers.base_handler import FieldInfo
+
+TEST_DB = "test7.db"
+
+database = peewee.SqliteDatabase(TEST_DB)
+
+
+class Profile(peewee.Model):
+    username = peewee.CharField(max_length=20, unique=True)
+    email = peewee.CharField()
+    first_name = peewee.CharField(max_length=5)
+    age = peewee.IntegerField()
+    score = peewee.FloatField()
+    active = peewee.BooleanField()
+    born = peewee.DateField()
+    created = peewee.DateTimeField()
+    avatar = peewee.BlobField()
+    bio = peewee.TextField()
+    status = peewee.CharField(choices=[("a", "Active"), ("b", "Banned")])
+
+    class Meta:
+        database = database
+
+
+Base = declarative_base()
+
+
+class Article(Base):
+    __tablename__ = "article"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String(30), nullable=False)
+    body = Column(Text)
+    rating = Column(Float)
+    published = Column(Boolean)
+    day = Column(Date)
+    created = Column(DateTime)
+    updated = Column(DateTime(timezone=True))
+    data = Column(LargeBinary(8))
+    kind = Column(Enum("news", "blog", name="kind"))
+    price = Column(Numeric(3, 2), nullable=False)
+    starts = Column(Time, nullable=False)
+
+
+class Tag(Base):
+    __tablename__ = "tag"
+
+    id = Column(Integer, primary_key=True)
+    color = Column(Enum("red", "green", "blue", name="color"), unique=True)
+
+
+class InferenceTestCases(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(TEST_DB)
+
+    def test_infer_field_spec(self):
+        self.assertIsInstance(infer_field_spec("age", FieldInfo("integer", None, None, False)), IntegerRange)
+        self.assertIsInstance(infer_field_spec("id", FieldInfo("uuid", None, None, False)), RandomUUID)
+        self.assertIsInstance(infer_field_spec("kind", FieldInfo("string", 10, ["a"], False)), Choice)
+        # the unique fields with choices don't generate values outside of their choices
+        self.assertIsInstance(infer_field_spec("kind", FieldInfo("string", 10, ["a"], False), unique=True), Choice)
+
+        # the decimals fit in their precision and are rounded to their scale, also when written to files
+        spec = infer_field_spec("price", FieldInfo("decimal", None, None, False, 3, 2))
+        self.assertIsInstance(spec, DecimalRange)
+        for value in spec.resolve_batch(1000) + [spec.resolve()]:
+            self.assertIsInstance(value, decimal.Decimal)
+            self.assertEqual(value.as_tuple().exponent, -2)
+            self.assertTrue(0 <= value <= decimal.Decimal("9.99"))
+
+        # the datetimes are aware when the field (or the backend) stores the time zone
+        spec = infer_field_spec("created", FieldInfo("datetime", None, None, False, timezone=True))
+        self.assertIsInstance(spec, DateTimeRange)
+        for value in spec.resolve_batch(10) + [spec.resolve()]:
+            self.assertEqual(value.tzinfo, datetime.timezone.utc)
+        self.assertIsNone(infer_field_spec("created", FieldInfo("datetime", None, None, False)).resolve().tzinfo)
+
+        # the fields of unknown types are left NULL, with a warning for the NOT NULL ones
+        with self.assertLogs("fillmydb.core.inference", level="WARNING"):
+            self.assertIsNone(infer_field_spec("location", FieldInfo(None, None, None, False)))
+        with self.assertLogs("fillmydb.core.inference", level="WARNING") as logs:
+            self.assertIsNone(infer_field_spec("location", FieldInfo(None, None, None, True)))
+            logging.getLogger("fillmydb.core.inference").warning("the only warning")
+        self.assertEqual(len(logs.records), 1)
+
+        spec = infer_field_spec("email", FieldInfo("string", 16, None, False))
+        for value in spec.resolve_batch(100):
+            self.assertTrue(value.endswith("@example.com"))
+            self.assertTrue(len(value) <= 16)
+
+        # the unique fields don't pick from a small list of names
+        self.assertIsInstance(infer_field_spec("first_name", FieldInfo("string", None, None, False), unique=True),
+                              RandomString)
+
+    def test_generate_with_inferred_specs(self):
+        wrapper = ModelWrapper(Profile, auto_specs=True)
+        self.assertIsNone(wrapper[Profile].id)
+
+        wrapper.generate(200, batch_size=50)
+        self.assertEqual(Profile.select().count(), 200)
+        for profile in Profile.select():
+            self.assertTrue(len(profile.username) <= 20)
+            self.assertTrue(len(profile.first_name) <= 5)
+            self.assertTrue(18 <= profile.age <= 90)
+            self.assertIn(profile.status, ["a", "b"])
+            self.assertIsInstance(profile.born, datetime.date)
+        self.assertEqual(Profile.select(Profile.username).distinct().count(), 200)
+
+    def test_sqlalchemy_field_info(self):
+        wrapper = ModelWrapper(Article, bind=create_engine("sqlite://"), auto_specs=True)
+        handler = wrapper._handlers[Article]
+        self.assertEqual(handler.get_field_info("title"), FieldInfo("string", 30, None, False))
+        self.assertEqual(handler.get_field_info("body").kind, "text")
+        self.assertEqual(handler.get_field_info("created").kind, "datetime")
+        self.assertFalse(handler.get_field_info("created").timezone)
+        self.assertTrue(handler.get_field_info("updated").timezone)
+        self.assertEqual(handler.get_field_info("day").kind, "date")
+        self.assertEqual(handler.get_field_info("kind").choices, ["news", "blog"])
+        self.assertEqual(handler.get_field_info("price"), FieldInfo("decimal", None, None, False, 3, 2))
+        self.assertEqual(handler.get_field_info("starts").kind, "time")
+
+        wrapper.generate(20, batch_size=10)
+        self.assertEqual(list(handler.get_primary_keys()), list(range(1, 21)))
+        for price, starts in zip(handler.get_field_values("price"), handler.get_field_values("starts")):
+            self.assertTrue(0 <= price < 10)
+            self.assertIsInstance(starts, datetime.time)
+
+    def test_unique_choices(self):
+        wrapper = ModelWrapper(Tag, bind=create_engine("sqlite://"), auto_specs=True)
+        wrapper.generate(3)
+        self.assertEqual(sorted(wrapper._handlers[Tag].get_field_values("color")), ["blue", "green", "red"])
+
+        # there are no more distinct choices
+        with self.assertRaises(ValueError):
+            wrapper.generate(1)
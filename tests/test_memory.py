@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+from array import array
+from unittest import TestCase, skipIf
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from fillmydb.handlers.key_pool import KeyPool, KeyCompactor, compact_keys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# generates the rows of two tables (with a foreign key) into a new SQLite database, then prints the peak RSS
+SCRIPT = textwrap.dedent("""
+    import resource
+    import sys
+
+    import peewee
+
+    from fillmydb import ModelWrapper, IntegerRange, Choice
+
+    database = peewee.SqliteDatabase("memory.db")
+
+
+    class Author(peewee.Model):
+        name = peewee.CharField()
+
+        class Meta:
+            database = database
+
+
+    class Book(peewee.Model):
+        title = peewee.CharField()
+        pages = peewee.IntegerField()
+        author = peewee.ForeignKeyField(Author)
+
+        class Meta:
+            database = database
+
+
+    database.create_tables([Author, Book])
+    count = int(sys.argv[1])
+    wrapper = ModelWrapper(Author, Book)
+    wrapper[Author].name = Choice(["a", "b", "c"])
+    wrapper[Book].title = Choice(["title"])
+    wrapper[Book].pages = IntegerRange(1, 1000)
+    wrapper.generate(count, count, batch_size=1000, commit_every=50000, progress=False)
+    assert Book.select().count() == count
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+""")
+
+
+# picks zipf distributed foreign keys out of a pool of keys, then prints the peak RSS
+ZIPF_SCRIPT = textwrap.dedent("""
+    import resource
+    import sys
+
+    from fillmydb import ForeignKeySpec
+    from fillmydb.handlers.key_pool import KeyPool
+
+    key_pool = KeyPool(ForeignKeySpec, range(1, int(sys.argv[1]) + 1))
+    spec = ForeignKeySpec(distribution="zipf", s=1.1)
+    assert all(1 <= spec.pick(key_pool) <= len(key_pool) for _ in range(10000))
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+""")
+
+
+def peak_rss(count, script=SCRIPT):
+    """
+    Returns the peak RSS, in megabytes, of a process running *script* (generating *count* rows of two tables, by
+    default).
+    """
+    with tempfile.TemporaryDirectory() as path:
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        output = subprocess.check_output([sys.executable, "-c", script, str(count)], cwd=path, env=env)
+    # kilobytes on Linux, bytes on macOS
+    return int(output) / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class CompactKeysTestCases(TestCase):
+    def test_contiguous_keys(self):
+        keys = compact_keys(iter(range(5, 200005)), chunk_size=1000)
+        self.assertEqual(keys, range(5, 200005))
+        self.assertEqual(compact_keys([]), range(0))
+
+    def test_integer_keys(self):
+        keys = compact_keys(iter([1, 2, 3, 7, 8]), chunk_size=2)
+        self.assertIsInstance(keys, array)
+        self.assertEqual(list(keys), [1, 2, 3, 7, 8])
+
+    def test_other_keys(self):
+        self.assertEqual(compact_keys(iter([1, 2, "a", "b"]), chunk_size=2), [1, 2, "a", "b"])
+        self.assertEqual(compact_keys([1, 2 ** 70]), [1, 2 ** 70])
+
+    def test_key_compactor(self):
+        compactor = KeyCompactor()
+        compactor.extend([1, 2])
+        compactor.extend([3])
+        self.assertEqual(compactor.keys(), range(1, 4))
+        compactor.extend([5])
+        self.assertEqual(list(compactor.keys()), [1, 2, 3, 5])
+        compactor.extend(["a"])
+        self.assertEqual(compactor.keys(), [1, 2, 3, 5, "a"])
+
+    def test_key_pool(self):
+        key_pool = KeyPool(CompactKeysTestCases, (key for key in range(1, 100001)))
+        self.assertEqual(key_pool.keys, range(1, 100001))
+        self.assertEqual(len(key_pool.sample(10)), 10)
+
+
+@skipIf(resource is None, "Module 'resource' could not be imported")
+class MemoryTestCases(TestCase):
+    def test_constant_memory(self):
+        # ten times more rows don't take more memory
+        small, large = peak_rss(20000), peak_rss(200000)
+        self.assertLess(large - small, 15)
+        self.assertLess(large, 250)
+
+    def test_zipf_keys_in_constant_memory(self):
+        # nothing is stored per key of the pool
+        small, large = peak_rss(1000, ZIPF_SCRIPT), peak_rss(50000000, ZIPF_SCRIPT)
+        self.assertLess(large - small, 15)
@@ -0,0 +1,77 @@
+import io
+import os
+import logging
+from unittest import TestCase, skipIf
+
+import peewee
+
+from fillmydb import ModelWrapper, Choice, LoggingProgress, TqdmProgress
+from fillmydb.core.progress import tqdm, format_duration
+from fillmydb.core.stats import ModelStats
+
+TEST_DB = "test9.db"
+
+database = peewee.SqliteDatabase(TEST_DB)
+
+
+class Event(peewee.Model):
+    name = peewee.CharField()
+
+    class Meta:
+        database = database
+
+
+class ProgressTestCases(TestCase):
+    def setUp(self):
+        Event.drop_table(safe=True)
+        Event.create_table()
+        self.wrapper = ModelWrapper(Event)
+        self.wrapper[Event].name = Choice(["a", "b"])
+
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(TEST_DB)
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(None), "?")
+        self.assertEqual(format_duration(59.9), "0:00:59")
+        self.assertEqual(format_duration(3725), "1:02:05")
+
+    def test_eta(self):
+        model_stats = ModelStats(Event, 100)
+        self.assertIsNone(model_stats.eta)
+        model_stats.rows = 25
+        model_stats.elapsed = 5.0
+        self.assertEqual(model_stats.eta, 15.0)
+
+    def test_logging_progress(self):
+        with self.assertLogs("fillmydb.core.progress", logging.INFO) as logs:
+            self.wrapper.generate(25, batch_size=10, progress=LoggingProgress(interval=0))
+        self.assertEqual(len(logs.records), 4)
+        self.assertIn("Event: 10/25 rows (40.0%)", logs.output[0])
+        self.assertIn("ETA", logs.output[0])
+        self.assertIn("Event: 25 rows in", logs.output[-1])
+
+    def test_logging_progress_is_rate_limited(self):
+        with self.assertLogs("fillmydb.core.progress", logging.INFO) as logs:
+            self.wrapper.generate(100, batch_size=1)
+        # only the report of the end of the model
+        self.assertEqual(len(logs.records), 1)
+
+    def test_generation_is_logged(self):
+        with self.assertLogs("fillmydb.core", logging.INFO) as logs:
+            self.wrapper.generate(3, progress=False)
+        self.assertEqual(logs.output, ["INFO:fillmydb.core:Generating 3 instances of Event"])
+
+    def test_unknown_progress(self):
+        with self.assertRaises(ValueError):
+            self.wrapper.generate(1, progress="bar")
+        self.assertEqual(Event.select().count(), 0)
+
+    @skipIf(tqdm is None, "tqdm is not installed")
+    def test_tqdm_progress(self):
+        output = io.StringIO()
+        self.wrapper.generate(25, batch_size=10, progress=TqdmProgress(file=output))
+        self.assertIn("Event", output.getvalue())
+        self.assertIn("25/25", output.getvalue())
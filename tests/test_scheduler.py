@@ -0,0 +1,210 @@
+import os
+import threading
+from unittest import TestCase
+
+import peewee
+
+from fillmydb import ModelWrapper, CyclicDependencyError, Choice, FieldSpec
+from fillmydb.core.scheduler import DependencyScheduler
+
+DB_NAME = "test4.db"
+database = peewee.SqliteDatabase(DB_NAME)
+
+
+class BaseModel(peewee.Model):
+    class Meta:
+        database = database
+
+
+class Author(BaseModel):
+    name = peewee.CharField(null=True)
+
+
+class Category(BaseModel):
+    name = peewee.CharField(null=True)
+    parent = peewee.ForeignKeyField("self", null=True)
+
+
+class Book(BaseModel):
+    author = peewee.ForeignKeyField(Author)
+    category = peewee.ForeignKeyField(Category)
+
+
+class Review(BaseModel):
+    book = peewee.ForeignKeyField(Book)
+    author = peewee.ForeignKeyField(Author)
+
+
+class Employee(BaseModel):
+    department = peewee.DeferredForeignKey("Department", null=True)
+
+
+class Department(BaseModel):
+    manager = peewee.ForeignKeyField(Employee)
+
+
+class Node(BaseModel):
+    parent = peewee.ForeignKeyField("self")
+
+
+class FakeHandler:
+    def __init__(self, model, references):
+        self.model = model
+        self.references = references
+        self.fields_names = list(references)
+
+    def is_foreign_key_field(self, field_name):
+        return True
+
+    def get_referenced_model_by_field_name(self, field_name):
+        return self.references[field_name]
+
+    def is_nullable_field(self, field_name):
+        return True
+
+
+class DependencySchedulerTestCases(TestCase):
+    def test_levels(self):
+        handlers = [
+            FakeHandler(Review, {"book": Book, "author": Author}),
+            FakeHandler(Book, {"author": Author, "category": Category}),
+            FakeHandler(Category, {}),
+            FakeHandler(Author, {}),
+        ]
+        plan = DependencyScheduler(handlers).plan()
+        self.assertListEqual(plan.levels, [[Category, Author], [Book], [Review]])
+        self.assertListEqual(plan.order, [Category, Author, Book, Review])
+        self.assertDictEqual(plan.deferred, {})
+
+    def test_wide_schema(self):
+        models = [type("Model{}".format(index), (), {}) for index in range(300)]
+        # every model references the previous one
+        handlers = [FakeHandler(model, {"previous": models[index - 1]} if index else {})
+                    for index, model in enumerate(models)]
+        plan = DependencyScheduler(reversed(handlers)).plan()
+        self.assertListEqual(plan.order, models)
+
+        # a level per model, computed without scanning all the remaining models for every level
+        models = [type("Model{}".format(index), (), {}) for index in range(20000)]
+        handlers = [FakeHandler(model, {"previous": models[index - 1]} if index else {})
+                    for index, model in enumerate(models)]
+        self.assertListEqual(DependencyScheduler(reversed(handlers)).plan().order, models)
+
+    def test_references_to_other_models_are_ignored(self):
+        plan = DependencyScheduler([FakeHandler(Book, {"author": Author})]).plan()
+        self.assertListEqual(plan.levels, [[Book]])
+
+    def test_cycles(self):
+        handlers = [FakeHandler(Employee, {"department": Department}), FakeHandler(Department, {"manager": Employee})]
+        with self.assertRaises(CyclicDependencyError) as context:
+            DependencyScheduler(handlers).plan()
+        self.assertCountEqual(context.exception.models, [Employee, Department])
+
+        plan = DependencyScheduler(handlers, cycles="defer").plan()
+        self.assertListEqual(plan.levels, [[Employee], [Department]])
+        self.assertDictEqual(plan.deferred, {Employee: ["department"]})
+
+        with self.assertRaises(ValueError):
+            DependencyScheduler(handlers, cycles="ignore")
+
+    def test_only_the_foreign_keys_of_the_cycle_are_deferred(self):
+        # Review references the cycle, but isn't part of it
+        handlers = [FakeHandler(Review, {"author": Employee}), FakeHandler(Employee, {"department": Department}),
+                    FakeHandler(Department, {"manager": Employee})]
+        plan = DependencyScheduler(handlers, cycles="defer").plan()
+        self.assertDictEqual(plan.deferred, {Employee: ["department"]})
+        self.assertListEqual(plan.levels, [[Employee], [Review, Department]])
+
+        with self.assertRaises(CyclicDependencyError) as context:
+            DependencyScheduler(handlers).plan()
+        self.assertCountEqual(context.exception.models, [Employee, Department])
+
+
+class CyclicGenerationTestCases(TestCase):
+    def setUp(self):
+        models = [Author, Category, Book, Review, Employee, Department, Node]
+        database.drop_tables(models, safe=True)
+        database.create_tables(models)
+
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(DB_NAME)
+
+    def test_plan(self):
+        wrapper = ModelWrapper(Review, Book, Category, Author)
+        plan = wrapper.plan(cycles="defer")
+        self.assertListEqual(plan.levels, [[Category, Author], [Book], [Review]])
+        self.assertDictEqual(plan.deferred, {Category: ["parent"]})
+
+        with self.assertRaises(CyclicDependencyError):
+            wrapper.plan()
+
+    def test_self_reference(self):
+        wrapper = ModelWrapper(Category)
+        wrapper[Category].name = Choice(["name"])
+        with self.assertRaises(CyclicDependencyError):
+            wrapper.generate(10)
+        self.assertEqual(Category.select().count(), 0)
+
+        wrapper.generate(10, batch_size=4, cycles="defer")
+        self.assertEqual(Category.select().count(), 10)
+        self.assertEqual(Category.select().where(Category.parent.is_null()).count(), 0)
+
+    def test_cycle_between_models(self):
+        wrapper = ModelWrapper(Department, Employee)
+        wrapper.generate(3, 10, cycles="defer")
+
+        department_ids = {department.id for department in Department.select()}
+        employee_ids = {employee.id for employee in Employee.select()}
+        for employee in Employee.select():
+            self.assertIn(employee.department_id, department_ids)
+        for department in Department.select():
+            self.assertIn(department.manager_id, employee_ids)
+
+    def test_cycle_without_nullable_foreign_key(self):
+        wrapper = ModelWrapper(Node)
+        with self.assertRaises(CyclicDependencyError):
+            wrapper.generate(10, cycles="defer")
+
+
+class ParallelGenerationTestCases(TestCase):
+    def setUp(self):
+        models = [Author, Category, Book, Review]
+        database.drop_tables(models, safe=True)
+        database.create_tables(models)
+
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(DB_NAME)
+
+    def test_generate_level_in_parallel(self):
+        threads = set()
+
+        def thread_name():
+            threads.add(threading.current_thread().name)
+            return "name"
+
+        wrapper = ModelWrapper(Review, Book, Category, Author)
+        wrapper[Author].name = FieldSpec(thread_name)
+        wrapper[Category].name = FieldSpec(thread_name)
+
+        wrapper.generate(50, 20, 10, 5, batch_size=5, cycles="defer", parallel=True)
+        self.assertEqual(Author.select().count(), 5)
+        self.assertEqual(Category.select().count(), 10)
+        self.assertEqual(Book.select().count(), 20)
+        self.assertEqual(Review.select().count(), 50)
+        self.assertEqual(Category.select().where(Category.parent.is_null()).count(), 0)
+        self.assertEqual(len(threads), 2)
+
+    def test_parallel_errors_are_propagated(self):
+        def fail():
+            raise RuntimeError()
+
+        wrapper = ModelWrapper(Book, Category, Author)
+        wrapper[Author].name = FieldSpec(fail)
+
+        with self.assertRaises(RuntimeError):
+            wrapper.generate(1, 10, 10, cycles="defer", parallel=2)
+        self.assertEqual(Book.select().count(), 0)
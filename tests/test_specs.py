@@ -0,0 +1,226 @@
+import datetime
+import decimal
+import pickle
+import random
+import uuid
+from collections import Counter
+from unittest import TestCase
+
+from fillmydb import ForeignKeySpec, IntegerRange, FloatRange, DecimalRange, Choice, Boolean, DateRange, \
+    DateTimeRange, TimeRange, RandomBytes, RandomUUID, RandomString, Pooled
+from fillmydb.core.specs import ZipfSampler
+from fillmydb.handlers.key_pool import KeyPool
+
+
+class Referenced:
+    pass
+
+
+class ForeignKeySpecTestCases(TestCase):
+    def setUp(self):
+        self.key_pool = KeyPool(Referenced, range(1, 11))
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            ForeignKeySpec(distribution="normal")
+        with self.assertRaises(ValueError):
+            ForeignKeySpec(distribution="zipf", s=0)
+        with self.assertRaises(ValueError):
+            ForeignKeySpec(distribution="fixed", k=0)
+
+    def test_empty_key_pool(self):
+        with self.assertRaises(ValueError):
+            ForeignKeySpec().pick(KeyPool(Referenced, []))
+
+    def test_uniform(self):
+        spec = ForeignKeySpec()
+        for _ in range(100):
+            self.assertIn(spec.pick(self.key_pool), self.key_pool.keys)
+
+    def test_zipf(self):
+        spec = ForeignKeySpec(distribution="zipf", s=2, batch_size=100)
+        counts = Counter(spec.pick(self.key_pool) for _ in range(5000))
+        self.assertGreater(counts[1], counts[2])
+        self.assertGreater(counts[1], 2500)
+
+        # the frequencies of the ranks follow 1 / n ** s, for exponents below 1 too
+        random.seed(4)
+        sampler = ZipfSampler(5, 0.5)
+        counts = Counter(sampler.sample() for _ in range(50000))
+        weights = [1 / rank ** 0.5 for rank in range(1, 6)]
+        for rank, weight in enumerate(weights, 1):
+            self.assertAlmostEqual(counts[rank] / 50000, weight / sum(weights), delta=0.01)
+
+    def test_round_robin(self):
+        spec = ForeignKeySpec(distribution="round_robin", batch_size=3)
+        self.assertListEqual([spec.pick(self.key_pool) for _ in range(12)], [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 1, 2])
+
+    def test_fixed_fanout(self):
+        spec = ForeignKeySpec(distribution="fixed", k=3, batch_size=4)
+        self.assertListEqual(spec.sample(self.key_pool, 7), [1, 1, 1, 2, 2, 2, 3])
+        self.assertListEqual(spec.sample(self.key_pool, 2), [3, 3])
+
+    def test_state_is_reset_for_a_new_key_pool(self):
+        spec = ForeignKeySpec(distribution="round_robin")
+        spec.pick(self.key_pool)
+        self.assertEqual(spec.pick(KeyPool(Referenced, [5, 6])), 5)
+
+
+class BatchFieldSpecTestCases(TestCase):
+    def assertBatch(self, spec, check, n=200):
+        values = spec.resolve_batch(n)
+        self.assertEqual(len(values), n)
+        for value in values + [spec.resolve()]:
+            check(value)
+
+    def test_integer_range(self):
+        with self.assertRaises(ValueError):
+            IntegerRange(10, 1)
+
+        def check(value):
+            self.assertIsInstance(value, int)
+            self.assertTrue(-5 <= value <= 5)
+
+        self.assertBatch(IntegerRange(-5, 5), check)
+
+    def test_float_range(self):
+        def check(value):
+            self.assertIsInstance(value, float)
+            self.assertTrue(1.5 <= value <= 2.5)
+
+        self.assertBatch(FloatRange(1.5, 2.5), check)
+
+    def test_decimal_range(self):
+        with self.assertRaises(ValueError):
+            DecimalRange(0.111, 0.119, places=2)
+
+        def check(value):
+            self.assertIsInstance(value, decimal.Decimal)
+            self.assertEqual(value.as_tuple().exponent, -2)
+            self.assertTrue(decimal.Decimal("0.1") <= value <= decimal.Decimal("0.3"))
+
+        self.assertBatch(DecimalRange(0.1, 0.3, places=2), check)
+
+    def test_choice(self):
+        with self.assertRaises(ValueError):
+            Choice([])
+        with self.assertRaises(ValueError):
+            Choice(["a", "b"], weights=[1])
+
+        self.assertBatch(Choice(["a", "b", "c"]), lambda value: self.assertIn(value, ["a", "b", "c"]))
+        self.assertBatch(Choice(["a", "b"], weights=[0, 1]), lambda value: self.assertEqual(value, "b"))
+
+    def test_boolean(self):
+        self.assertBatch(Boolean(), lambda value: self.assertIsInstance(value, bool))
+        self.assertBatch(Boolean(1), lambda value: self.assertIs(value, True))
+
+    def test_date_range(self):
+        start, end = datetime.date(2016, 1, 1), datetime.date(2016, 1, 10)
+
+        def check(value):
+            self.assertIsInstance(value, datetime.date)
+            self.assertTrue(start <= value <= end)
+
+        self.assertBatch(DateRange(start, end), check)
+
+    def test_datetime_range(self):
+        start, end = datetime.datetime(2016, 1, 1), datetime.datetime(2016, 1, 1, 12)
+
+        def check(value):
+            self.assertIsInstance(value, datetime.datetime)
+            self.assertTrue(start <= value <= end)
+
+        self.assertBatch(DateTimeRange(start, end), check)
+
+        # the microseconds and the time zone of the start are kept
+        timezone = datetime.timezone(datetime.timedelta(hours=2))
+        start = datetime.datetime(2016, 1, 1, 0, 0, 0, 500000, tzinfo=timezone)
+        end = datetime.datetime(2016, 1, 1, 0, 0, 3, tzinfo=timezone)
+        self.assertBatch(DateTimeRange(start, end), check)
+        for value in DateTimeRange(start, end).resolve_batch(20):
+            self.assertEqual(value.microsecond, 500000)
+            self.assertEqual(value.tzinfo, timezone)
+
+    def test_time_range(self):
+        start, end = datetime.time(9, 30, 0, 500), datetime.time(9, 30, 2)
+
+        def check(value):
+            self.assertIsInstance(value, datetime.time)
+            self.assertTrue(start <= value <= end)
+
+        self.assertBatch(TimeRange(start, end), check)
+        self.assertEqual(TimeRange(start, start).resolve_batch(2), [start, start])
+
+    def test_random_bytes(self):
+        def check(value):
+            self.assertIsInstance(value, bytes)
+            self.assertEqual(len(value), 16)
+
+        self.assertBatch(RandomBytes(16), check)
+
+        # drawn from the seedable generator
+        random.seed(3)
+        first = RandomBytes(16).resolve()
+        random.seed(3)
+        self.assertEqual(RandomBytes(16).resolve(), first)
+
+    def test_random_uuid(self):
+        def check(value):
+            self.assertIsInstance(value, uuid.UUID)
+            self.assertEqual(value.version, 4)
+
+        self.assertBatch(RandomUUID(), check)
+
+    def test_random_string(self):
+        with self.assertRaises(ValueError):
+            RandomString(5, 2)
+
+        def check(value):
+            self.assertRegex(value, "^[ab]{2,4}@example.com$")
+
+        self.assertBatch(RandomString(2, 4, alphabet="ab", template="{}@example.com"), check)
+
+
+class CountingSpec:
+    def __init__(self, distinct=None):
+        self.calls = 0
+        self.distinct = distinct
+
+    def resolve(self):
+        self.calls += 1
+        if self.distinct:
+            return self.calls % self.distinct
+        return self.calls
+
+
+class PooledTestCases(TestCase):
+    def test_pool_is_filled_once(self):
+        spec = CountingSpec()
+        pooled = Pooled(spec, size=50)
+        self.assertEqual(spec.calls, 0)
+
+        values = pooled.resolve_batch(1000) + [pooled.resolve() for _ in range(100)]
+        self.assertEqual(spec.calls, 50)
+        self.assertTrue(set(values) <= set(range(1, 51)))
+
+    def test_background(self):
+        spec = CountingSpec()
+        pooled = Pooled(spec, size=100, background=True)
+        self.assertIn(pooled.resolve(), range(1, 101))
+        self.assertEqual(spec.calls, 100)
+
+    def test_unique(self):
+        pooled = Pooled(CountingSpec(distinct=30), size=20, unique=True)
+        values = pooled.resolve_batch(15) + [pooled.resolve() for _ in range(5)]
+        self.assertEqual(len(set(values)), 20)
+        with self.assertRaises(ValueError):
+            pooled.resolve()
+
+        with self.assertRaises(ValueError):
+            Pooled(CountingSpec(distinct=5), size=20, unique=True).resolve()
+        with self.assertRaises(ValueError):
+            Pooled(CountingSpec(), size=0)
+
+    def test_pickle(self):
+        pooled = pickle.loads(pickle.dumps(Pooled(CountingSpec(), size=10, background=True)))
+        self.assertIn(pooled.resolve(), range(1, 11))
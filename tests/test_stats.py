@@ -0,0 +1,159 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import peewee
+
+from fillmydb import ModelWrapper, FieldSpec, Choice, IntegerRange, GenerationObserver
+from fillmydb.core.stats import Latency
+
+TEST_DB = "test8.db"
+
+database = peewee.SqliteDatabase(TEST_DB)
+
+
+class Author(peewee.Model):
+    name = peewee.CharField()
+    code = peewee.IntegerField(unique=True)
+
+    class Meta:
+        database = database
+
+
+class Book(peewee.Model):
+    title = peewee.CharField()
+    author = peewee.ForeignKeyField(Author)
+
+    class Meta:
+        database = database
+
+
+def title():
+    return "title"
+
+
+class RecordingObserver(GenerationObserver):
+    def __init__(self):
+        self.events = []
+
+    def on_generation_start(self, stats):
+        self.events.append(("generation_start",))
+
+    def on_model_start(self, model_stats):
+        self.events.append(("model_start", model_stats.model, model_stats.count))
+
+    def on_batch_generated(self, model_stats, size, seconds):
+        self.events.append(("generated", model_stats.model, size))
+
+    def on_batch_persisted(self, model_stats, size, seconds):
+        self.events.append(("persisted", model_stats.model, size))
+
+    def on_model_end(self, model_stats):
+        self.events.append(("model_end", model_stats.model, model_stats.rows))
+
+    def on_generation_end(self, stats):
+        self.events.append(("generation_end", stats.rows))
+
+
+class GenerationStatsTestCases(TestCase):
+    def setUp(self):
+        for model in [Book, Author]:
+            model.drop_table(safe=True)
+        for model in [Author, Book]:
+            model.create_table()
+
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(TEST_DB)
+
+    def _get_wrapper(self):
+        wrapper = ModelWrapper(Author, Book)
+        wrapper[Author].name = Choice(["a", "b"])
+        wrapper[Author].code = IntegerRange(1, 30)
+        wrapper[Book].title = FieldSpec(title)
+        return wrapper
+
+    def test_latency(self):
+        latency = Latency()
+        self.assertEqual(latency.mean, 0.0)
+        for seconds in [0.5, 0.1, 0.3]:
+            latency.add(seconds)
+        self.assertEqual(latency.count, 3)
+        self.assertAlmostEqual(latency.mean, 0.3)
+        self.assertEqual((latency.min, latency.max), (0.1, 0.5))
+
+    def test_stats(self):
+        wrapper = self._get_wrapper()
+        self.assertIsNone(wrapper.stats())
+        wrapper.generate(20, 45, batch_size=10)
+
+        stats = wrapper.stats()
+        self.assertEqual(list(stats.models), [Author, Book])
+        self.assertEqual(stats.rows, 65)
+        self.assertGreater(stats.rows_per_second, 0)
+
+        books = stats.models[Book]
+        self.assertEqual((books.count, books.rows), (45, 45))
+        self.assertEqual(books.generate_latency.count, 5)
+        self.assertEqual(books.persist_latency.count, 5)
+        self.assertEqual(set(books.field_times), {"title", "author"})
+        self.assertGreater(books.pick_time, 0)
+        self.assertGreater(books.resolve_time, 0)
+        self.assertIsNotNone(books.elapsed)
+
+        # 20 unique codes out of 30 values
+        self.assertGreater(stats.models[Author].retries, 0)
+        self.assertIn("Book", stats.report())
+
+    def test_observer(self):
+        wrapper = self._get_wrapper()
+        observer = RecordingObserver()
+        wrapper.add_observer(observer)
+        wrapper.generate(5, 12, batch_size=10)
+
+        self.assertEqual(observer.events, [
+            ("generation_start",),
+            ("model_start", Author, 5),
+            ("generated", Author, 5),
+            ("persisted", Author, 5),
+            ("model_end", Author, 5),
+            ("model_start", Book, 12),
+            ("generated", Book, 10),
+            ("persisted", Book, 10),
+            ("generated", Book, 2),
+            ("persisted", Book, 2),
+            ("model_end", Book, 12),
+            ("generation_end", 17),
+        ])
+
+        # the batches are persisted by another thread in pipeline mode
+        del observer.events[:]
+        wrapper.generate(5, 12, batch_size=10, pipeline=True)
+        self.assertEqual([event for event in observer.events if event[0] == "persisted"],
+                         [("persisted", Author, 5), ("persisted", Book, 10), ("persisted", Book, 2)])
+        self.assertEqual(observer.events[-1], ("generation_end", 17))
+
+        wrapper.remove_observer(observer)
+        wrapper.generate(1, 1)
+        self.assertEqual(len([event for event in observer.events if event[0] == "generation_end"]), 1)
+
+    def test_stats_of_file_export(self):
+        wrapper = self._get_wrapper()
+        with tempfile.TemporaryDirectory() as path:
+            wrapper.generate_to(path, 10, 25, batch_size=10)
+        stats = wrapper.stats()
+        self.assertEqual(stats.models[Book].rows, 25)
+        self.assertEqual(stats.models[Book].persist_latency.count, 3)
+
+    def test_profile(self):
+        wrapper = self._get_wrapper()
+        wrapper.generate(5, 10, profile="cprofile")
+        self.assertTrue(any(function[2] == "title" for function in wrapper.stats().profile.stats))
+
+        wrapper.generate(5, 10, profile="tracemalloc")
+        self.assertGreater(wrapper.stats().memory_peak, 0)
+        self.assertTrue(wrapper.stats().memory.statistics("filename"))
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(1, 1, profile="perf")
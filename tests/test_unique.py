@@ -0,0 +1,141 @@
+import os
+import random
+from unittest import TestCase
+
+import peewee
+from sqlalchemy import Column, Integer, String, UniqueConstraint, create_engine
+from sqlalchemy.orm import declarative_base
+
+from fillmydb import ModelWrapper, FieldSpec, Choice, IntegerRange
+from fillmydb.core.unique import SeenSet, UniqueFilter
+
+TEST_DB = "test6.db"
+
+database = peewee.SqliteDatabase(TEST_DB)
+
+
+class Account(peewee.Model):
+    username = peewee.CharField(unique=True)
+    email = peewee.CharField()
+    code = peewee.IntegerField()
+    name = peewee.CharField()
+
+    class Meta:
+        database = database
+        indexes = (
+            (("email",), True),
+            (("name", "code"), False),
+        )
+
+
+Base = declarative_base()
+
+
+class Customer(Base):
+    __tablename__ = "customer"
+    __table_args__ = (UniqueConstraint("email"), UniqueConstraint("first_name", "last_name"))
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String, unique=True)
+    email = Column(String)
+    first_name = Column(String)
+    last_name = Column(String)
+
+
+class SeenSetTestCases(TestCase):
+    def test_add(self):
+        seen = SeenSet(capacity=4)
+        for value in range(1000):
+            self.assertTrue(seen.add("value{}".format(value)))
+        self.assertFalse(seen.add("value10"))
+        self.assertIn("value999", seen)
+        self.assertNotIn("value1000", seen)
+        self.assertEqual(len(seen), 1000)
+        self.assertTrue(seen.add(0))
+        self.assertFalse(seen.add(0))
+
+    def test_integers_dont_collide(self):
+        seen = SeenSet()
+        # hash(-1) == hash(-2), and hash(n) == hash(n + 2 ** 61 - 1)
+        for value in [-1, -2, 5, 5 + 2 ** 61 - 1, 5 + 2 ** 64, -2 ** 63, 2 ** 63, 0.5, 0.0]:
+            self.assertTrue(seen.add(value), value)
+        self.assertFalse(seen.add(-2))
+        self.assertFalse(seen.add(-0.0))
+        self.assertIn(2 ** 63, seen)
+        self.assertNotIn(-3, seen)
+        self.assertEqual(len(seen), 9)
+
+
+class UniqueFilterTestCases(TestCase):
+    def test_retry(self):
+        # the last missing value is drawn with a probability of 1/20, which fails sometimes without a seed
+        random.seed(2)
+        unique_filter = UniqueFilter(Account, "code", IntegerRange(1, 20))
+        values = unique_filter.filter([1] * 20)
+        self.assertEqual(sorted(values), list(range(1, 21)))
+        with self.assertRaises(ValueError):
+            unique_filter.filter_value(1)
+
+    def test_negative_integers(self):
+        unique_filter = UniqueFilter(Account, "code", IntegerRange(-2, -1))
+        self.assertEqual(sorted(unique_filter.filter([-1, -1])), [-2, -1])
+
+    def test_suffix(self):
+        unique_filter = UniqueFilter(Account, "username", Choice(["a"]), mode="suffix")
+        self.assertEqual(unique_filter.filter(["a", "a", "b", "a", "a-1"]), ["a", "a-1", "b", "a-2", "a-1-3"])
+
+        with self.assertRaises(ValueError):
+            UniqueFilter(Account, "username", Choice(["a"]), mode="append")
+
+
+class UniqueFieldsGenerationTestCases(TestCase):
+    def setUp(self):
+        Account.drop_table(safe=True)
+        Account.create_table()
+
+    @classmethod
+    def tearDownClass(cls):
+        database.close()
+        os.remove(TEST_DB)
+
+    def _get_wrapper(self):
+        wrapper = ModelWrapper(Account)
+        wrapper[Account].username = Choice(["user{}".format(index) for index in range(100)])
+        wrapper[Account].email = FieldSpec(lambda: "user{}@example.com".format(IntegerRange(0, 99).resolve()))
+        wrapper[Account].code = IntegerRange(0, 1)
+        wrapper[Account].name = Choice(["name"])
+        return wrapper
+
+    def test_unique_fields_are_detected(self):
+        handler = ModelWrapper(Account)._handlers[Account]
+        self.assertTrue(handler.is_unique_field("username"))
+        self.assertTrue(handler.is_unique_field("email"))
+        self.assertFalse(handler.is_unique_field("code"))
+
+        handler = ModelWrapper(Customer, bind=create_engine("sqlite://"))._handlers[Customer]
+        self.assertTrue(handler.is_unique_field("username"))
+        self.assertTrue(handler.is_unique_field("email"))
+        self.assertFalse(handler.is_unique_field("first_name"))
+
+    def test_generate_unique_values(self):
+        wrapper = self._get_wrapper()
+        wrapper.generate(60, batch_size=20)
+        # the values already stored in the table are not generated again
+        wrapper.generate(30)
+        self.assertEqual(Account.select(Account.username).distinct().count(), 90)
+        self.assertEqual(Account.select(Account.email).distinct().count(), 90)
+
+        with self.assertRaises(ValueError):
+            wrapper.generate(20)
+
+    def test_suffix(self):
+        wrapper = self._get_wrapper()
+        wrapper[Account].email = FieldSpec(lambda: "user@example.com")
+        wrapper.generate(150, batch_size=50, unique="suffix")
+        self.assertEqual(Account.select(Account.email).distinct().count(), 150)
+        self.assertEqual(Account.select().where(Account.email == "user@example.com-1").count(), 1)
+
+    def test_disabled(self):
+        wrapper = self._get_wrapper()
+        with self.assertRaises(peewee.IntegrityError):
+            wrapper.generate(150, unique=None)
@@ -93,6 +93,25 @@ class PeeweeBasicFunctionalityTestCases(TestCase):
 
         self.assertEqual(User.select(User.username == "test_name").count(), 1)
 
+    def test_create_instances_bulk(self):
+        handler = PeeweeHandler(User)
+
+        rows = [
+            {
+                "id": None,
+                "name": "bulk_name{}".format(i),
+                "username": "bulk_username{}".format(i),
+                "password_hash": "bulk_hash{}".format(i),
+                "email": "bulk_email{}".format(i),
+                "visits": i,
+                "description": "bulk_description{}".format(i)
+            } for i in range(5)
+        ]
+        handler.create_instances_bulk(rows)
+
+        self.assertEqual(User.select().where(User.name.startswith("bulk_name")).count(), 5)
+        self.assertEqual(User.get(User.username == "bulk_username3").visits, 3)
+
     def test_get_referenced_models(self):
         handler_like = PeeweeHandler(Like)
         handler_user = PeeweeHandler(User)
@@ -165,6 +184,21 @@ class PeeweeBasicFunctionalityTestCases(TestCase):
         with self.assertRaises(AttributeError):
             handler_post.get_referenced_model_by_field_name("text")
 
+    def test_field_plan(self):
+        handler = PeeweeHandler(Like)
+        plan = handler.field_plan
+
+        self.assertEqual(plan.fields_names, tuple(handler.fields_names))
+        self.assertEqual(plan.value_fields, ("id",))
+        self.assertEqual(dict(plan.referenced_models), {"by_user": User, "to_post": Post})
+        self.assertEqual(plan.columns, tuple(name if name == "id" else name + "_id" for name in plan.fields_names))
+        self.assertEqual(plan.primary_key, "id")
+
+        with self.assertRaises(TypeError):
+            plan.referenced_models["by_user"] = Post
+        with self.assertRaises(AttributeError):
+            plan.primary_key = "by_user"
+
     def test_get_random_instance(self):
         User.drop_table()
         User.create_table()
@@ -188,3 +222,23 @@ class PeeweeBasicFunctionalityTestCases(TestCase):
             self.assertRegex(instance.email, "email\d+")
             self.assertRegex(instance.description, "description\d+")
             self.assertRegex(str(instance.visits), "\d+")
+
+    def test_load_key_pool(self):
+        User.drop_table()
+        User.create_table()
+
+        handler = PeeweeHandler(User)
+        with self.assertRaises(ValueError):
+            handler.load_key_pool().pick()
+
+        ids = []
+        for i in range(10):
+            ids.append(User.create(name="name", username="username", password_hash="password", email="email",
+                                   description="description", visits=i).id)
+
+        key_pool = handler.load_key_pool()
+        self.assertIs(handler.key_pool, key_pool)
+        self.assertCountEqual(handler.get_primary_keys(), ids)
+        self.assertEqual(len(key_pool), 10)
+        for _ in range(20):
+            self.assertIn(key_pool.pick(), ids)
@@ -0,0 +1,164 @@
+import os
+import random
+from unittest import TestCase
+
+from sqlalchemy import Column, Integer, String, LargeBinary, select, func
+
+from tests.data.sqlalchemy_models import User, Post, Like, Base, engine, DB_NAME
+from fillmydb import ModelWrapper, Choice, IntegerRange, RandomBytes
+from tests.test_core import numpy_seed
+from fillmydb.handlers.sqlalchemy_handler import SqlalchemyHandler
+
+
+def count(model):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+class SqlalchemyBasicFunctionalityTestCases(TestCase):
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        engine.dispose()
+        os.remove(DB_NAME)
+
+    # actual tests
+
+    def test_requires_engine(self):
+        with self.assertRaises(ValueError):
+            SqlalchemyHandler(User)
+
+    def test_create_table_if_not_exists(self):
+        handler = SqlalchemyHandler(Like, bind=engine)
+
+        Like.__table__.drop(engine)
+        handler.create_table_if_not_exists()
+        self.assertTrue(engine.dialect.has_table(engine.connect(), "like"))
+
+    def test_get_fields(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+
+        fields_objs, fields_names = handler.get_fields()
+        self.assertCountEqual(fields_names, ["id", "name", "username", "password_hash", "email", "visits",
+                                             "description"])
+        for field in fields_objs:
+            self.assertIsInstance(field, Column)
+
+        self.assertIsInstance(fields_objs[fields_names.index("id")].type, Integer)
+        self.assertIsInstance(fields_objs[fields_names.index("name")].type, String)
+        self.assertIsInstance(fields_objs[fields_names.index("password_hash")].type, LargeBinary)
+
+    def test_create_instance(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+
+        instance = handler.create_instance(name="test_name", visits=10)
+        self.assertEqual(instance.name, "test_name")
+        self.assertEqual(instance.visits, 10)
+        self.assertEqual(count(User), 0)
+
+    def test_create_instance_and_persist(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+
+        instance = handler.create_instance_and_persist(id=None, name="test_name", username="test_username",
+                                                       password_hash=b"test_hash", email="test_email", visits=10,
+                                                       description="test_description")
+        self.assertEqual(instance.name, "test_name")
+        self.assertEqual(instance.id, 1)
+        self.assertEqual(count(User), 1)
+
+    def test_create_instances_bulk(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+
+        handler.create_instances_bulk([{"id": None, "name": "name{}".format(i), "visits": i} for i in range(5)])
+        self.assertEqual(count(User), 5)
+        self.assertCountEqual(handler.get_primary_keys(), [1, 2, 3, 4, 5])
+
+    def test_create_rows_bulk(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+
+        handler.create_rows_bulk(("visits", "name"), [(i, "name{}".format(i)) for i in range(5)])
+        self.assertEqual(count(User), 5)
+        handler.bulk_load_rows(("name", "visits"), [("name{}".format(i), i) for i in range(3)])
+        self.assertEqual(count(User), 8)
+
+    def test_atomic(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+
+        with self.assertRaises(RuntimeError):
+            with handler.atomic():
+                handler.create_instances_bulk([{"name": "name"}])
+                handler.create_instance_and_persist(name="name")
+                raise RuntimeError()
+        self.assertEqual(count(User), 0)
+
+    def test_get_referenced_models(self):
+        self.assertListEqual(SqlalchemyHandler(User, bind=engine).get_referenced_models(), [])
+        self.assertListEqual(SqlalchemyHandler(Post, bind=engine).get_referenced_models(), [User])
+        self.assertCountEqual(SqlalchemyHandler(Like, bind=engine).get_referenced_models(), [User, Post])
+
+    def test_is_foreign_key_field(self):
+        handler = SqlalchemyHandler(Like, bind=engine)
+
+        self.assertTrue(handler.is_foreign_key_field("by_user"))
+        self.assertTrue(handler.is_foreign_key_field("for_post"))
+        self.assertFalse(handler.is_foreign_key_field("id"))
+        self.assertTrue(handler.is_value_field("id"))
+
+        with self.assertRaises(AttributeError):
+            handler.is_foreign_key_field("non_existing")
+
+    def test_get_referenced_model_by_field_name(self):
+        handler = SqlalchemyHandler(Post, bind=engine)
+
+        self.assertEqual(handler.get_referenced_model_by_field_name("by_user"), User)
+        with self.assertRaises(ValueError):
+            handler.get_referenced_model_by_field_name("title")
+
+    def test_pick_random_instance(self):
+        handler = SqlalchemyHandler(User, bind=engine)
+        self.assertIsNone(handler.pick_random_instance())
+
+        handler.create_instances_bulk([{"name": "name{}".format(i)} for i in range(5)])
+        self.assertRegex(handler.pick_random_instance().name, r"name\d+")
+
+    def test_generate(self):
+        wrapper = ModelWrapper(User, Post, Like, bind=engine)
+        wrapper[User].name = Choice(["a", "b"])
+        wrapper[User].visits = IntegerRange(0, 10)
+        wrapper[Post].title = Choice(["title"])
+
+        wrapper.generate(10, 20, 30, batch_size=8, commit_every=25)
+        self.assertEqual(count(User), 10)
+        self.assertEqual(count(Post), 20)
+        self.assertEqual(count(Like), 30)
+
+        wrapper.generate(5, 0, 0)
+        self.assertEqual(count(User), 15)
+
+    def test_copy_load_stores_the_same_rows(self):
+        wrapper = ModelWrapper(User, Post, Like, bind=engine)
+        wrapper[User].name = Choice(["a", "b\tc", None])
+        wrapper[User].password_hash = RandomBytes(4)
+        wrapper[User].visits = IntegerRange(0, 10)
+
+        def stored_rows():
+            with engine.connect() as connection:
+                return [connection.execute(select(model.__table__).order_by(model.id)).all()
+                        for model in (User, Post, Like)]
+
+        random.seed(5)
+        numpy_seed(5)
+        wrapper.generate(10, 20, 30, batch_size=8, commit_every=15)
+        orm_rows = stored_rows()
+
+        self.setUp()
+        random.seed(5)
+        numpy_seed(5)
+        wrapper.generate(10, 20, 30, batch_size=8, commit_every=15, load="copy")
+        self.assertEqual(stored_rows(), orm_rows)
+
+        with engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql("PRAGMA journal_mode").scalar(), "delete")